@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк автодополнения: время поиска по префиксу в индексе продуктов
+
+Индекс строится из синтетических названий продуктов; для случайных префиксов
+длиной 1-4 символа выводятся медиана и 99-й перцентиль времени поиска без кэша
+результатов (каждый запрос после изменения индекса) и с ним.
+
+Запуск:
+    python benchmarks/autocomplete_benchmark.py --products 20000 --queries 5000
+"""
+
+import os
+import sys
+import time
+import random
+import string
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.api.autocomplete import ProductPrefixIndex
+
+def make_products(count, seed=42):
+    """Строки (product_key, product_name, mention_count) со степенным распределением упоминаний"""
+    rng = random.Random(seed)
+    rows = {}
+    while len(rows) < count:
+        words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+                 for _ in range(rng.randint(1, 3))]
+        name = " ".join(words)
+        rows[name] = (name, name.title(), max(1, int(rng.paretovariate(1.2))))
+    return list(rows.values())
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def measure(index, prefixes, limit, cold):
+    """Время поиска в микросекундах для каждого префикса"""
+    samples = []
+    for prefix in prefixes:
+        if cold:
+            # Как после обновления индекса: готовых результатов запросов нет
+            index._memo.clear()
+        started = time.perf_counter()
+        index.search(prefix, limit)
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк индекса автодополнения")
+    parser.add_argument("--products", type=int, default=20000, help="Количество продуктов в индексе")
+    parser.add_argument("--queries", type=int, default=5000, help="Количество запросов")
+    parser.add_argument("--limit", type=int, default=10, help="Количество подсказок в ответе")
+    args = parser.parse_args()
+
+    rows = make_products(args.products)
+    index = ProductPrefixIndex()
+    started = time.perf_counter()
+    index.load(rows, 0)
+    print(f"Индекс построен за {(time.perf_counter() - started) * 1000:.0f} мс: продуктов {len(index)}")
+
+    rng = random.Random(7)
+    prefixes = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(1, 4)))
+                for _ in range(args.queries)]
+
+    print(f"{'режим':<22} {'p50, мкс':>9} {'p99, мкс':>9} {'max, мкс':>9}")
+    for name, cold in (("без кэша результатов", True), ("с кэшем результатов", False)):
+        samples = measure(index, prefixes, args.limit, cold)
+        print(f"{name:<22} {statistics.median(samples):>9.1f} {percentile(samples, 0.99):>9.1f} {max(samples):>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк скачивания: один поток против нескольких сегментов
+
+Локальный HTTP-сервер имитирует CDN: поддерживает Range, ограничивает скорость
+каждого соединения и добавляет задержку перед ответом. Один и тот же файл
+скачивается с разным количеством сегментов, выводятся время и скорость.
+
+Запуск:
+    python benchmarks/download_benchmark.py --size-mb 64 --rate-mb 4 --segments 1,2,4,8
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import http.server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.core.downloader import download_file
+
+class ThrottledRangeHandler(http.server.BaseHTTPRequestHandler):
+    """Обработчик с поддержкой Range и ограничением скорости соединения"""
+
+    protocol_version = "HTTP/1.1"
+    data = b""
+    rate = 4 * 1024 * 1024
+    latency = 0.05
+    ranges = True
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.data)))
+        if self.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        start, end = 0, len(self.data) - 1
+        range_header = self.headers.get("Range")
+        if range_header and self.ranges:
+            first, _, last = range_header.split("=", 1)[1].partition("-")
+            start = int(first)
+            end = int(last) if last else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(self.data)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        # Отдаем данные блоками по 64 КБ с паузами, чтобы выдержать скорость rate
+        block = 64 * 1024
+        started = time.monotonic()
+        sent = 0
+        try:
+            for offset in range(start, end + 1, block):
+                chunk = self.data[offset:min(offset + block, end + 1)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                delay = sent / self.rate - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def run_benchmark(size_mb, rate_mb, latency, segment_counts, ranges=True):
+    """Скачать файл с каждым количеством сегментов и вернуть результаты"""
+    ThrottledRangeHandler.data = os.urandom(int(size_mb * 1024 * 1024))
+    ThrottledRangeHandler.rate = rate_mb * 1024 * 1024
+    ThrottledRangeHandler.latency = latency
+    ThrottledRangeHandler.ranges = ranges
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ThrottledRangeHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/episode.mp3"
+
+    work_dir = tempfile.mkdtemp(prefix="download_benchmark_")
+    results = []
+    try:
+        for segments in segment_counts:
+            path = os.path.join(work_dir, f"episode_{segments}.mp3")
+            started = time.perf_counter()
+            download_file(url, path, segments=segments)
+            elapsed = time.perf_counter() - started
+
+            with open(path, "rb") as f:
+                assert f.read() == ThrottledRangeHandler.data, "Скачанный файл не совпадает с исходным"
+            results.append((segments, elapsed, size_mb / elapsed))
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сегментированного скачивания")
+    parser.add_argument("--size-mb", type=float, default=64, help="Размер файла в МБ")
+    parser.add_argument("--rate-mb", type=float, default=4, help="Скорость одного соединения в МБ/с")
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка перед ответом в секундах")
+    parser.add_argument("--segments", default="1,2,4,8", help="Количества сегментов через запятую")
+    parser.add_argument("--no-ranges", action="store_true", help="Сервер без поддержки Range (проверка отката)")
+    args = parser.parse_args()
+
+    segment_counts = [int(value) for value in args.segments.split(",")]
+    results = run_benchmark(args.size_mb, args.rate_mb, args.latency, segment_counts, not args.no_ranges)
+
+    print(f"Файл {args.size_mb:.0f} МБ, {args.rate_mb:.1f} МБ/с на соединение, задержка {args.latency * 1000:.0f} мс")
+    print(f"{'сегменты':>9} {'время, с':>9} {'МБ/с':>7} {'ускорение':>10}")
+    baseline = results[0][1]
+    for segments, elapsed, speed in results:
+        print(f"{segments:>9} {elapsed:>9.2f} {speed:>7.1f} {baseline / elapsed:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
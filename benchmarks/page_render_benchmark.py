@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк отрисовки страниц эпизода: шаблон Jinja против кэша фрагментов
+
+Для эпизодов с разным количеством рекомендаций страница recommendations.html
+(или episode_details.html) запрашивается repeat раз без кэша и через FragmentCache;
+выводятся медиана и 95-й перцентиль времени получения HTML. С кэшем перцентили не
+должны зависеть от количества рекомендаций.
+
+Запуск:
+    python benchmarks/page_render_benchmark.py --counts 10,100,500 --repeat 200
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+# Веб-сервер создает каталоги шаблонов и статических файлов относительно рабочего каталога
+os.chdir(ROOT_DIR)
+
+from starlette.requests import Request
+
+from modules.api.server import app, templates
+from modules.api.fragment_cache import FragmentCache
+from modules.utils.config import HOSTS
+
+def make_request():
+    """Запрос, достаточный для url_for в шаблонах"""
+    return Request({
+        "type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": [],
+        "scheme": "http", "server": ("localhost", 8000), "root_path": "",
+        "app": app, "router": app.router,
+    })
+
+def make_context(request, count):
+    """Контекст страницы эпизода с count рекомендациями"""
+    episode = {
+        "id": 1, "episode_number": 900, "title": "Радио-Т 900", "published_date": "2024-01-01",
+        "processed": 2, "updated_at": "2024-01-01 00:00:00",
+        "status": {"exists": True, "downloaded": True, "transcribed": True, "recommendations": True, "processed": 2},
+    }
+    recommendations = [
+        {
+            "id": index, "name": f"Продукт {index}", "description": "Описание продукта " * 8,
+            "mentioned_by": HOSTS[index % len(HOSTS)], "hosts_opinion": "Положительное",
+            "ai_comment": "Комментарий " * 4, "website": f"https://example.com/{index}",
+            "timestamp": "00:12:34", "confidence": 90,
+        }
+        for index in range(count)
+    ]
+    return {"request": request, "episode": episode, "recommendations": recommendations,
+            "hosts": HOSTS, "task_status": None}
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def measure(name, context, repeat, cache=None):
+    """Время получения HTML страницы в миллисекундах для repeat запросов"""
+    template = templates.get_template(name)
+    key = (context["episode"]["episode_number"], name, len(context["recommendations"]))
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if cache is None:
+            template.render(context).encode("utf-8")
+        elif cache.get(key) is None:
+            # Как render_episode_page в веб-сервере: отрисовка при промахе и сохранение в кэш
+            cache.put(key, template.render(context).encode("utf-8"))
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), percentile(samples, 0.95)
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк отрисовки страниц эпизода")
+    parser.add_argument("--counts", default="10,100,500", help="Количество рекомендаций через запятую")
+    parser.add_argument("--repeat", type=int, default=200, help="Количество запросов каждой страницы")
+    parser.add_argument("--template", default="recommendations.html",
+                        choices=["recommendations.html", "episode_details.html"])
+    args = parser.parse_args()
+
+    request = make_request()
+    print(f"{'рекомендаций':>12} {'без кэша p50':>13} {'p95, мс':>8} {'с кэшем p50':>12} {'p95, мс':>8}")
+    for count in [int(value) for value in args.counts.split(",")]:
+        context = make_context(request, count)
+        plain = measure(args.template, context, args.repeat)
+        cached = measure(args.template, context, args.repeat, FragmentCache())
+        print(f"{count:>12} {plain[0]:>13.2f} {plain[1]:>8.2f} {cached[0]:>12.3f} {cached[1]:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк сериализации JSON: стоимость ответа в пересчете на 1000 строк
+
+Сравниваются путь старого /episodes (проверка pydantic response_model,
+jsonable_encoder и json.dumps), компактный json.dumps, orjson (если установлен)
+и orjson с выбором полей, как в /api/v1/episodes?fields=episode_number,title.
+
+Запуск:
+    python benchmarks/serialization_benchmark.py --rows 1000 --repeat 50
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from typing import List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.chdir(ROOT_DIR)
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from modules.api.server import Episode
+from modules.api.serialization import orjson, select_fields
+
+def make_episodes(count):
+    """Строки эпизодов в том виде, в каком их возвращает get_episodes_page"""
+    rows = []
+    for number in range(count, 0, -1):
+        status = {
+            "exists": True, "downloaded": True, "transcribed": True, "recommendations": True, "processed": 2,
+            "audio_path": f"downloads/episode_{number}.mp3",
+            "transcript_path": f"transcripts/episode_{number}_transcript.txt",
+            "recommendations_path": f"recommendations/episode_{number}_products.json",
+            "audio_size": 98_000_000, "transcript_size": 120_000, "recommendations_size": 9_000,
+            "downloaded_at": "2024-01-01 10:00:00", "transcribed_at": "2024-01-01 11:00:00",
+            "extracted_at": "2024-01-01 11:05:00", "download_seconds": 12.5,
+            "transcribe_seconds": 3400.0, "extract_seconds": 45.2, "updated_at": "2024-01-01 11:05:00",
+        }
+        rows.append({
+            "id": number, "episode_number": number, "title": f"Радио-Т {number}",
+            "published_date": "2024-01-01 10:00:00", "processed": 2,
+            "updated_at": "2024-01-01 11:05:00", "status": status,
+        })
+    return rows
+
+def serializers():
+    """Название -> функция (rows) -> bytes"""
+    adapter = TypeAdapter(List[Episode])
+
+    def response_model(rows):
+        # То же, что делает FastAPI для response_model=List[Episode]
+        validated = adapter.validate_python(rows)
+        return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+    def compact_json(rows):
+        return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    result = {"response_model + json": response_model, "json (компактный)": compact_json}
+    if orjson is not None:
+        result["orjson"] = orjson.dumps
+        result["orjson, 2 поля"] = lambda rows: orjson.dumps(select_fields(rows, ["episode_number", "title"]))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации JSON")
+    parser.add_argument("--rows", type=int, default=1000, help="Количество строк в ответе")
+    parser.add_argument("--repeat", type=int, default=50, help="Количество повторов")
+    args = parser.parse_args()
+
+    rows = make_episodes(args.rows)
+    if orjson is None:
+        print("orjson не установлен: pip install orjson")
+
+    print(f"{'сериализатор':<24} {'мс на 1000 строк':>17} {'размер, КБ':>11}")
+    for name, serialize in serializers().items():
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            payload = serialize(rows)
+            samples.append(time.perf_counter() - started)
+        per_1k = statistics.median(samples) * 1000 * 1000 / args.rows
+        print(f"{name:<24} {per_1k:>17.2f} {len(payload) / 1024:>11.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк запуска: время импорта и память процесса для разных точек входа
+
+Каждая точка входа импортируется в отдельном чистом процессе интерпретатора;
+выводятся медианное время импорта, пиковая резидентная память (RSS) процесса
+и то, какие библиотеки машинного обучения (torch, whisper, openai) оказались загружены.
+Веб-интерфейс и консольный просмотр архива не должны загружать ни одну из них.
+
+Запуск:
+    python benchmarks/startup_benchmark.py --repeat 5
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Точки входа: название -> импортируемый модуль
+TARGETS = {
+    "web": "modules.api.server",
+    "cli": "modules.console.cli",
+    "worker": "modules.core.worker",
+    "processing": "modules.core.podcast",
+}
+
+HEAVY_MODULES = ("torch", "whisper", "openai")
+
+# Код, выполняемый в дочернем процессе: импорт модуля и замер времени и памяти
+_PROBE = """
+import sys, time, json, resource
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+if {load_ml}:
+    started = time.perf_counter()
+    for name in {heavy!r}:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    elapsed += time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == "darwin":
+    rss //= 1024
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": rss / 1024,
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+def measure(module, load_ml=False):
+    """Импортировать модуль в новом процессе и вернуть время, память и загруженные тяжелые модули"""
+    code = _PROBE.format(root=ROOT_DIR, module=module, load_ml=load_ml, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT_DIR,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run_benchmark(targets, repeat, with_ml_baseline=True):
+    """
+    Замерить каждую точку входа repeat раз
+
+    Returns:
+        list: Строки результата (название, медианное время, медианная память, тяжелые модули)
+    """
+    runs = [(name, TARGETS[name], False) for name in targets]
+    if with_ml_baseline:
+        # Для сравнения: то же, что делал процесс до отложенных импортов
+        runs.append(("web + ML", TARGETS["web"], True))
+
+    rows = []
+    for name, module, load_ml in runs:
+        samples = [measure(module, load_ml) for _ in range(repeat)]
+        rows.append((
+            name,
+            statistics.median(sample["seconds"] for sample in samples),
+            statistics.median(sample["rss_mb"] for sample in samples),
+            samples[-1]["heavy"],
+        ))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк времени запуска и памяти")
+    parser.add_argument("--repeat", type=int, default=5, help="Количество запусков каждой точки входа")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Точки входа через запятую")
+    parser.add_argument("--no-ml-baseline", action="store_true", help="Не замерять импорт с библиотеками ML")
+    args = parser.parse_args()
+
+    targets = [name.strip() for name in args.targets.split(",") if name.strip()]
+    unknown = [name for name in targets if name not in TARGETS]
+    if unknown:
+        parser.error(f"Неизвестные точки входа: {', '.join(unknown)}")
+
+    print(f"{'точка входа':<12} {'импорт, с':>10} {'RSS, МБ':>9}  загружены ML-библиотеки")
+    for name, seconds, rss_mb, heavy in run_benchmark(targets, args.repeat, not args.no_ml_baseline):
+        print(f"{name:<12} {seconds:>10.2f} {rss_mb:>9.0f}  {', '.join(heavy) or '-'}")
+
+if __name__ == "__main__":
+    main()
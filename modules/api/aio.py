@@ -0,0 +1,135 @@
+"""
+Асинхронный слой доступа к данным и сети для веб-сервера
+
+Блокирующие вызовы (sqlite3, файловая система) выполняются в ограниченном пуле потоков,
+а RSS-лента загружается асинхронным HTTP-клиентом httpx, поэтому медленный запрос
+не останавливает цикл событий и остальные запросы обслуживаются параллельно.
+
+Запросы страниц сначала ждут друг друга на asyncio.Lock, а затем берут общую с
+синхронной загрузкой блокировку feed_fetch_lock (modules/utils/feed.py): лента, которую
+одновременно обновляют страница и опрос ленты в том же процессе, загружается один раз.
+"""
+
+import time
+import asyncio
+import functools
+import logging
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from modules.utils.config import RSS_URL, RSS_FETCH_TIMEOUT, WEB_IO_THREADS
+from modules.utils.http_client import create_async_client
+from modules.utils.feed import (
+    FeedParser, FEED_CHUNK_SIZE, feed_fetch_lock, get_cached_feed_episodes, get_feed_episodes_fetched_since,
+    get_feed_parse_limit, get_feed_request_headers, store_feed_not_modified, store_feed_episodes,
+    get_stale_feed_episodes
+)
+
+logger = logging.getLogger(__name__)
+
+# Пул потоков для блокирующих операций
+_executor = ThreadPoolExecutor(max_workers=WEB_IO_THREADS, thread_name_prefix="web-io")
+
+# Общий HTTP-клиент (создается при первом обращении)
+_http_client = None
+
+# Блокировка, чтобы параллельные запросы страниц не загружали ленту одновременно
+_feed_lock = None
+
+async def run_blocking(func, *args, **kwargs):
+    """Выполнить блокирующую функцию в пуле потоков и дождаться результата"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def get_http_client():
+    """Получить общий асинхронный HTTP-клиент"""
+    global _http_client
+    if _http_client is None:
+        _http_client = create_async_client(RSS_FETCH_TIMEOUT)
+    return _http_client
+
+async def close_http_client():
+    """Закрыть общий HTTP-клиент (вызывается при остановке сервера)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def _acquire_thread_lock(lock):
+    """
+    Захватить threading.Lock из цикла событий (ожидание идет в пуле потоков)
+
+    Если ожидание прервано отменой, блокировка освобождается сразу после захвата.
+    """
+    future = asyncio.ensure_future(run_blocking(lock.acquire))
+    try:
+        await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(lambda done: lock.release() if not done.cancelled() and done.result() else None)
+        raise
+
+async def _download_feed_async(headers, limit):
+    """Асинхронно загрузить и разобрать ленту потоком, прекращая загрузку после get_feed_parse_limit(limit) эпизодов"""
+    parse_limit = await run_blocking(get_feed_parse_limit, limit)
+    async with get_http_client().stream("GET", RSS_URL, headers=headers) as response:
+        if response.status_code == 304:
+            return await run_blocking(store_feed_not_modified, limit)
+
+        if response.status_code != 200:
+            logger.error(f"Ошибка загрузки RSS: {response.status_code}")
+            return await run_blocking(get_stale_feed_episodes, limit)
+
+        # Части ленты небольшие, поэтому их разбор не блокирует цикл событий надолго
+        parser = FeedParser(parse_limit)
+        async for chunk in response.aiter_bytes(FEED_CHUNK_SIZE):
+            parser.feed(chunk)
+            if parser.done:
+                break
+        parser.close()
+
+    return await run_blocking(store_feed_episodes, response.headers, parser, limit)
+
+async def get_all_episodes_from_rss_async(limit=10):
+    """Асинхронно получить информацию о последних эпизодах подкаста из RSS (с учетом кэша ленты)"""
+    global _feed_lock
+
+    episodes = await run_blocking(get_cached_feed_episodes, limit)
+    if episodes is not None:
+        return episodes
+
+    if _feed_lock is None:
+        _feed_lock = asyncio.Lock()
+
+    started_at = time.time()
+    async with _feed_lock:
+        await _acquire_thread_lock(feed_fetch_lock)
+        try:
+            # Пока мы ждали блокировки, ленту мог обновить другой запрос или опрос ленты
+            episodes = await run_blocking(get_feed_episodes_fetched_since, started_at, limit)
+            if episodes is not None:
+                return episodes
+
+            for headers in (await run_blocking(get_feed_request_headers, limit), {}):
+                try:
+                    episodes = await _download_feed_async(headers, limit)
+                except (httpx.HTTPError, ET.ParseError) as e:
+                    logger.error(f"Ошибка загрузки RSS: {str(e)}")
+                    return await run_blocking(get_stale_feed_episodes, limit)
+
+                if episodes is not None:
+                    return episodes
+        finally:
+            feed_fetch_lock.release()
+
+    return []
+
+async def get_latest_episode_async():
+    """Асинхронно получить информацию о последнем эпизоде подкаста"""
+    episodes = await get_all_episodes_from_rss_async(1)
+    return episodes[0] if episodes else None
+
+def shutdown_executor():
+    """Остановить пул потоков"""
+    _executor.shutdown(wait=False)
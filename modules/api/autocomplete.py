@@ -0,0 +1,188 @@
+"""
+Индекс автодополнения названий продуктов в памяти веб-сервера
+
+Отсортированный массив пар (термин, ключ продукта) и bisect: поиск по префиксу -
+двоичный поиск начала диапазона и проход по терминам с этим префиксом. Терминами
+продукта служат его каноническое название (ключ analytics_products) и все его
+окончания, начинающиеся с нового слова, поэтому "code" находит "Visual Studio Code".
+Совпадения ранжируются по количеству упоминаний в архиве. Под короткие префиксы
+(1-3 символа) подходят тысячи терминов, поэтому их лучшие продукты хранятся готовыми
+и пересчитываются только для префиксов изменившихся продуктов.
+
+Индекс загружается при запуске сервера, а затем обновляется инкрементально по журналу
+analytics_product_changes: после завершения задачи обработки и не реже, чем раз в
+AUTOCOMPLETE_REFRESH_INTERVAL секунд при обращениях к /autocomplete.
+"""
+
+import re
+import time
+import heapq
+import logging
+import threading
+from bisect import bisect_left, insort
+
+from modules.utils.config import AUTOCOMPLETE_REFRESH_INTERVAL
+from modules.utils.helpers import normalize_product_name
+from modules.utils.analytics import get_product_names, get_product_changes
+
+logger = logging.getLogger(__name__)
+
+# Границы слов в названии продукта, с которых может начинаться поиск
+_WORD_RE = re.compile(r"[^\s\-./_()]+")
+
+# Сколько результатов запросов хранится до следующего изменения индекса
+_MEMO_SIZE = 4096
+
+# Префиксы до этой длины ранжируются заранее, и для каждого хранится до _SHORT_PREFIX_TOP продуктов
+_SHORT_PREFIX_LEN = 3
+_SHORT_PREFIX_TOP = 50
+
+def _product_terms(product_key):
+    """Термины продукта: название и его окончания с начала каждого слова"""
+    terms = []
+    for match in _WORD_RE.finditer(product_key):
+        term = product_key[match.start():]
+        if term not in terms:
+            terms.append(term)
+    return terms or [product_key]
+
+def _short_prefixes(terms):
+    """Короткие префиксы терминов, для которых хранится готовое ранжирование"""
+    return {term[:length] for term in terms for length in range(1, min(len(term), _SHORT_PREFIX_LEN) + 1)}
+
+class ProductPrefixIndex:
+    """Префиксный индекс названий продуктов с ранжированием по количеству упоминаний"""
+
+    def __init__(self):
+        self._terms = []
+        self._products = {}
+        self._short_top = {}
+        self._memo = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.last_seq = None
+        self.refreshed_at = 0.0
+
+    def __len__(self):
+        return len(self._products)
+
+    def load(self, rows, last_seq):
+        """Построить индекс заново из строк (product_key, product_name, mention_count)"""
+        products = {key: (name, count or 0) for key, name, count in rows if key}
+        terms = sorted((term, key) for key in products for term in _product_terms(key))
+        with self._lock:
+            self._products = products
+            self._terms = terms
+            self._short_top = {}
+            self._update_short_prefixes(_short_prefixes(term for term, _ in terms))
+            self._memo = {}
+            self.last_seq = last_seq
+
+    def apply(self, rows, last_seq):
+        """Применить изменения: (product_key, product_name, mention_count), None - продукт удален"""
+        with self._lock:
+            affected = set()
+            for key, name, count in rows:
+                if not key:
+                    continue
+                known = key in self._products
+                affected |= _short_prefixes(_product_terms(key))
+                if count is None:
+                    if known:
+                        del self._products[key]
+                        for term in _product_terms(key):
+                            index = bisect_left(self._terms, (term, key))
+                            if index < len(self._terms) and self._terms[index] == (term, key):
+                                del self._terms[index]
+                    continue
+                # Термины зависят только от ключа, поэтому известному продукту достаточно обновить счетчик
+                self._products[key] = (name, count)
+                if not known:
+                    for term in _product_terms(key):
+                        insort(self._terms, (term, key))
+            if rows:
+                self._update_short_prefixes(affected)
+                self._memo = {}
+            self.last_seq = last_seq
+
+    def _rank(self, prefix, limit):
+        """Ранжировать продукты по префиксу проходом по диапазону терминов (под self._lock)"""
+        # Ключ -> совпадает ли prefix с началом названия (а не только с одним из слов)
+        matches = {}
+        terms = self._terms
+        index = bisect_left(terms, (prefix,))
+        while index < len(terms) and terms[index][0].startswith(prefix):
+            term, key = terms[index]
+            matches[key] = matches.get(key, False) or term == key
+            index += 1
+
+        products = self._products
+        return heapq.nsmallest(limit, matches, key=lambda key: (-products[key][1], not matches[key], key))
+
+    def _update_short_prefixes(self, prefixes):
+        """Пересчитать готовое ранжирование коротких префиксов (под self._lock)"""
+        for prefix in prefixes:
+            top = self._rank(prefix, _SHORT_PREFIX_TOP)
+            if top:
+                self._short_top[prefix] = top
+            else:
+                self._short_top.pop(prefix, None)
+
+    def search(self, prefix, limit=10):
+        """
+        Продукты, название или слово названия которых начинается с prefix
+
+        Returns:
+            list: До limit словарей {"key", "name", "mention_count"} по убыванию упоминаний;
+                при равенстве выше продукты, название которых начинается с prefix
+        """
+        prefix = normalize_product_name(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            cached = self._memo.get((prefix, limit))
+            if cached is not None:
+                return cached
+
+            if len(prefix) <= _SHORT_PREFIX_LEN and limit <= _SHORT_PREFIX_TOP:
+                top = self._short_top.get(prefix, [])[:limit]
+            else:
+                top = self._rank(prefix, limit)
+
+            products = self._products
+            result = [{"key": key, "name": products[key][0], "mention_count": products[key][1]} for key in top]
+
+            if len(self._memo) >= _MEMO_SIZE:
+                self._memo.clear()
+            self._memo[(prefix, limit)] = result
+            return result
+
+    def refresh_due(self):
+        """Пора ли проверить журнал изменений (прошло AUTOCOMPLETE_REFRESH_INTERVAL секунд)"""
+        return time.monotonic() - self.refreshed_at >= AUTOCOMPLETE_REFRESH_INTERVAL
+
+    def refresh(self):
+        """
+        Загрузить изменения продуктов из базы данных (блокирующий вызов)
+
+        Первый вызов строит индекс целиком; одновременные вызовы не дублируют работу.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.refreshed_at = time.monotonic()
+            changes = None
+            if self.last_seq is not None:
+                changes = get_product_changes(self.last_seq)
+            if changes is None:
+                rows, last_seq = get_product_names()
+                self.load(rows, last_seq)
+                logger.info(f"Индекс автодополнения построен: продуктов {len(self)}")
+            else:
+                rows, last_seq = changes
+                self.apply(rows, last_seq)
+                if rows:
+                    logger.info(f"Индекс автодополнения обновлен: изменено продуктов {len(rows)}")
+        finally:
+            self._refresh_lock.release()
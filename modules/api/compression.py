@@ -0,0 +1,149 @@
+"""
+Сжатие ответов веб-сервера (brotli или gzip)
+
+Сжимаются текстовые ответы (HTML, CSS, JavaScript, JSON) размером не меньше
+COMPRESSION_MIN_SIZE байт. Кодировка выбирается по Accept-Encoding: brotli, если
+клиент его принимает и установлен пакет brotli, иначе gzip. Потоковые ответы
+сжимаются по частям со сбросом буфера после каждой части, чтобы сжатие не задерживало
+данные; поток событий (text/event-stream) не сжимается вовсе.
+"""
+
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from modules.utils.config import COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Типы содержимого, которые имеет смысл сжимать
+_COMPRESSIBLE_TYPES = (
+    "text/html", "text/css", "text/plain", "text/csv", "text/xml",
+    "application/json", "application/javascript", "text/javascript",
+    "application/x-ndjson", "application/xml", "image/svg+xml",
+)
+
+def _accepted_encodings(accept_encoding):
+    """Кодировки из Accept-Encoding с ненулевым весом"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name and weight > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+def choose_encoding(accept_encoding):
+    """Выбрать кодировку сжатия для запроса или None"""
+    accepted = _accepted_encodings(accept_encoding or "")
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+def _is_compressible(headers):
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type in _COMPRESSIBLE_TYPES and "content-encoding" not in headers
+
+class _Compressor:
+    """Потоковый компрессор с единым интерфейсом для gzip и brotli"""
+
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits 16 + MAX_WBITS - формат gzip (заголовок и контрольная сумма)
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, final):
+        """Сжать часть данных; final - последняя часть ответа"""
+        if self._brotli is not None:
+            chunk = self._brotli.process(data)
+            return chunk + (self._brotli.finish() if final else self._brotli.flush())
+        chunk = self._zlib.compress(data)
+        return chunk + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """ASGI-middleware сжатия ответов с порогом размера"""
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE,
+                 gzip_level=COMPRESSION_GZIP_LEVEL, brotli_quality=COMPRESSION_BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                # Заголовки отправляются вместе с первой частью тела, когда известен ее размер
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if (not _is_compressible(headers)
+                        or start_message["status"] in (204, 206, 304)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    # Сжатое представление отличается от исходного побайтно
+                    headers["ETag"] = "W/" + headers["etag"]
+                del headers["Content-Length"]
+                body = compressor.compress(body, not more_body)
+                if not more_body:
+                    headers["Content-Length"] = str(len(body))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            await send({
+                "type": "http.response.body",
+                "body": compressor.compress(body, not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_compressed)
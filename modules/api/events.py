@@ -0,0 +1,167 @@
+"""
+Поток событий прогресса задач для веб-интерфейса (Server-Sent Events)
+
+Задачи выполняют воркеры в других процессах и пишут прогресс в таблицу jobs, поэтому
+веб-сервер узнает об изменениях из базы данных. Вместо запроса /tasks/{id} от каждой
+вкладки раз в секунду один наблюдатель на весь процесс проверяет PRAGMA data_version
+(меняется при каждой фиксации транзакции другим соединением и не читает таблицы) и
+перечитывает задачи одним запросом только после изменений.
+
+Тот же наблюдатель сообщает обработчикам завершения (add_finish_listener) о всех задачах,
+перешедших в конечное состояние, по номеру завершения jobs.finish_seq (растет в порядке
+фиксации транзакций) - независимо от того, открыт ли поток событий задачи и кто ее
+поставил (веб-интерфейс, опрос ленты, другой процесс).
+Пока потоков событий нет, изменения проверяются раз в TASK_EVENTS_IDLE_POLL_INTERVAL секунд.
+"""
+
+import json
+import asyncio
+import sqlite3
+import logging
+
+from modules.api.aio import run_blocking
+from modules.utils.config import DB_PATH, TASK_EVENTS_POLL_INTERVAL, TASK_EVENTS_IDLE_POLL_INTERVAL
+from modules.utils.jobs import get_latest_jobs, get_finished_jobs
+
+logger = logging.getLogger(__name__)
+
+# Состояния, после которых поток событий задачи закрывается
+FINAL_JOB_STATUSES = ("completed", "failed", "cancelled")
+
+# Сколько необработанных событий хранится для медленного клиента (старые отбрасываются)
+_SUBSCRIBER_QUEUE_SIZE = 16
+
+def _job_state(job):
+    """Поля задачи, изменение которых нужно отправить клиенту"""
+    return (job["id"], job["status"], job["progress"], job["message"], job.get("queue_position"))
+
+def format_sse(data):
+    """Сообщение Server-Sent Events с JSON-данными"""
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class TaskEventHub:
+    """Рассылка изменений задач подписчикам (очередям asyncio потоков событий)"""
+
+    def __init__(self, poll_interval=TASK_EVENTS_POLL_INTERVAL, idle_poll_interval=TASK_EVENTS_IDLE_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.idle_poll_interval = idle_poll_interval
+        self._subscribers = {}
+        self._states = {}
+        self._watcher = None
+        self._wakeup = None
+        self._conn = None
+        self._finish_listeners = []
+        self._finished_mark = None
+
+    def add_finish_listener(self, callback):
+        """
+        Вызывать callback(job) в цикле событий, когда любая задача переходит в конечное
+        состояние (наблюдение нужно запустить методом start())
+        """
+        self._finish_listeners.append(callback)
+
+    def start(self):
+        """Запустить наблюдатель (вызывается при запуске сервера из цикла событий)"""
+        if self._watcher is None or self._watcher.done():
+            self._wakeup = asyncio.Event()
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        """Остановить наблюдатель (при остановке сервера)"""
+        if self._watcher is not None and not self._watcher.done():
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+        self._watcher = None
+
+    def subscribe(self, task_id):
+        """Подписаться на изменения задачи; возвращает очередь событий"""
+        queue = asyncio.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        self.start()
+        # Наблюдатель мог ждать с интервалом простоя - проверяем задачу сразу
+        self.notify()
+        return queue
+
+    def unsubscribe(self, task_id, queue):
+        """Отписаться от изменений задачи"""
+        queues = self._subscribers.get(task_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[task_id]
+            self._states.pop(task_id, None)
+
+    def notify(self):
+        """Проверить задачи немедленно (после изменения задачи в этом процессе)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _data_version(self):
+        # Соединение используется только наблюдателем, вызовы идут последовательно
+        if self._conn is None:
+            self._conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _close_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _publish(self, task_id, job):
+        """Отправить новое состояние задачи подписчикам, если оно изменилось"""
+        state = _job_state(job)
+        if self._states.get(task_id) == state:
+            return
+        self._states[task_id] = state
+
+        for queue in self._subscribers.get(task_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(job)
+
+    async def _notify_finished(self):
+        """Вызвать обработчики завершения для задач, завершившихся с прошлой проверки"""
+        jobs, self._finished_mark = await run_blocking(get_finished_jobs, self._finished_mark)
+        for job in jobs:
+            for callback in self._finish_listeners:
+                try:
+                    callback(job)
+                except Exception as e:
+                    logger.warning(f"Ошибка обработчика завершения задачи {job['id']}: {str(e)}")
+
+    async def _watch(self):
+        """Следить за изменениями базы данных, пока есть подписчики или обработчики завершения"""
+        version = None
+        try:
+            while self._subscribers or self._finish_listeners:
+                try:
+                    if self._finish_listeners and self._finished_mark is None:
+                        # Задачи, завершившиеся до запуска наблюдателя, не сообщаются
+                        _, self._finished_mark = await run_blocking(get_finished_jobs)
+                    current = await run_blocking(self._data_version)
+                    if current != version or self._wakeup.is_set():
+                        version = current
+                        self._wakeup.clear()
+                        if self._subscribers:
+                            jobs = await run_blocking(get_latest_jobs, list(self._subscribers))
+                            for task_id, job in jobs.items():
+                                self._publish(task_id, job)
+                        if self._finish_listeners:
+                            await self._notify_finished()
+                except sqlite3.Error as e:
+                    logger.warning(f"Ошибка чтения задач для потока событий: {str(e)}")
+                    self._close_connection()
+                    version = None
+
+                interval = self.poll_interval if self._subscribers else self.idle_poll_interval
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Без await: между проверкой подписчиков и завершением задачи не должно быть переключений
+            self._close_connection()
@@ -0,0 +1,81 @@
+"""
+Кэш отрисованных страниц эпизодов в памяти процесса веб-сервера
+
+Отрисовка recommendations.html и episode_details.html для эпизода с сотнями продуктов
+занимает больше времени, чем все остальное в обработке запроса, а результат меняется
+только при изменении данных эпизода. Кэш хранит готовый HTML по ключу (эпизод, шаблон,
+версия данных), где версия - ETag ответа (см. modules/api/http_cache.py), поэтому
+изменение эпизода другим процессом само приводит к промаху. Записи эпизода удаляются
+явно, когда веб-сервер узнает о завершении задачи его обработки.
+
+Фрагменты хранятся закодированными в UTF-8 (bytes), поэтому FRAGMENT_CACHE_MAX_BYTES
+ограничивает реальный объем: страницы в основном на кириллице, и длина строки
+в символах примерно вдвое меньше размера в байтах.
+"""
+
+import threading
+from collections import OrderedDict
+
+from modules.utils.config import FRAGMENT_CACHE_MAX_BYTES
+
+class FragmentCache:
+    """LRU-кэш отрисованных фрагментов с ограничением суммарного размера"""
+
+    def __init__(self, max_bytes=FRAGMENT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Получить фрагмент по ключу (episode_number, ...) или None"""
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def put(self, key, content):
+        """Сохранить фрагмент (bytes), вытесняя давно не использованные"""
+        size = len(content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = content
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def invalidate_episode(self, episode_number):
+        """Удалить все фрагменты эпизода (первый элемент ключа - номер эпизода)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == episode_number]:
+                self._size -= len(self._entries.pop(key))
+                self.invalidations += 1
+
+    def stats(self):
+        """Счетчики кэша для /stats/cache"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
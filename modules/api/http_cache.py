@@ -0,0 +1,112 @@
+"""
+HTTP-кэширование страниц и JSON эпизодов
+
+Валидаторы строятся из строки эпизода: updated_at меняется при каждом завершении
+или сбросе этапа обработки, поэтому ETag и Last-Modified можно вычислить одним
+запросом по индексу, не читая рекомендации и не отрисовывая шаблон. Если клиент
+прислал совпадающий If-None-Match (или If-Modified-Since), отвечаем 304.
+
+Полностью обработанный эпизод без активной задачи не меняется, поэтому браузер и
+прокси могут отдавать его из кэша EPISODE_CACHE_MAX_AGE секунд без обращения к
+приложению; ответы для эпизодов в обработке всегда перепроверяются (no-cache).
+"""
+
+import os
+import time
+import hashlib
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Response
+
+from modules.utils.config import EPISODE_CACHE_MAX_AGE, EPISODE_CACHE_STALE
+
+# Состояния задачи, при которых страница эпизода еще может измениться
+_ACTIVE_JOB_STATUSES = ("queued", "running")
+
+def _http_date(updated_at):
+    """Время из базы данных (локальное, "%Y-%m-%d %H:%M:%S") в формате HTTP-даты"""
+    if not updated_at:
+        return None
+    try:
+        timestamp = time.mktime(datetime.strptime(updated_at, "%Y-%m-%d %H:%M:%S").timetuple())
+    except ValueError:
+        return None
+    return formatdate(timestamp, usegmt=True)
+
+def template_version(templates, name):
+    """Версия шаблона (время изменения файла): правка шаблона должна менять ETag страниц"""
+    try:
+        return int(os.path.getmtime(os.path.join(templates.env.loader.searchpath[0], name)))
+    except (OSError, AttributeError, IndexError):
+        return 0
+
+def episode_validators(kind, episode, *extra):
+    """
+    Валидаторы ответа для эпизода
+
+    Args:
+        kind: Вид ответа ("json", "details", ...), чтобы у разных представлений были разные ETag
+        episode: Эпизод из get_episode_by_number
+        extra: Дополнительные значения, от которых зависит ответ (версия шаблона, статус задачи)
+
+    Returns:
+        tuple: (ETag, Last-Modified или None)
+    """
+    status = episode["status"]
+    parts = [
+        kind, episode["episode_number"], episode["updated_at"], episode["processed"],
+        status["downloaded"], status["transcribed"], status["recommendations"],
+        status.get("recommendations_size"), *extra
+    ]
+    digest = hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"', _http_date(episode["updated_at"])
+
+def is_episode_final(episode, job):
+    """
+    Эпизод полностью обработан и не стоит в очереди - ответ можно кэшировать
+
+    Args:
+        episode: Строка эпизода
+        job: Последняя задача обработки эпизода (None - задач не было)
+    """
+    return episode["processed"] == 2 and not (job and job["status"] in _ACTIVE_JOB_STATUSES)
+
+def cache_headers(etag, last_modified, final):
+    """Заголовки кэширования для ответа с валидаторами"""
+    headers = {"ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if final:
+        headers["Cache-Control"] = (
+            f"public, max-age={EPISODE_CACHE_MAX_AGE}, stale-while-revalidate={EPISODE_CACHE_STALE}"
+        )
+    else:
+        headers["Cache-Control"] = "no-cache"
+    return headers
+
+def _etag_matches(if_none_match, etag):
+    """Слабое сравнение ETag для If-None-Match (RFC 9110, раздел 13.1.2)"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def is_not_modified(request, etag, last_modified):
+    """Проверить условные заголовки запроса: True, если можно ответить 304"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match имеет приоритет, If-Modified-Since при нем игнорируется
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def not_modified_response(headers):
+    """Ответ 304 Not Modified с теми же валидаторами и Cache-Control"""
+    return Response(status_code=304, headers=headers)
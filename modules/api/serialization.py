@@ -0,0 +1,75 @@
+"""
+Быстрая сериализация JSON для API
+
+Ответы /api/v1 собираются из словарей, прочитанных из базы данных, и сериализуются
+напрямую, без проверки через pydantic response_model и jsonable_encoder. Если
+установлен orjson, используется он, иначе - стандартный json в компактном виде.
+"""
+
+import json
+import base64
+
+from fastapi import HTTPException, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(content):
+    """Сериализовать в JSON (bytes в UTF-8)"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """JSON-ответ, сериализуемый функцией dumps()"""
+
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+def encode_cursor(kind, position):
+    """
+    Непрозрачный курсор страницы: вид выборки и позиция последней строки
+
+    Клиенты передают курсор обратно без разбора, поэтому формат позиции можно менять.
+    """
+    payload = json.dumps([kind, position], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+def decode_cursor(kind, cursor):
+    """Позиция из курсора encode_cursor(); HTTPException 400 для чужого или поврежденного курсора"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_kind, position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+    if cursor_kind != kind:
+        raise HTTPException(status_code=400, detail="Курсор относится к другой выборке")
+    return position
+
+def parse_fields(fields, allowed):
+    """
+    Список полей из параметра fields ("a,b,c"); None - все поля
+
+    Raises:
+        HTTPException: 400, если запрошено неизвестное поле
+    """
+    if not fields:
+        return None
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные поля: {', '.join(unknown)}. Доступные поля: {', '.join(allowed)}"
+        )
+    return selected
+
+def select_fields(rows, fields):
+    """Оставить в строках только выбранные поля (None - без изменений)"""
+    if fields is None:
+        return rows
+    return [{name: row[name] for name in fields} for row in rows]
@@ -4,25 +4,48 @@
 
 import os
 import json
+import asyncio
 import logging
-import multiprocessing
-import platform
+from datetime import date
 from typing import List, Optional
-from fastapi import FastAPI, Request, BackgroundTasks, HTTPException, Form
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Response, HTTPException, Form, Query
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
-from modules.core.podcast import (
-    get_latest_episode, get_all_episodes_from_rss, 
-    get_episode_status, process_episode, HOSTS
+from modules.api.aio import (
+    run_blocking, get_latest_episode_async, get_all_episodes_from_rss_async,
+    close_http_client, shutdown_executor
 )
 from modules.utils.database import (
     init_db, get_all_episodes, get_episode_recommendations,
-    search_recommendations
+    get_episode_by_number, get_episodes_page, search_recommendations_page, iter_recommendations
+)
+from modules.utils.analytics import (
+    get_top_products, get_product_stats, get_host_stats, get_mention_trends
 )
 from modules.utils import recover_episodes
+from modules.utils.config import (
+    HOSTS, REPAIR_STATUS_ON_START, EXPORT_DIR, FEED_POLLER_ENABLED, WEB_EMBEDDED_WORKERS, TASK_EVENTS_KEEPALIVE
+)
+from modules.utils.jobs import (
+    enqueue_job, get_job, request_job_cancel, episode_task_id, JOB_PRIORITY_MANUAL, JOB_PRIORITY_AUTO
+)
+from modules.core.poller import start_feed_poller, enqueue_new_episode
+from modules.core.worker import start_worker_processes, stop_worker_processes
+from modules.utils.scheduler import get_scheduler_status
+from modules.api.events import TaskEventHub, format_sse, FINAL_JOB_STATUSES
+from modules.api.fragment_cache import FragmentCache
+from modules.api.v1 import router as api_v1_router
+from modules.api.autocomplete import ProductPrefixIndex
+from modules.api.serialization import FastJSONResponse
+from modules.api.compression import CompressionMiddleware
+from modules.api.static_assets import StaticManifest, FingerprintedStaticFiles
+from modules.api.http_cache import (
+    episode_validators, is_episode_final, cache_headers, is_not_modified, not_modified_response, template_version
+)
+from modules.utils.export import export_archive, ExportInProgressError
+from modules.utils.http_client import get_http_metrics
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -36,9 +59,77 @@ os.makedirs("modules/api/static", exist_ok=True)
 # Инициализация FastAPI
 app = FastAPI(title="Радио-Т Транскрибер", description="Веб-интерфейс для управления транскрибированием подкаста Радио-Т")
 
-# Настройка статических файлов и шаблонов
-app.mount("/static", StaticFiles(directory="modules/api/static"), name="static")
+# Сжатие HTML, CSS и JSON (brotli или gzip)
+app.add_middleware(CompressionMiddleware)
+
+# Настройка статических файлов и шаблонов: static_url() в шаблонах дает URL с отпечатком содержимого
+static_manifest = StaticManifest("modules/api/static")
+app.mount("/static", FingerprintedStaticFiles(manifest=static_manifest), name="static")
 templates = Jinja2Templates(directory="modules/api/templates")
+templates.env.globals["static_url"] = static_manifest.url
+
+# Версионированный JSON API с курсорной пагинацией (modules/api/v1.py)
+app.include_router(api_v1_router)
+
+# Фоновый опрос RSS-ленты (включается переменной FEED_POLLER_ENABLED или start_server(poll=True))
+feed_poller_enabled = FEED_POLLER_ENABLED
+feed_poller_stop = None
+
+# Рассылка изменений задач в потоки событий /tasks/{task_id}/events
+task_events = TaskEventHub()
+
+# Кэш отрисованных страниц эпизодов; записи эпизода удаляются после завершения его задачи
+page_cache = FragmentCache()
+task_events.add_finish_listener(lambda job: page_cache.invalidate_episode(job["episode_number"]))
+
+# Префиксный индекс названий продуктов для /autocomplete; обновляется после обработки эпизодов
+product_index = ProductPrefixIndex()
+product_index_refreshes = set()
+
+def schedule_product_index_refresh():
+    """Загрузить изменения продуктов в индекс автодополнения в фоне (вызывается из цикла событий)"""
+    task = asyncio.get_running_loop().create_task(run_blocking(product_index.refresh))
+    # Ссылка на задачу хранится до ее завершения, чтобы ее не удалил сборщик мусора
+    product_index_refreshes.add(task)
+    task.add_done_callback(product_index_refreshes.discard)
+
+task_events.add_finish_listener(
+    lambda job: schedule_product_index_refresh() if job["status"] == "completed" else None
+)
+
+# Встроенные воркеры очереди задач (отдельные процессы, см. modules/core/worker.py)
+workers_stop = None
+worker_processes = []
+
+@app.on_event("startup")
+async def on_startup():
+    """Инициализация базы данных, отпечатков статики и индекса автодополнения, запуск воркеров и опроса RSS-ленты"""
+    global feed_poller_stop, workers_stop, worker_processes
+    await run_blocking(init_db)
+    await run_blocking(static_manifest.build)
+    await run_blocking(product_index.refresh)
+    # Наблюдатель задач сбрасывает кэш страниц и обновляет индекс после завершения любой задачи
+    task_events.start()
+    
+    if WEB_EMBEDDED_WORKERS > 0:
+        workers_stop, worker_processes = start_worker_processes(WEB_EMBEDDED_WORKERS)
+        logger.info(f"Запущено встроенных воркеров очереди: {len(worker_processes)}")
+    
+    if feed_poller_enabled:
+        # Опрос выполняется в отдельном потоке и ставит новые эпизоды в очередь задач
+        feed_poller_stop = start_feed_poller(enqueue_new_episode)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Остановка опроса ленты и воркеров, освобождение HTTP-клиента и пула потоков при остановке сервера"""
+    if feed_poller_stop is not None:
+        feed_poller_stop.set()
+    if workers_stop is not None:
+        # Воркеры возвращают выполняющиеся задачи в очередь и завершаются
+        await run_blocking(stop_worker_processes, workers_stop, worker_processes)
+    await task_events.stop()
+    await close_http_client()
+    shutdown_executor()
 
 # Модели данных
 class Episode(BaseModel):
@@ -59,145 +150,49 @@ class Recommendation(BaseModel):
     timestamp: Optional[str] = None
     confidence: Optional[int] = None
 
-# Фоновые задачи
-running_tasks = {}
-
-# Установка метода запуска процессов для Windows - делаем это на уровне модуля
-if platform.system() == 'Windows':
-    try:
-        multiprocessing.set_start_method('spawn', force=True)
-    except RuntimeError:
-        # Если метод уже был установлен, игнорируем ошибку
-        pass
-
-# Функция для запуска в отдельном процессе - на верхнем уровне модуля
-def run_process_episode_task(episode_number, force_retranscribe, result_queue, progress_file):
-    """Функция для запуска в отдельном процессе"""
-    try:
-        # Импорт внутри функции для доступа к свежим данным в новом процессе
-        import os
-        from modules.core.podcast import process_episode as core_process_episode
-        import logging
-        
-        logger = logging.getLogger(__name__)
-        
-        # Функция обратного вызова для обновления статуса
-        def status_update_callback(message, progress):
-            if progress is not None:
-                result_queue.put(("update", message, progress))
-        
-        # Запуск обработки эпизода с функцией обратного вызова
-        result = core_process_episode(episode_number, force_retranscribe, status_update_callback)
-        
-        # Сообщаем результат
-        if result:
-            result_queue.put(("completed", "Эпизод успешно обработан", 100))
-        else:
-            result_queue.put(("failed", "При обработке эпизода возникли ошибки", 0))
-    except Exception as e:
-        import traceback
-        error_msg = f"Ошибка: {str(e)}\n{traceback.format_exc()}"
-        result_queue.put(("failed", error_msg, 0))
-        
-        # Удаление файла прогресса в случае ошибки
-        try:
-            if os.path.exists(progress_file):
-                os.remove(progress_file)
-                logger.info("Файл прогресса удален после ошибки")
-        except:
-            pass
-
-async def process_episode_task(episode_number: int, force_retranscribe: bool = False):
-    """Фоновая задача для обработки эпизода"""
-    import os
-    
-    task_id = f"episode_{episode_number}"
-    running_tasks[task_id] = {"status": "running", "progress": 0, "message": "Начало обработки эпизода"}
-    
-    # Очищаем файл прогресса транскрибирования перед запуском, если он существует
-    progress_file = "transcribe_progress.txt"
-    if os.path.exists(progress_file):
-        try:
-            os.remove(progress_file)
-            logger.info(f"Предыдущий файл прогресса удален")
-        except Exception as e:
-            logger.warning(f"Не удалось удалить файл прогресса: {str(e)}")
-    
-    # Создаем очередь для обмена данными между процессами
-    result_queue = multiprocessing.Queue()
-    
-    # Запускаем процесс с функцией верхнего уровня
-    process = multiprocessing.Process(
-        target=run_process_episode_task,
-        args=(episode_number, force_retranscribe, result_queue, progress_file)
-    )
-    process.daemon = True  # Процесс завершится, когда основной процесс завершится
-    process.start()
+def enqueue_episode_processing(episode_number, force_retranscribe=False, priority=JOB_PRIORITY_AUTO):
+    """
+    Поставить эпизод в очередь задач (блокирующий вызов)
     
-    # Запускаем задачу опроса статуса в фоновом режиме
-    import asyncio
+    Returns:
+        bool: True, если задача поставлена, False - если эпизод уже в очереди или обрабатывается
+    """
+    _, created = enqueue_job(episode_number, force_retranscribe, priority)
+    return created
+
+async def render_episode_page(request, name, episode, version, context):
+    """
+    Отрисовать страницу эпизода или взять готовую из page_cache
     
-    async def monitor_process():
-        while process.is_alive() or not result_queue.empty():
-            try:
-                if not result_queue.empty():
-                    status_type, message, progress = result_queue.get(block=False)
-                    
-                    if status_type == "update":
-                        running_tasks[task_id]["message"] = message
-                        running_tasks[task_id]["progress"] = progress
-                    elif status_type == "completed":
-                        running_tasks[task_id]["status"] = "completed"
-                        running_tasks[task_id]["message"] = message
-                        running_tasks[task_id]["progress"] = progress
-                        break
-                    elif status_type == "failed":
-                        running_tasks[task_id]["status"] = "failed"
-                        running_tasks[task_id]["message"] = message
-                        running_tasks[task_id]["progress"] = 0
-                        break
-                    
-                await asyncio.sleep(0.5)
-            except Exception as e:
-                logger.error(f"Ошибка при мониторинге процесса: {str(e)}")
-                running_tasks[task_id]["status"] = "failed"
-                running_tasks[task_id]["message"] = f"Ошибка мониторинга: {str(e)}"
-                break
-        
-        # Если процесс все еще работает, но мы вышли из цикла - что-то пошло не так
-        if process.is_alive():
-            process.terminate()
-            
-        # Убедимся, что файл прогресса транскрибирования удален при завершении мониторинга
-        try:
-            if os.path.exists(progress_file):
-                os.remove(progress_file)
-                logger.info("Файл прогресса удален при завершении мониторинга")
-        except Exception as e:
-            logger.warning(f"Не удалось удалить файл прогресса при завершении: {str(e)}")
+    Args:
+        name: Имя шаблона
+        version: Версия данных страницы (ETag), входит в ключ кэша
+        context: Словарь контекста шаблона без рекомендаций (они читаются только при промахе)
     
-    # Запускаем мониторинг асинхронно
-    asyncio.create_task(monitor_process())
+    Returns:
+        bytes: HTML страницы в UTF-8
+    """
+    # Шаблоны эпизода не используют request, поэтому ключ не зависит от адреса запроса
+    key = (episode["episode_number"], name, version)
+    content = page_cache.get(key)
+    if content is None:
+        recommendations = await run_blocking(get_episode_recommendations, episode["id"])
+        content = templates.get_template(name).render(
+            {"request": request, "episode": episode, "recommendations": recommendations, **context}
+        ).encode("utf-8")
+        page_cache.put(key, content)
+    return content
 
 # Маршруты
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Главная страница"""
-    # Инициализация базы данных, если необходимо
-    init_db()
-    
-    # Получение списка эпизодов
-    episodes = get_all_episodes()
-    
-    # Обогащение информацией о статусе файлов
-    for ep in episodes:
-        ep["status"] = get_episode_status(ep["episode_number"])
-    
-    # Получение последнего эпизода из RSS
-    latest_episode = get_latest_episode()
-    
-    # Получение списка последних эпизодов из RSS
-    rss_episodes = get_all_episodes_from_rss(10)
+    # Список эпизодов из БД (один запрос) и данные RSS загружаются параллельно
+    episodes, latest_episode, rss_episodes = await asyncio.gather(
+        run_blocking(get_all_episodes),
+        get_latest_episode_async(),
+        get_all_episodes_from_rss_async(10)
+    )
     
     return templates.TemplateResponse(
         "index.html",
@@ -210,140 +205,330 @@ async def index(request: Request):
     )
 
 @app.get("/episodes", response_model=List[Episode])
-async def get_episodes():
-    """Получение списка всех эпизодов"""
-    episodes = get_all_episodes()
+async def get_episodes(response: Response, limit: int = Query(50, ge=1, le=500), before: Optional[int] = None):
+    """
+    Получение списка эпизодов постранично
+    
+    Курсор следующей страницы передается в заголовке X-Next-Before.
+    """
+    episodes, next_before = await run_blocking(get_episodes_page, limit, before)
+    if next_before is not None:
+        response.headers["X-Next-Before"] = str(next_before)
     return episodes
 
 @app.get("/episodes/{episode_number}", response_class=JSONResponse)
-async def get_episode_json(episode_number: int):
-    """Получение информации о конкретном эпизоде в формате JSON"""
-    episodes = get_all_episodes()
+async def get_episode_json(request: Request, episode_number: int):
+    """
+    Получение информации о конкретном эпизоде в формате JSON
     
-    # Поиск эпизода в базе данных
-    episode = None
-    for ep in episodes:
-        if ep["episode_number"] == episode_number:
-            episode = ep
-            break
+    Ответ содержит ETag и Last-Modified; повторный запрос с If-None-Match получает 304.
+    """
+    # Поиск эпизода по номеру (статус этапов хранится в той же строке) и его последней задачи:
+    # эпизод в очереди на повторную обработку скоро изменится, и его нельзя кэшировать
+    episode, job = await asyncio.gather(
+        run_blocking(get_episode_by_number, episode_number),
+        run_blocking(get_job, episode_task_id(episode_number))
+    )
     
     if not episode:
         raise HTTPException(status_code=404, detail=f"Эпизод #{episode_number} не найден")
     
-    # Получение статуса файлов
-    episode["status"] = get_episode_status(episode_number)
+    # Валидаторы вычисляются по строке эпизода до чтения рекомендаций
+    etag, last_modified = episode_validators("json", episode)
+    headers = cache_headers(etag, last_modified, is_episode_final(episode, job))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(headers)
     
     # Получение рекомендаций
-    recommendations = get_episode_recommendations(episode["id"])
+    recommendations = await run_blocking(get_episode_recommendations, episode["id"])
     
-    return {"episode": episode, "recommendations": recommendations}
+    return JSONResponse({"episode": episode, "recommendations": recommendations}, headers=headers)
 
 @app.get("/episodes/{episode_number}/details", response_class=HTMLResponse)
 async def episode_details_page(request: Request, episode_number: int):
     """Страница с детальной информацией об эпизоде"""
-    episodes = get_all_episodes()
-    
-    # Поиск эпизода в базе данных
-    episode = None
-    for ep in episodes:
-        if ep["episode_number"] == episode_number:
-            episode = ep
-            break
+    # Поиск эпизода по номеру (статус этапов хранится в той же строке)
+    episode = await run_blocking(get_episode_by_number, episode_number)
     
     if not episode:
         raise HTTPException(status_code=404, detail=f"Эпизод #{episode_number} не найден")
     
-    # Получение статуса файлов
-    episode["status"] = get_episode_status(episode_number)
-    
-    # Получение рекомендаций
-    recommendations = get_episode_recommendations(episode["id"])
-    
-    # Получение статуса задач для этого эпизода
-    task_id = f"episode_{episode_number}"
-    task_status = None
-    if task_id in running_tasks:
-        task_status = running_tasks[task_id]
+    # Получение статуса последней задачи обработки этого эпизода
+    task_status = await run_blocking(get_job, episode_task_id(episode_number))
     
-    return templates.TemplateResponse(
-        "episode_details.html",
-        {
-            "request": request,
-            "episode": episode,
-            "recommendations": recommendations,
-            "task_status": task_status
-        }
+    # Страница показывает статус задачи, поэтому он входит в ETag
+    task_state = (task_status["id"], task_status["status"], task_status["progress"]) if task_status else None
+    etag, last_modified = episode_validators(
+        "details", episode, task_state, template_version(templates, "episode_details.html"), static_manifest.version
     )
+    headers = cache_headers(etag, last_modified, is_episode_final(episode, task_status))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(headers)
+    
+    content = await render_episode_page(request, "episode_details.html", episode, etag, {"task_status": task_status})
+    return HTMLResponse(content, headers=headers)
 
 @app.post("/episodes/{episode_number}/process")
-async def process_episode_route(episode_number: int, background_tasks: BackgroundTasks, force_retranscribe: bool = False):
+async def process_episode_route(episode_number: int, force_retranscribe: bool = False):
     """Запуск обработки эпизода"""
-    task_id = f"episode_{episode_number}"
-    
-    # Проверка, не запущена ли уже обработка
-    if task_id in running_tasks and running_tasks[task_id]["status"] == "running":
-        return {"message": f"Обработка эпизода #{episode_number} уже выполняется"}
-    
-    # Запуск обработки в фоновом режиме
-    background_tasks.add_task(process_episode_task, episode_number, force_retranscribe)
-    running_tasks[task_id] = {"status": "running", "progress": 0, "message": "Задача поставлена в очередь"}
+    job, created = await run_blocking(enqueue_job, episode_number, force_retranscribe, JOB_PRIORITY_MANUAL)
+    page_cache.invalidate_episode(episode_number)
+    task_events.notify()
+    if not created:
+        return {"message": f"Обработка эпизода #{episode_number} уже выполняется", "task_id": job["task_id"], "job_id": job["id"]}
     
-    return {"message": f"Запущена обработка эпизода #{episode_number}"}
+    return {"message": f"Эпизод #{episode_number} поставлен в очередь обработки", "task_id": job["task_id"], "job_id": job["id"]}
 
 @app.get("/tasks/{task_id}")
 async def get_task_status(task_id: str):
-    """Получение статуса выполнения задачи"""
-    if task_id not in running_tasks:
+    """
+    Получение статуса выполнения задачи из очереди
+    
+    task_id - номер задачи или идентификатор вида episode_N (последняя задача эпизода).
+    """
+    job = await run_blocking(get_job, task_id)
+    if job is None:
         raise HTTPException(status_code=404, detail=f"Задача {task_id} не найдена")
     
-    return running_tasks[task_id]
+    return job
+
+@app.post("/tasks/{task_id}/cancel")
+async def cancel_task(task_id: str):
+    """
+    Отмена задачи
+    
+    Ожидающая задача отменяется сразу; выполняющаяся останавливается воркером на ближайшей
+    границе блока (скачивания, окна Whisper или части текста), временные файлы удаляются.
+    """
+    result = await run_blocking(request_job_cancel, task_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Задача {task_id} не найдена")
+    job, changed = result
+    
+    if not changed:
+        return {"message": f"Задача {task_id} уже завершена", "job": job}
+    page_cache.invalidate_episode(job["episode_number"])
+    task_events.notify()
+    if job["status"] == "running":
+        return {"message": f"Отмена задачи {task_id} запрошена", "job": job}
+    return {"message": f"Задача {task_id} отменена", "job": job}
+
+@app.get("/tasks/{task_id}/events")
+async def task_events_stream(task_id: str):
+    """
+    Поток событий прогресса задачи (Server-Sent Events)
+    
+    Сначала отправляется текущее состояние задачи, затем каждое его изменение.
+    Поток закрывается после завершения задачи.
+    """
+    # Подписка до чтения состояния, чтобы не пропустить изменение между ними
+    queue = task_events.subscribe(task_id)
+    try:
+        job = await run_blocking(get_job, task_id)
+    except Exception:
+        task_events.unsubscribe(task_id, queue)
+        raise
+    if job is None:
+        task_events.unsubscribe(task_id, queue)
+        raise HTTPException(status_code=404, detail=f"Задача {task_id} не найдена")
+    
+    async def stream():
+        current = job
+        try:
+            yield "retry: 2000\n" + format_sse(current)
+            while current["status"] not in FINAL_JOB_STATUSES:
+                try:
+                    current = await asyncio.wait_for(queue.get(), TASK_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(current)
+        finally:
+            task_events.unsubscribe(task_id, queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/search")
-async def search(query: str):
-    """Поиск по рекомендациям"""
+async def search(query: str, limit: int = Query(50, ge=1, le=200), cursor: Optional[str] = None):
+    """
+    Поиск по рекомендациям
+    
+    Курсор следующей страницы возвращается в поле next_cursor в формате "номер_эпизода:id".
+    """
     if not query or len(query) < 2:
-        return {"results": []}
+        return {"results": [], "next_cursor": None}
+    
+    after = None
+    if cursor:
+        try:
+            episode_number, rec_id = cursor.split(":", 1)
+            after = (int(episode_number), int(rec_id))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Некорректный курсор: {cursor}")
     
-    results = search_recommendations(query)
-    return {"results": results}
+    results, next_cursor = await run_blocking(search_recommendations_page, query, limit, after)
+    return {
+        "results": results,
+        "next_cursor": f"{next_cursor[0]}:{next_cursor[1]}" if next_cursor else None
+    }
+
+@app.get("/autocomplete", response_class=FastJSONResponse)
+async def autocomplete(q: str = "", limit: int = Query(10, ge=1, le=50)):
+    """
+    Подсказки названий продуктов по префиксу (для поля поиска)
+    
+    Ответ строится по индексу в памяти без запросов к базе данных; самые упоминаемые
+    продукты идут первыми.
+    """
+    if product_index.refresh_due():
+        schedule_product_index_refresh()
+    return {"query": q, "results": product_index.search(q, limit)}
 
 @app.get("/rss")
 async def get_rss_episodes():
     """Получение списка эпизодов из RSS"""
-    episodes = get_all_episodes_from_rss(20)
+    episodes = await get_all_episodes_from_rss_async(20)
     return {"episodes": episodes}
 
 @app.get("/episodes/{episode_number}/recommendations", response_class=HTMLResponse)
 async def episode_recommendations_page(request: Request, episode_number: int):
     """Страница с рекомендациями для конкретного эпизода"""
-    episodes = get_all_episodes()
-    
-    # Поиск эпизода в базе данных
-    episode = None
-    for ep in episodes:
-        if ep["episode_number"] == episode_number:
-            episode = ep
-            break
+    # Поиск эпизода по номеру и его последней задачи (от нее зависит, можно ли кэшировать страницу)
+    episode, job = await asyncio.gather(
+        run_blocking(get_episode_by_number, episode_number),
+        run_blocking(get_job, episode_task_id(episode_number))
+    )
     
     if not episode:
         raise HTTPException(status_code=404, detail=f"Эпизод #{episode_number} не найден")
     
-    # Получение статуса файлов
-    episode["status"] = get_episode_status(episode_number)
+    etag, last_modified = episode_validators(
+        "recommendations", episode, template_version(templates, "recommendations.html"), static_manifest.version
+    )
+    headers = cache_headers(etag, last_modified, is_episode_final(episode, job))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(headers)
     
-    # Получение рекомендаций
-    recommendations = get_episode_recommendations(episode["id"])
+    content = await render_episode_page(request, "recommendations.html", episode, etag, {"hosts": HOSTS})
+    return HTMLResponse(content, headers=headers)
+
+@app.get("/stats", response_class=HTMLResponse)
+async def stats_page(request: Request):
+    """Страница со статистикой по всему архиву"""
+    top_products, hosts, trends = await asyncio.gather(
+        run_blocking(get_top_products, 50),
+        run_blocking(get_host_stats),
+        run_blocking(get_mention_trends, 24)
+    )
     
     return templates.TemplateResponse(
-        "recommendations.html",
+        "stats.html",
         {
             "request": request,
-            "episode": episode,
-            "recommendations": recommendations,
-            "hosts": HOSTS
+            "top_products": top_products,
+            "hosts": hosts,
+            "trends": trends
         }
     )
 
+@app.get("/stats/products")
+async def stats_top_products(limit: int = Query(20, ge=1, le=500)):
+    """Самые упоминаемые продукты архива"""
+    products = await run_blocking(get_top_products, limit)
+    return {"products": products}
+
+@app.get("/stats/products/{product_name}")
+async def stats_product(product_name: str):
+    """Статистика по продукту: первое и последнее появление, динамика упоминаний"""
+    product = await run_blocking(get_product_stats, product_name)
+    if not product:
+        raise HTTPException(status_code=404, detail=f"Продукт '{product_name}' не найден")
+    return product
+
+@app.get("/stats/hosts")
+async def stats_hosts():
+    """Количество упоминаний по ведущим"""
+    hosts = await run_blocking(get_host_stats)
+    return {"hosts": hosts}
+
+@app.get("/stats/trends")
+async def stats_trends(periods: int = Query(24, ge=1, le=600)):
+    """Динамика упоминаний по месяцам"""
+    trends = await run_blocking(get_mention_trends, periods)
+    return {"trends": trends}
+
+@app.get("/stats/http")
+async def stats_http():
+    """Метрики исходящих HTTP-запросов по хостам (количество, ошибки, задержка)"""
+    return get_http_metrics()
+
+@app.get("/stats/cache")
+async def stats_cache():
+    """Счетчики кэша отрисованных страниц эпизодов (попадания, промахи, вытеснения)"""
+    return page_cache.stats()
+
+@app.get("/scheduler")
+async def scheduler_status():
+    """Планировщик ресурсов: лимиты, занятые слоты и очередь ожидания по каждому ресурсу"""
+    return await run_blocking(get_scheduler_status)
+
+@app.get("/export/recommendations.ndjson")
+async def export_recommendations_ndjson(
+    episode_from: Optional[int] = Query(None, ge=0),
+    episode_to: Optional[int] = Query(None, ge=0),
+    host: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """
+    Потоковая выгрузка рекомендаций архива в формате NDJSON (одна рекомендация в строке)
+    
+    Строки отправляются по мере чтения курсора базы данных частями по EXPORT_BATCH_SIZE,
+    поэтому память сервера не зависит от объема выгрузки. Фильтры: диапазон номеров
+    эпизодов, ведущий (имя или алиас) и диапазон дат публикации (YYYY-MM-DD).
+    """
+    batches = iter_recommendations(
+        episode_from, episode_to, host,
+        date_from.isoformat() if date_from else None,
+        date_to.isoformat() if date_to else None
+    )
+    
+    async def stream():
+        try:
+            while True:
+                batch = await run_blocking(next, batches, None)
+                if batch is None:
+                    break
+                yield "".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in batch)
+        finally:
+            # Закрытие генератора закрывает соединение с базой данных (в том числе при обрыве
+            # соединения клиентом). Если чтение очередной части еще выполняется в пуле потоков,
+            # генератор будет закрыт сборщиком мусора после его завершения.
+            try:
+                batches.close()
+            except ValueError:
+                pass
+    
+    return StreamingResponse(
+        stream(), media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="recommendations.ndjson"'}
+    )
+
+@app.post("/export")
+async def export_route(fmt: str = Query("parquet", pattern="^(parquet|arrow)$"), full: bool = False):
+    """Инкрементальный экспорт архива в Parquet / Arrow IPC (каталог EXPORT_DIR на сервере)"""
+    try:
+        summary = await run_blocking(export_archive, EXPORT_DIR, fmt, full)
+    except ExportInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return summary
+
 # Создание базового HTML шаблона
 def create_template_files():
     """Создание файлов шаблонов, если они не существуют"""
@@ -549,7 +734,8 @@ def create_template_files():
                         </div>
                         <div class="card-body">
                             <div class="input-group mb-3">
-                                <input type="text" id="search-input" class="form-control" placeholder="Введите поисковый запрос...">
+                                <input type="text" id="search-input" class="form-control" placeholder="Введите поисковый запрос..." list="search-suggestions" autocomplete="off">
+                                <datalist id="search-suggestions"></datalist>
                                 <button class="btn btn-primary" id="search-button">Поиск</button>
                             </div>
                             <div id="search-results" class="mt-3">
@@ -708,6 +894,7 @@ def create_template_files():
                             <div class="progress-bar" role="progressbar" style="width: 0%"></div>
                         </div>
                         <p id="task-status">Задача поставлена в очередь...</p>
+                        <button type="button" id="cancel-task" class="btn btn-outline-danger btn-sm" style="display: none;">Отменить обработку</button>
                     </div>
                     <div class="modal-footer">
                         <button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Закрыть</button>
@@ -787,42 +974,61 @@ def create_template_files():
                         
                         // Начинаем опрос статуса
                         const taskId = `episode_${episodeNumber}`;
-                        pollTaskStatus(taskId);
+                        subscribeTaskStatus(taskId);
                     } catch (error) {
                         document.getElementById('task-status').textContent = `Ошибка: ${error.message}`;
                     }
                 });
             });
             
-            // Функция для опроса статуса задачи
-            function pollTaskStatus(taskId) {
-                const interval = setInterval(async () => {
+            // Подписка на события прогресса задачи (Server-Sent Events)
+            function subscribeTaskStatus(taskId) {
+                const source = new EventSource(`/tasks/${taskId}/events`);
+                
+                // Кнопка отмены: обработка остановится на ближайшей границе блока
+                const cancelButton = document.getElementById('cancel-task');
+                cancelButton.style.display = 'inline-block';
+                cancelButton.disabled = false;
+                cancelButton.onclick = async () => {
+                    cancelButton.disabled = true;
                     try {
-                        const response = await fetch(`/tasks/${taskId}`);
-                        const data = await response.json();
-                        
-                        // Обновляем прогресс и статус
-                        document.querySelector('.progress-bar').style.width = `${data.progress}%`;
-                        document.getElementById('task-status').textContent = data.message;
+                        await fetch(`/tasks/${taskId}/cancel`, { method: 'POST' });
+                    } catch (error) {
+                        cancelButton.disabled = false;
+                    }
+                };
+                
+                source.onmessage = (event) => {
+                    const data = JSON.parse(event.data);
+                    
+                    // Обновляем прогресс и статус
+                    document.querySelector('.progress-bar').style.width = `${data.progress}%`;
+                    document.getElementById('task-status').textContent = data.queue_position
+                        ? `${data.message} (позиция в очереди: ${data.queue_position})`
+                        : data.message;
+                    
+                    // Если задача завершена, закрываем поток событий
+                    if (data.status === 'completed' || data.status === 'failed' || data.status === 'cancelled') {
+                        source.close();
+                        cancelButton.style.display = 'none';
                         
-                        // Если задача завершена, останавливаем опрос
-                        if (data.status === 'completed' || data.status === 'failed') {
-                            clearInterval(interval);
-                            
-                            // Если успешно, предлагаем обновить страницу
-                            if (data.status === 'completed') {
-                                setTimeout(() => {
-                                    if (confirm('Обработка завершена. Обновить страницу?')) {
-                                        window.location.reload();
-                                    }
-                                }, 1000);
-                            }
+                        // Если успешно, предлагаем обновить страницу
+                        if (data.status === 'completed') {
+                            setTimeout(() => {
+                                if (confirm('Обработка завершена. Обновить страницу?')) {
+                                    window.location.reload();
+                                }
+                            }, 1000);
                         }
-                    } catch (error) {
-                        document.getElementById('task-status').textContent = `Ошибка при получении статуса: ${error.message}`;
-                        clearInterval(interval);
                     }
-                }, 1000);
+                };
+                
+                // При обрыве соединения браузер переподключается сам и получает текущее состояние задачи
+                source.onerror = () => {
+                    if (source.readyState === EventSource.CLOSED) {
+                        document.getElementById('task-status').textContent = 'Ошибка при получении статуса: соединение закрыто';
+                    }
+                };
             }
             
             // Обработка поиска
@@ -884,6 +1090,39 @@ def create_template_files():
                 }
             });
             
+            // Подсказки названий продуктов при вводе (индекс в памяти сервера, без полного поиска)
+            let suggestTimer = null;
+            let suggestController = null;
+            document.getElementById('search-input').addEventListener('input', (e) => {
+                const prefix = e.target.value.trim();
+                clearTimeout(suggestTimer);
+                if (prefix.length < 1) {
+                    document.getElementById('search-suggestions').innerHTML = '';
+                    return;
+                }
+                suggestTimer = setTimeout(async () => {
+                    // Ответ на устаревший префикс больше не нужен
+                    if (suggestController) {
+                        suggestController.abort();
+                    }
+                    suggestController = new AbortController();
+                    try {
+                        const response = await fetch(`/autocomplete?q=${encodeURIComponent(prefix)}&limit=8`, { signal: suggestController.signal });
+                        const data = await response.json();
+                        const datalist = document.getElementById('search-suggestions');
+                        datalist.innerHTML = '';
+                        data.results.forEach(product => {
+                            const option = document.createElement('option');
+                            option.value = product.name;
+                            option.label = `${product.name} (${product.mention_count})`;
+                            datalist.appendChild(option);
+                        });
+                    } catch (error) {
+                        // Прерванный запрос или сетевая ошибка - подсказки просто не обновляются
+                    }
+                }, 80);
+            });
+            
             // Проверяем, находимся ли мы на странице с деталями эпизода
             if (window.location.pathname.startsWith('/episodes/')) {
                 const episodeNumber = window.location.pathname.split('/').pop();
@@ -1035,8 +1274,17 @@ def create_template_files():
         with open(template_path, "w", encoding="utf-8") as f:
             f.write(index_html)
 
-def start_server():
-    """Запуск веб-сервера"""
+def start_server(poll=False):
+    """
+    Запуск веб-сервера
+    
+    Args:
+        poll: Опрашивать RSS-ленту и автоматически ставить новые эпизоды в обработку
+    """
+    global feed_poller_enabled
+    if poll:
+        feed_poller_enabled = True
+    
     # Создание файлов шаблонов
     create_template_files()
     
@@ -1045,7 +1293,7 @@ def start_server():
     
     # Восстановление информации об эпизодах на основе существующих файлов
     logger.info("Запуск процесса восстановления данных об эпизодах...")
-    recovered = get_all_episodes()
+    recovered = recover_episodes(repair=REPAIR_STATUS_ON_START)
     if recovered:
         logger.info(f"Получено {len(recovered)} эпизодов из базы данных")
     else:
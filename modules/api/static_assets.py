@@ -0,0 +1,105 @@
+"""
+Статические файлы веб-интерфейса с отпечатками содержимого в URL
+
+При запуске сервера для каждого файла каталога статики вычисляется короткий хеш
+содержимого, и шаблоны получают ссылки вида /static/styles.3f2a9c1b0d.css через
+static_url(). Такой URL никогда не указывает на другое содержимое, поэтому он
+отдается с Cache-Control: immutable на год; после изменения файла страницы
+ссылаются на новый URL. Запросы без отпечатка (или со старым) обслуживаются как
+обычно и перепроверяются по ETag.
+"""
+
+import os
+import re
+import hashlib
+import logging
+
+from starlette.staticfiles import StaticFiles
+
+logger = logging.getLogger(__name__)
+
+# Длина отпечатка содержимого в имени файла (шестнадцатеричных символов)
+_FINGERPRINT_LENGTH = 10
+
+# styles.3f2a9c1b0d.css -> (styles, 3f2a9c1b0d, .css)
+_FINGERPRINT_RE = re.compile(rf"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{{{_FINGERPRINT_LENGTH}}})(?P<ext>\.[^./]+)$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(64 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:_FINGERPRINT_LENGTH]
+
+def _fingerprinted_name(name, fingerprint):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{fingerprint}{ext}"
+
+class StaticManifest:
+    """Отпечатки файлов каталога статики: относительный путь -> хеш содержимого"""
+
+    def __init__(self, directory, url_prefix="/static"):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.fingerprints = {}
+
+    def build(self):
+        """Вычислить отпечатки всех файлов (вызывается при запуске сервера)"""
+        fingerprints = {}
+        for root, _, files in os.walk(self.directory):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                fingerprints[name] = _file_fingerprint(path)
+        self.fingerprints = fingerprints
+        logger.info(f"Отпечатки статических файлов вычислены: {len(fingerprints)}")
+        return fingerprints
+
+    @property
+    def version(self):
+        """Общая версия статики (меняется при изменении любого файла)"""
+        joined = "|".join(f"{name}:{value}" for name, value in sorted(self.fingerprints.items()))
+        return hashlib.sha1(joined.encode("utf-8")).hexdigest()[:_FINGERPRINT_LENGTH]
+
+    def url(self, name):
+        """URL файла статики с отпечатком содержимого (функция static_url в шаблонах)"""
+        name = name.lstrip("/")
+        fingerprint = self.fingerprints.get(name)
+        if fingerprint is None:
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(path):
+                return f"{self.url_prefix}/{name}"
+            # Файл добавлен после запуска сервера
+            fingerprint = self.fingerprints[name] = _file_fingerprint(path)
+        return f"{self.url_prefix}/{_fingerprinted_name(name, fingerprint)}"
+
+    def resolve(self, path):
+        """
+        Путь запроса с отпечатком -> (путь к файлу, актуален ли отпечаток)
+
+        Для путей без отпечатка возвращает (path, False).
+        """
+        match = _FINGERPRINT_RE.match(path)
+        if match is None:
+            return path, False
+        name = match["stem"] + match["ext"]
+        key = name.replace(os.sep, "/")
+        if key not in self.fingerprints and not os.path.isfile(os.path.join(self.directory, name)):
+            return path, False
+        return name, self.fingerprints.get(key) == match["hash"]
+
+class FingerprintedStaticFiles(StaticFiles):
+    """StaticFiles, понимающий URL с отпечатками: актуальные отдаются с immutable на год"""
+
+    def __init__(self, *, manifest, **kwargs):
+        super().__init__(directory=manifest.directory, **kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path, scope):
+        name, current = self.manifest.resolve(path)
+        response = await super().get_response(name, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if current else "no-cache"
+        return response
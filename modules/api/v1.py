@@ -0,0 +1,69 @@
+"""
+Версионированный JSON API (/api/v1)
+
+Все списки отдаются страницами ограниченного размера с непрозрачным курсором
+следующей страницы (next_cursor) и поддерживают выбор полей параметром fields.
+Ответы сериализуются напрямую через modules/api/serialization.py, без проверки
+pydantic-моделями, поэтому время ответа зависит только от размера страницы.
+
+Формат ответа: {"data": [...], "next_cursor": "..." или null}
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from modules.api.aio import run_blocking
+from modules.api.serialization import (
+    FastJSONResponse, encode_cursor, decode_cursor, parse_fields, select_fields
+)
+from modules.utils.config import API_PAGE_SIZE, API_MAX_PAGE_SIZE
+from modules.utils.database import get_episodes_page, search_recommendations_page
+
+router = APIRouter(prefix="/api/v1", default_response_class=FastJSONResponse)
+
+EPISODE_FIELDS = ("id", "episode_number", "title", "published_date", "processed", "updated_at", "status")
+SEARCH_FIELDS = (
+    "id", "episode_number", "name", "description", "mentioned_by", "hosts_opinion", "ai_comment", "website"
+)
+
+def _page(rows, fields, next_cursor):
+    return {"data": select_fields(rows, fields), "next_cursor": next_cursor}
+
+@router.get("/episodes")
+async def list_episodes(
+    limit: int = Query(API_PAGE_SIZE, ge=1, le=API_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Эпизоды по убыванию номера; fields - поля через запятую (например, episode_number,title)"""
+    selected = parse_fields(fields, EPISODE_FIELDS)
+    before = None
+    if cursor:
+        before = decode_cursor("episodes", cursor)
+        if not isinstance(before, int):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+    episodes, next_before = await run_blocking(get_episodes_page, limit, before)
+    next_cursor = encode_cursor("episodes", next_before) if next_before is not None else None
+    return _page(episodes, selected, next_cursor)
+
+@router.get("/search")
+async def search_recommendations(
+    q: str = Query(..., min_length=2),
+    limit: int = Query(API_PAGE_SIZE, ge=1, le=API_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """Поиск рекомендаций по названию и описанию; результаты по убыванию номера эпизода"""
+    selected = parse_fields(fields, SEARCH_FIELDS)
+    after = None
+    if cursor:
+        position = decode_cursor(f"search:{q}", cursor)
+        if not (isinstance(position, list) and len(position) == 2 and all(isinstance(v, int) for v in position)):
+            raise HTTPException(status_code=400, detail="Некорректный курсор")
+        after = tuple(position)
+
+    results, next_after = await run_blocking(search_recommendations_page, q, limit, after)
+    next_cursor = encode_cursor(f"search:{q}", list(next_after)) if next_after else None
+    return _page(results, selected, next_cursor)
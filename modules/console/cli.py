@@ -10,9 +10,10 @@ from modules.core.podcast import (
     get_episode_status, process_episode
 )
 from modules.utils.database import (
-    init_db, get_all_episodes, get_episode_recommendations,
-    search_recommendations
+    init_db, get_episode_recommendations, get_episode_by_number,
+    get_episodes_page, search_recommendations_page
 )
+from modules.utils.helpers import check_processing_dependencies
 
 logger = logging.getLogger(__name__)
 
@@ -85,8 +86,8 @@ def select_episode_for_processing():
         print(f"{i}. #{ep['episode_number']} - {ep['title']}")
     
     print("\nЭпизоды в базе данных:")
-    db_episodes = get_all_episodes()
-    for i, ep in enumerate(db_episodes[:10], 1):  # Показываем только 10 эпизодов
+    db_episodes, _ = get_episodes_page(10)  # Показываем только 10 эпизодов
+    for i, ep in enumerate(db_episodes, 1):
         status_text = "Не обработан"
         if ep['processed'] == 1:
             status_text = "Транскрибирован"
@@ -144,12 +145,21 @@ def select_episode_for_processing():
 
 def process_episode_with_progress(episode_number, force_retranscribe=False):
     """Обработка эпизода с выводом прогресса"""
+    # Консоль запускается без библиотек машинного обучения, поэтому проверяем их до скачивания
+    if not check_processing_dependencies():
+        print("\nОбработка эпизодов недоступна: установите зависимости и перезапустите программу.")
+        return
+    
     print(f"\nНачало обработки эпизода #{episode_number}")
     
     if force_retranscribe:
         print("(Выбрано принудительное обновление транскрипции)")
     
-    result = process_episode(episode_number, force_retranscribe)
+    try:
+        result = process_episode(episode_number, force_retranscribe)
+    except RuntimeError as e:
+        print(f"\nОбработка эпизода #{episode_number} прервана: {str(e)}")
+        return
     
     if result:
         print(f"\nЭпизод #{episode_number} успешно обработан!")
@@ -159,13 +169,13 @@ def process_episode_with_progress(episode_number, force_retranscribe=False):
 def view_episode_info():
     """Просмотр информации об эпизоде"""
     print("\nСписок доступных эпизодов:")
-    episodes = get_all_episodes()
+    episodes, _ = get_episodes_page(15)  # Показываем только 15 эпизодов
     
     if not episodes:
         print("В базе данных нет эпизодов.")
         return
     
-    for i, ep in enumerate(episodes[:15], 1):  # Показываем только 15 эпизодов
+    for i, ep in enumerate(episodes, 1):
         status_text = "Не обработан"
         if ep['processed'] == 1:
             status_text = "Транскрибирован"
@@ -183,12 +193,8 @@ def view_episode_info():
                 
             episode_number = int(choice)
             
-            # Ищем эпизод в списке
-            selected_episode = None
-            for ep in episodes:
-                if ep['episode_number'] == episode_number:
-                    selected_episode = ep
-                    break
+            # Ищем эпизод в базе данных
+            selected_episode = get_episode_by_number(episode_number)
             
             if not selected_episode:
                 print(f"Эпизод #{episode_number} не найден в базе данных.")
@@ -198,7 +204,7 @@ def view_episode_info():
             print(f"Название: {selected_episode['title']}")
             print(f"Дата публикации: {selected_episode['published_date']}")
             
-            status = get_episode_status(episode_number)
+            status = selected_episode['status']
             print(f"Скачан: {'Да' if status['downloaded'] else 'Нет'}")
             print(f"Транскрибирован: {'Да' if status['transcribed'] else 'Нет'}")
             print(f"Рекомендации извлечены: {'Да' if status['recommendations'] else 'Нет'}")
@@ -246,29 +252,35 @@ def search_in_recommendations():
         return
         
     print(f"\nПоиск по запросу: '{search_query}'")
-    results = search_recommendations(search_query)
+    
+    # Результаты загружаются страницами по 5 штук
+    results, next_cursor = search_recommendations_page(search_query, 5)
     
     if not results:
         print("По вашему запросу ничего не найдено.")
         return
-        
-    print(f"\nНайдено {len(results)} результатов:")
     
-    for i, rec in enumerate(results, 1):
-        print(f"\n{i}. {rec['name']} (Эпизод #{rec['episode_number']})")
-        print(f"   Описание: {rec['description']}")
-        
-        if rec['hosts_opinion']:
-            print(f"   Мнение ведущих: {rec['hosts_opinion']}")
+    i = 0
+    while results:
+        for rec in results:
+            i += 1
+            print(f"\n{i}. {rec['name']} (Эпизод #{rec['episode_number']})")
+            print(f"   Описание: {rec['description']}")
             
-        if rec['mentioned_by'] and rec['mentioned_by'].lower() != 'unknown':
-            print(f"   Упомянул: {rec['mentioned_by']}")
+            if rec['hosts_opinion']:
+                print(f"   Мнение ведущих: {rec['hosts_opinion']}")
+                
+            if rec['mentioned_by'] and rec['mentioned_by'].lower() != 'unknown':
+                print(f"   Упомянул: {rec['mentioned_by']}")
         
-        # Прерываем вывод, если результатов слишком много
-        if i % 5 == 0 and i < len(results):
-            more = input("\nПоказать еще? (y/n): ")
-            if more.lower() != 'y':
-                break
+        if next_cursor is None:
+            break
+        
+        more = input("\nПоказать еще? (y/n): ")
+        if more.lower() != 'y':
+            break
+        
+        results, next_cursor = search_recommendations_page(search_query, 5, next_cursor)
 
 def start_web_interface():
     """Запуск веб-интерфейса"""
@@ -0,0 +1,121 @@
+"""
+Загрузка полного архива эпизодов (бэкфилл)
+
+Метаданные всех эпизодов перечисляются по архивным RSS-лентам и добавляются в базу
+данных одной транзакцией. Затем для выбранного диапазона эпизодов выполняются этапы
+скачивания, транскрибирования и извлечения рекомендаций конвейером, у каждого этапа
+свое количество потоков. Завершенные этапы отмечаются в таблице episodes, поэтому
+прерванный бэкфилл при повторном запуске продолжается с того же места.
+"""
+
+import sqlite3
+import logging
+
+from modules.utils.config import (
+    DB_PATH, ARCHIVE_RSS_URLS, BACKFILL_BANDWIDTH_LIMIT,
+    PIPELINE_DOWNLOAD_WORKERS, PIPELINE_TRANSCRIBE_WORKERS, PIPELINE_EXTRACT_WORKERS
+)
+from modules.utils.feed import fetch_feed_url_episodes
+from modules.utils.http_client import BandwidthLimiter, get_http_metrics
+from modules.utils.database import save_new_episodes
+from modules.core.pipeline import run_pipeline, PipelineProgress
+
+logger = logging.getLogger(__name__)
+
+def enumerate_archive(urls=ARCHIVE_RSS_URLS):
+    """
+    Перечислить все эпизоды по архивным лентам
+
+    Returns:
+        list: Эпизоды без повторов, отсортированные по убыванию номера
+    """
+    episodes = {}
+    for url in urls:
+        try:
+            feed_episodes = fetch_feed_url_episodes(url)
+        except Exception as e:
+            logger.error(f"Не удалось загрузить ленту {url}: {str(e)}")
+            continue
+
+        logger.info(f"В ленте {url} найдено эпизодов: {len(feed_episodes)}")
+        for episode in feed_episodes:
+            # Более новые ленты идут первыми, их данные приоритетнее
+            episodes.setdefault(episode["episode_number"], episode)
+
+    return [episodes[number] for number in sorted(episodes, reverse=True)]
+
+def import_archive(urls=ARCHIVE_RSS_URLS):
+    """
+    Добавить метаданные всех эпизодов архива в базу данных (одной транзакцией)
+
+    Returns:
+        tuple: (количество эпизодов в архиве, количество добавленных эпизодов)
+    """
+    episodes = enumerate_archive(urls)
+    added = save_new_episodes(episodes)
+    logger.info(f"Архив: найдено эпизодов {len(episodes)}, добавлено новых {len(added)}")
+    return len(episodes), len(added)
+
+def _load_backfill_episodes(start=None, end=None):
+    """Эпизоды диапазона (включительно) с состоянием этапов, от старых к новым"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+    SELECT episode_number, extracted
+    FROM episodes
+    WHERE episode_number >= ? AND episode_number <= ?
+    ORDER BY episode_number
+    """, (start if start is not None else 0, end if end is not None else 2 ** 62))
+
+    columns = ["episode_number", "extracted"]
+    episodes = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    conn.close()
+    return episodes
+
+def backfill_episodes(start=None, end=None, download_workers=PIPELINE_DOWNLOAD_WORKERS,
+                      transcribe_workers=PIPELINE_TRANSCRIBE_WORKERS, extract_workers=PIPELINE_EXTRACT_WORKERS,
+                      force_retranscribe=False, progress_callback=None, bandwidth_limit=BACKFILL_BANDWIDTH_LIMIT):
+    """
+    Обработать эпизоды диапазона: скачивание, транскрибирование и извлечение рекомендаций
+
+    Эпизоды обрабатываются конвейером (modules.core.pipeline), полностью обработанные
+    эпизоды пропускаются, а уже выполненные этапы остальных используются повторно.
+
+    Args:
+        start: Первый номер эпизода диапазона (None - с первого)
+        end: Последний номер эпизода диапазона (None - до последнего)
+        download_workers: Количество параллельных скачиваний
+        transcribe_workers: Количество параллельных транскрибирований
+        extract_workers: Количество параллельных извлечений рекомендаций
+        force_retranscribe: Принудительно повторно транскрибировать аудио
+        progress_callback: Функция, вызываемая со словарем счетчиков прогресса
+        bandwidth_limit: Суммарное ограничение скорости скачиваний в байтах в секунду (0 - без ограничения)
+
+    Returns:
+        dict: Итоговые счетчики прогресса
+    """
+    episodes = _load_backfill_episodes(start, end)
+    pending = [
+        episode["episode_number"] for episode in episodes
+        if not episode["extracted"] or force_retranscribe
+    ]
+    progress = PipelineProgress(len(episodes), progress_callback)
+
+    logger.info(f"Бэкфилл: эпизодов в диапазоне {len(episodes)}, требуют обработки {len(pending)}")
+    for _ in range(len(episodes) - len(pending)):
+        progress.add("skipped")
+
+    # Общий ограничитель скорости для всех скачиваний бэкфилла
+    bandwidth_limiter = BandwidthLimiter(bandwidth_limit) if bandwidth_limit else None
+
+    run_pipeline(
+        pending, download_workers, transcribe_workers, extract_workers,
+        force_retranscribe=force_retranscribe, progress=progress, bandwidth_limiter=bandwidth_limiter
+    )
+
+    for host, stats in get_http_metrics().items():
+        logger.info(f"HTTP {host}: запросов {stats['requests']}, ошибок {stats['errors']}, "
+                    f"средняя задержка {stats['avg_seconds']} с, максимальная {stats['max_seconds']} с")
+    return progress.counts
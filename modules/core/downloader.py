@@ -0,0 +1,436 @@
+"""
+Надежное скачивание файлов по HTTP
+
+Большие файлы скачиваются параллельно несколькими диапазонами байтов (сегментами)
+через общий пул соединений прямо в заранее выделенный файл <path>.segmented.part;
+если сервер не поддерживает Range, используется один поток. Заранее выделенный файл
+имеет полный размер с самого начала, поэтому продолжить его скачивание можно только
+по сохраненному состоянию сегментов, а без него файл удаляется.
+
+Файл скачивается во временный файл <path>.part большими блоками. После обрыва
+соединения скачивание продолжается с места остановки запросом Range. Перед атомарным
+переименованием в итоговый путь проверяются размер (Content-Length) и контрольная
+сумма SHA-256 (если она известна), а сумма сохраняется рядом в <path>.sha256.
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from modules.utils.http_client import get_download_session
+from modules.utils.cancellation import JobCancelled, check_cancelled
+from modules.utils.config import (
+    DOWNLOAD_CHUNK_SIZE, DOWNLOAD_RETRIES, DOWNLOAD_PROGRESS_INTERVAL,
+    DOWNLOAD_SEGMENTS, DOWNLOAD_SEGMENT_MIN_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+class DownloadError(Exception):
+    """Ошибка скачивания или проверки целостности файла"""
+
+def _part_path(path):
+    return f"{path}.part"
+
+def _checksum_path(path):
+    return f"{path}.sha256"
+
+def _segmented_part_path(path):
+    return f"{path}.segmented.part"
+
+def _segments_path(path):
+    return f"{path}.segmented.part.segments"
+
+# Ошибки соединения, после которых скачивание можно продолжить
+_RETRYABLE_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+class _RangesNotSupported(Exception):
+    """Сервер ответил на запрос диапазона целым файлом"""
+
+def _hash_file(path, hasher=None):
+    """Посчитать SHA-256 содержимого файла (продолжая переданный hasher)"""
+    hasher = hasher or hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            hasher.update(block)
+    return hasher
+
+def _digest_from_headers(headers):
+    """SHA-256 из заголовка Digest (RFC 3230), если сервер его передал"""
+    for part in headers.get("Digest", "").split(","):
+        algorithm, _, value = part.strip().partition("=")
+        if algorithm.lower() == "sha-256" and value:
+            try:
+                return base64.b64decode(value).hex()
+            except ValueError:
+                return None
+    return None
+
+def _range_start(response):
+    """Начало диапазона из заголовка Content-Range ответа 206 или None, если его нет"""
+    content_range = response.headers.get("Content-Range", "")
+    unit, _, spec = content_range.partition(" ")
+    start = spec.split("-", 1)[0]
+    if unit.lower() != "bytes" or not start.isdigit():
+        return None
+    return int(start)
+
+def _total_size(response, offset):
+    """Полный размер файла по заголовкам ответа или None, если он неизвестен"""
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length) + (offset if response.status_code == 206 else 0)
+    return None
+
+def _backoff(delay, cancel_token):
+    """Пауза перед повтором запроса, прерываемая отменой скачивания"""
+    if cancel_token is None:
+        time.sleep(delay)
+    else:
+        cancel_token.wait(delay)
+    check_cancelled(cancel_token)
+
+class _ProgressReporter:
+    """Передает прогресс в callback не чаще DOWNLOAD_PROGRESS_INTERVAL секунд (потокобезопасно)"""
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.last_report = 0.0
+        self.lock = threading.Lock()
+
+    def report(self, downloaded, total, force=False):
+        if self.callback is None:
+            return
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.last_report < DOWNLOAD_PROGRESS_INTERVAL:
+                return
+            self.last_report = now
+        self.callback(downloaded, total)
+
+def _probe(http, url):
+    """
+    Узнать размер файла и поддержку Range запросом HEAD
+
+    Returns:
+        tuple: (размер или None, поддерживаются ли диапазоны, заголовки ответа)
+    """
+    try:
+        response = http.head(url, allow_redirects=True)
+    except requests.RequestException as e:
+        logger.warning(f"Не удалось получить заголовки {url}: {str(e)}")
+        return None, False, {}
+
+    if response.status_code != 200:
+        return None, False, response.headers
+
+    length = response.headers.get("Content-Length")
+    total = int(length) if length and length.isdigit() else None
+    ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+    return total, ranges, response.headers
+
+def _split_segments(total, count):
+    """Разбить файл на count сегментов: список [начало, конец (включительно), текущая позиция]"""
+    size = -(-total // count)
+    return [[start, min(start + size, total) - 1, start] for start in range(0, total, size)]
+
+def _load_segments(path, total):
+    """
+    Загрузить состояние сегментов прерванного скачивания (если оно относится к тому же файлу)
+
+    Заранее выделенный файл без подходящего состояния удаляется: по его размеру нельзя
+    понять, какие части уже скачаны.
+    """
+    part_path = _segmented_part_path(path)
+    try:
+        with open(_segments_path(path), "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    if state.get("total") == total and os.path.exists(part_path):
+        return state["segments"]
+
+    for leftover in (part_path, _segments_path(path)):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return None
+
+def _save_segments(path, total, segments):
+    """Сохранить состояние сегментов (позиции не больше реально записанных)"""
+    state_path = _segments_path(path)
+    with open(f"{state_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump({"total": total, "segments": segments}, f)
+    os.replace(f"{state_path}.tmp", state_path)
+
+def _download_segmented(http, url, path, total, segment_count, reporter, bandwidth_limiter=None, cancel_token=None):
+    """
+    Скачать файл параллельными сегментами в заранее выделенный .segmented.part-файл
+
+    Returns:
+        bool: True, если файл скачан; False, если сервер не поддерживает диапазоны
+
+    Raises:
+        DownloadError: Если сегмент не удалось скачать за DOWNLOAD_RETRIES попыток
+    """
+    part_path = _segmented_part_path(path)
+    segments = _load_segments(path, total)
+    if segments is None:
+        segments = _split_segments(total, segment_count)
+        # Выделяем место под весь файл сразу, сегменты пишутся по своим смещениям.
+        # Состояние сохраняется до первого запроса: без него файл не продолжить
+        with open(part_path, "wb") as f:
+            f.truncate(total)
+        _save_segments(path, total, segments)
+    else:
+        logger.info(f"Продолжение сегментированного скачивания {url}")
+
+    lock = threading.Lock()
+    progress = {"downloaded": sum(segment[2] - segment[0] for segment in segments), "saved_at": time.monotonic()}
+
+    def save_state(force=False):
+        with lock:
+            now = time.monotonic()
+            if force or now - progress["saved_at"] >= DOWNLOAD_PROGRESS_INTERVAL:
+                progress["saved_at"] = now
+                _save_segments(path, total, [list(segment) for segment in segments])
+
+    def fetch(segment):
+        attempt = 0
+        while segment[2] <= segment[1]:
+            try:
+                headers = {"Range": f"bytes={segment[2]}-{segment[1]}"}
+                with http.get(url, headers=headers, stream=True) as response:
+                    if response.status_code == 200:
+                        raise _RangesNotSupported()
+                    if response.status_code != 206:
+                        raise DownloadError(f"Ошибка скачивания {url}: HTTP {response.status_code}")
+                    if _range_start(response) != segment[2]:
+                        raise DownloadError(f"Сервер вернул диапазон не с {segment[2]} байта: {url}")
+
+                    with open(part_path, "r+b") as f:
+                        f.seek(segment[2])
+                        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            check_cancelled(cancel_token)
+                            chunk = chunk[:segment[1] + 1 - segment[2]]
+                            if bandwidth_limiter is not None:
+                                bandwidth_limiter.consume(len(chunk))
+                            f.write(chunk)
+                            with lock:
+                                segment[2] += len(chunk)
+                                progress["downloaded"] += len(chunk)
+                                downloaded = progress["downloaded"]
+                            attempt = 0
+                            reporter.report(downloaded, total)
+                            save_state()
+            except _RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > DOWNLOAD_RETRIES:
+                    raise DownloadError(f"Не удалось скачать сегмент {segment[0]}-{segment[1]} {url}: {str(e)}")
+                _backoff(min(2 ** attempt, 30), cancel_token)
+
+    with ThreadPoolExecutor(max_workers=len(segments), thread_name_prefix="download-segment") as pool:
+        futures = [pool.submit(fetch, segment) for segment in segments]
+        errors = [future.exception() for future in futures]
+
+    if any(isinstance(error, _RangesNotSupported) for error in errors):
+        for leftover in (part_path, _segments_path(path)):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return False
+
+    for error in errors:
+        if isinstance(error, JobCancelled):
+            raise error
+    for error in errors:
+        if error is not None:
+            save_state(force=True)
+            raise error
+
+    if os.path.exists(_segments_path(path)):
+        os.remove(_segments_path(path))
+    return True
+
+def is_download_complete(path, url=None, session=None):
+    """
+    Проверить, что файл скачан полностью
+
+    Файл с сохраненной контрольной суммой считается завершенным. Для файлов, скачанных
+    до появления проверок, размер сравнивается с Content-Length ответа на HEAD-запрос,
+    и после совпадения сохраняется контрольная сумма. Если сервер не подтвердил размер,
+    файл считается неполным и докачивается (запрос Range сам обнаружит полный файл).
+    """
+    if not os.path.exists(path):
+        return False
+    if os.path.exists(_checksum_path(path)):
+        return True
+    if url is None:
+        return False
+
+    try:
+        response = (session or get_download_session()).head(url, allow_redirects=True)
+        length = response.headers.get("Content-Length")
+    except requests.RequestException as e:
+        logger.warning(f"Не удалось проверить размер {path}: {str(e)}")
+        return False
+
+    if response.status_code != 200 or not (length and length.isdigit()):
+        logger.warning(f"Сервер не сообщил размер {url}, файл {path} будет проверен докачкой")
+        return False
+    if os.path.getsize(path) != int(length):
+        return False
+
+    with open(_checksum_path(path), "w", encoding="utf-8") as f:
+        f.write(_hash_file(path).hexdigest())
+    return True
+
+def discard_partial_download(path):
+    """Удалить временные файлы незавершенного скачивания (.part, .segmented.part и состояние сегментов)"""
+    for leftover in (_part_path(path), _segmented_part_path(path), _segments_path(path)):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+            logger.info(f"Удален временный файл {leftover}")
+
+def download_file(url, path, progress_callback=None, expected_sha256=None, session=None,
+                  segments=DOWNLOAD_SEGMENTS, bandwidth_limiter=None, cancel_token=None):
+    """
+    Скачать файл с докачкой, проверкой целостности и атомарной записью
+
+    Args:
+        url: Адрес файла
+        path: Итоговый путь к файлу
+        progress_callback: Функция (downloaded_bytes, total_bytes), вызывается не чаще
+            DOWNLOAD_PROGRESS_INTERVAL секунд и один раз по завершении
+        expected_sha256: Ожидаемая контрольная сумма (hex); если не задана, используется
+            заголовок Digest ответа сервера, если он есть
+        session: requests.Session (по умолчанию сессия скачивания HTTP-клиента, которая не
+            повторяет ошибки соединения - их повторяет докачка)
+        segments: Количество параллельных соединений для больших файлов (1 - один поток)
+        bandwidth_limiter: BandwidthLimiter для ограничения скорости (None - без ограничения)
+        cancel_token: CancelToken, проверяется после каждого блока; при отмене временные
+            файлы удаляются
+
+    Returns:
+        str: SHA-256 скачанного файла (hex)
+
+    Raises:
+        DownloadError: Если файл не удалось скачать или он не прошел проверку
+        JobCancelled: Если скачивание отменено
+    """
+    try:
+        return _download_file(
+            session or get_download_session(), url, path, _ProgressReporter(progress_callback),
+            expected_sha256, segments, bandwidth_limiter, cancel_token
+        )
+    except JobCancelled:
+        logger.info(f"Скачивание {url} отменено")
+        discard_partial_download(path)
+        raise
+
+def _download_file(http, url, path, reporter, expected_sha256, segments, bandwidth_limiter, cancel_token):
+    """Скачивание файла (см. download_file)"""
+    part_path = _part_path(path)
+    total = None
+    attempt = 0
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # Сегментированное скачивание, если его можно начать или продолжить
+    single_stream_resume = os.path.exists(part_path)
+    if segments > 1 and not single_stream_resume:
+        total, ranges, headers = _probe(http, url)
+        if ranges and total and total >= DOWNLOAD_SEGMENT_MIN_SIZE:
+            expected_sha256 = expected_sha256 or _digest_from_headers(headers)
+            if _download_segmented(http, url, path, total, segments, reporter, bandwidth_limiter, cancel_token):
+                return _finalize_download(_segmented_part_path(path), path, total, expected_sha256, reporter)
+            logger.info(f"Сервер не поддерживает диапазоны, {url} скачивается одним потоком")
+
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        try:
+            with http.get(url, headers=headers, stream=True) as response:
+                if response.status_code == 416 and offset:
+                    # Диапазон за пределами файла: либо .part уже полный, либо файл на сервере изменился
+                    total = _total_size(response, 0)
+                    if total != offset:
+                        os.remove(part_path)
+                        continue
+                    break
+
+                if response.status_code not in (200, 206):
+                    raise DownloadError(f"Ошибка скачивания {url}: HTTP {response.status_code}")
+
+                if response.status_code == 200 and offset:
+                    # Сервер не поддерживает Range - начинаем заново
+                    logger.info(f"Сервер не поддерживает докачку, скачивание {url} начинается сначала")
+                    offset = 0
+
+                if response.status_code == 206 and _range_start(response) != offset:
+                    # Дописывать в .part можно только диапазон, начинающийся с его конца
+                    logger.warning(f"Сервер вернул диапазон не с {offset} байта, скачивание {url} начинается сначала")
+                    os.remove(part_path)
+                    continue
+
+                total = _total_size(response, offset)
+                expected_sha256 = expected_sha256 or _digest_from_headers(response.headers)
+                if offset:
+                    logger.info(f"Продолжение скачивания {url} с {offset / 1024 / 1024:.1f} МБ")
+
+                downloaded = offset
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        check_cancelled(cancel_token)
+                        if bandwidth_limiter is not None:
+                            bandwidth_limiter.consume(len(chunk))
+                        f.write(chunk)
+                        downloaded += len(chunk)
+                        # Попытки считаются подряд: соединение, передавшее данные, сбрасывает счетчик
+                        attempt = 0
+                        reporter.report(downloaded, total)
+            break
+        except _RETRYABLE_ERRORS as e:
+            attempt += 1
+            if attempt > DOWNLOAD_RETRIES:
+                raise DownloadError(f"Не удалось скачать {url} за {DOWNLOAD_RETRIES} попыток подряд: {str(e)}")
+            delay = min(2 ** attempt, 30)
+            logger.warning(f"Обрыв скачивания {url} (попытка {attempt}): {str(e)}. Повтор через {delay} с")
+            _backoff(delay, cancel_token)
+
+    sha256 = _finalize_download(part_path, path, total, expected_sha256, reporter)
+    # Остатки сегментированной попытки больше не нужны
+    for leftover in (_segmented_part_path(path), _segments_path(path)):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return sha256
+
+def _finalize_download(part_path, path, total, expected_sha256, reporter):
+    """Проверить размер и контрольную сумму .part-файла и атомарно переместить его на место"""
+    size = os.path.getsize(part_path)
+    if total is not None and size != total:
+        raise DownloadError(f"Размер {part_path} ({size}) не совпадает с ожидаемым ({total})")
+
+    sha256 = _hash_file(part_path).hexdigest()
+    if expected_sha256 and sha256 != expected_sha256.lower():
+        # Поврежденный файл докачивать бессмысленно
+        os.remove(part_path)
+        raise DownloadError(f"Контрольная сумма {path} не совпадает: {sha256} != {expected_sha256}")
+
+    reporter.report(size, total, force=True)
+    os.replace(part_path, path)
+    with open(_checksum_path(path), "w", encoding="utf-8") as f:
+        f.write(sha256)
+
+    return sha256
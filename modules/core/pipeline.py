@@ -0,0 +1,188 @@
+"""
+Конвейерная обработка нескольких эпизодов
+
+Скачивание, транскрибирование и извлечение рекомендаций выполняются отдельными
+группами потоков, связанными ограниченными очередями: пока Whisper транскрибирует
+эпизод N, скачивается эпизод N+1 и извлекаются рекомендации эпизода N-1. Время
+обработки пакета определяется самым медленным этапом, а не суммой всех этапов.
+Ограниченные очереди не дают скачиваниям уйти далеко вперед транскрибирования.
+"""
+
+import queue
+import logging
+import threading
+
+from modules.utils.config import (
+    PIPELINE_DOWNLOAD_WORKERS, PIPELINE_TRANSCRIBE_WORKERS, PIPELINE_EXTRACT_WORKERS, PIPELINE_QUEUE_SIZE
+)
+from modules.core.podcast import (
+    prepare_ffmpeg, find_episode, run_download_stage, run_transcribe_stage, run_extract_stage
+)
+
+logger = logging.getLogger(__name__)
+
+# Признак завершения очереди для потоков этапа
+_STOP = object()
+
+class PipelineProgress:
+    """Счетчики прогресса конвейера по всему пакету эпизодов"""
+
+    def __init__(self, total, callback=None):
+        self.lock = threading.Lock()
+        self.callback = callback
+        self.counts = {
+            "total": total,
+            "downloaded": 0,
+            "transcribed": 0,
+            "extracted": 0,
+            "skipped": 0,
+            "failed": 0,
+        }
+
+    def add(self, key):
+        """Увеличить счетчик и сообщить о прогрессе"""
+        with self.lock:
+            self.counts[key] += 1
+            counts = dict(self.counts)
+            done = counts["extracted"] + counts["skipped"] + counts["failed"]
+
+        logger.info(
+            f"Конвейер: завершено {done}/{counts['total']} (скачано {counts['downloaded']}, "
+            f"транскрибировано {counts['transcribed']}, извлечено {counts['extracted']}, "
+            f"пропущено {counts['skipped']}, ошибок {counts['failed']})"
+        )
+        if self.callback:
+            self.callback(counts)
+
+def run_pipeline(episode_numbers, download_workers=PIPELINE_DOWNLOAD_WORKERS,
+                 transcribe_workers=PIPELINE_TRANSCRIBE_WORKERS, extract_workers=PIPELINE_EXTRACT_WORKERS,
+                 queue_size=PIPELINE_QUEUE_SIZE, force_retranscribe=False, progress=None, bandwidth_limiter=None):
+    """
+    Обработать эпизоды конвейером
+
+    Args:
+        episode_numbers: Номера эпизодов в порядке обработки
+        download_workers: Количество параллельных скачиваний
+        transcribe_workers: Количество параллельных транскрибирований
+        extract_workers: Количество параллельных извлечений рекомендаций
+        queue_size: Емкость очередей между этапами
+        force_retranscribe: Принудительно повторно транскрибировать аудио
+        progress: PipelineProgress для учета прогресса (по умолчанию создается новый)
+        bandwidth_limiter: BandwidthLimiter для ограничения скорости скачиваний
+
+    Returns:
+        dict: {номер эпизода: успешно ли обработан}
+    """
+    progress = progress or PipelineProgress(len(episode_numbers))
+    results = {}
+
+    if not episode_numbers:
+        return results
+
+    if not prepare_ffmpeg():
+        for episode_number in episode_numbers:
+            results[episode_number] = False
+            progress.add("failed")
+        return results
+
+    download_queue = queue.Queue()
+    transcribe_queue = queue.Queue(maxsize=queue_size)
+    extract_queue = queue.Queue(maxsize=queue_size)
+    for episode_number in episode_numbers:
+        download_queue.put(episode_number)
+
+    def fail(episode_number, stage, error=None):
+        if error is not None:
+            logger.error(f"Конвейер: ошибка этапа {stage} эпизода #{episode_number}: {str(error)}")
+        results[episode_number] = False
+        progress.add("failed")
+
+    def download_worker():
+        while True:
+            try:
+                episode_number = download_queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                found = find_episode(episode_number)
+                if not found:
+                    fail(episode_number, "download")
+                    continue
+                episode_id, audio_url = found
+                audio_path = run_download_stage(episode_number, audio_url, bandwidth_limiter=bandwidth_limiter)
+                if not audio_path:
+                    fail(episode_number, "download")
+                    continue
+            except Exception as e:
+                fail(episode_number, "download", e)
+                continue
+            progress.add("downloaded")
+            # Блокируется, если транскрибирование не успевает (обратное давление)
+            transcribe_queue.put((episode_number, episode_id, audio_path))
+
+    def transcribe_worker():
+        while True:
+            item = transcribe_queue.get()
+            if item is _STOP:
+                return
+            episode_number, episode_id, audio_path = item
+            try:
+                transcript = run_transcribe_stage(episode_id, episode_number, audio_path, force_retranscribe)
+                if not transcript:
+                    fail(episode_number, "transcribe")
+                    continue
+            except Exception as e:
+                fail(episode_number, "transcribe", e)
+                continue
+            progress.add("transcribed")
+            extract_queue.put((episode_number, episode_id, transcript))
+
+    def extract_worker():
+        while True:
+            item = extract_queue.get()
+            if item is _STOP:
+                return
+            episode_number, episode_id, transcript = item
+            try:
+                if run_extract_stage(episode_id, episode_number, transcript) is None:
+                    fail(episode_number, "extract")
+                    continue
+            except Exception as e:
+                fail(episode_number, "extract", e)
+                continue
+            results[episode_number] = True
+            progress.add("extracted")
+
+    def start(target, count, name):
+        threads = [
+            threading.Thread(target=target, name=f"pipeline-{name}-{i}", daemon=True)
+            for i in range(max(count, 1))
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def join(threads):
+        # Ожидание с таймаутом, чтобы Ctrl+C прерывал конвейер
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+
+    downloaders = start(download_worker, download_workers, "download")
+    transcribers = start(transcribe_worker, transcribe_workers, "transcribe")
+    extractors = start(extract_worker, extract_workers, "extract")
+
+    try:
+        # Этапы завершаются по очереди: после последнего скачивания - транскрибирование и т.д.
+        join(downloaders)
+        for _ in transcribers:
+            transcribe_queue.put(_STOP)
+        join(transcribers)
+        for _ in extractors:
+            extract_queue.put(_STOP)
+        join(extractors)
+    except KeyboardInterrupt:
+        logger.warning("Конвейер прерван, завершенные этапы сохранены в базе данных")
+        raise
+
+    return results
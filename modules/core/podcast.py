@@ -8,8 +8,6 @@ import sys
 import json
 import time
 import sqlite3
-import requests
-import xml.etree.ElementTree as ET
 import re
 import subprocess
 from datetime import datetime
@@ -17,22 +15,25 @@ from pathlib import Path
 import logging
 import threading
 import platform
-
-try:
-    import openai
-    import whisper
-    import torch
-except ImportError:
-    print("Для работы скрипта требуются библиотеки openai и whisper.")
-    print("Установите их: pip install openai git+https://github.com/openai/whisper.git torch")
-    sys.exit(1)
+import gc
 
 from modules.utils.config import (
     DOWNLOAD_DIR, TRANSCRIPT_DIR, RECOMMENDATIONS_DIR, DB_PATH,
-    HOSTS, HOST_ALIASES, WHISPER_MODEL, RSS_URL
+    HOSTS, HOST_ALIASES, WHISPER_MODEL
+)
+from modules.utils.feed import fetch_feed_episodes
+from modules.core.downloader import download_file, is_download_complete, DownloadError
+from modules.utils.analytics import refresh_episode_analytics
+from modules.utils.helpers import (
+    load_api_key, check_openai_api_key, split_text, extract_json_from_text, import_openai
+)
+from modules.utils.database import (
+    init_db, save_episode_to_db, update_episode_status, get_all_episodes,
+    update_episode_stage, get_episode_status, get_episode_recommendations
 )
-from modules.utils.helpers import load_api_key, check_openai_api_key, split_text, extract_json_from_text
-from modules.utils.database import init_db, save_episode_to_db, update_episode_status, get_all_episodes
+from modules.utils.leases import hold_lease, stage_lease_key
+from modules.utils.scheduler import acquire_resource, RESOURCE_TITLES
+from modules.utils.cancellation import JobCancelled, check_cancelled
 
 # Настройка логирования
 logging.basicConfig(
@@ -46,6 +47,23 @@ logger = logging.getLogger(__name__)
 tools_dir = os.path.join(os.path.dirname(__file__), "tools")
 os.makedirs(tools_dir, exist_ok=True)
 
+def _import_whisper():
+    """
+    Импорт whisper и torch (тяжелые зависимости, нужны только для транскрибирования)
+    
+    Импорт выполняется при первом транскрибировании, поэтому веб-интерфейс и консольный
+    просмотр архива не загружают библиотеки машинного обучения.
+    """
+    try:
+        import whisper
+        import torch
+        return whisper, torch
+    except ImportError:
+        raise RuntimeError(
+            "Для транскрибирования требуются библиотеки whisper и torch. "
+            "Установите их: pip install git+https://github.com/openai/whisper.git torch"
+        )
+
 # Получение пути к ffmpeg
 def get_ffmpeg_path():
     """
@@ -89,160 +107,61 @@ def check_ffmpeg():
 # Загрузка RSS и получение последнего эпизода
 def get_latest_episode():
     """Получить информацию о последнем эпизоде подкаста"""
-    logger.info("Загрузка RSS-ленты...")
-    response = requests.get(RSS_URL)
+    episodes = get_all_episodes_from_rss(1)
     
-    if response.status_code != 200:
-        logger.error(f"Ошибка загрузки RSS: {response.status_code}")
+    if not episodes:
+        logger.error("Не удалось определить последний эпизод")
         return None
     
-    # Парсинг XML
-    root = ET.fromstring(response.content)
-    
-    # Пространство имен RSS
-    ns = {'itunes': 'http://www.itunes.com/dtds/podcast-1.0.dtd'}
-    
-    # Находим первый (самый новый) эпизод
-    item = root.find(".//item")
-    if item is None:
-        logger.error("Не удалось найти эпизоды в RSS")
-        return None
-    
-    # Извлекаем данные
-    title = item.find("title").text
-    published_date = item.find("pubDate").text
-    
-    # Ищем URL аудиофайла
-    enclosure = item.find("enclosure")
-    if enclosure is None:
-        logger.error("Не удалось найти ссылку на аудиофайл")
-        return None
-    audio_url = enclosure.get("url")
-    
-    # Ищем номер эпизода в заголовке
-    episode_number = None
-    for part in title.split():
-        if part.isdigit():
-            episode_number = int(part)
-            break
-    
-    if not episode_number:
-        logger.error("Не удалось определить номер эпизода")
-        return None
-    
-    # Преобразуем дату в более удобный формат
-    try:
-        dt = datetime.strptime(published_date, "%a, %d %b %Y %H:%M:%S %z")
-        published_date_formatted = dt.strftime("%Y-%m-%d %H:%M:%S")
-    except:
-        published_date_formatted = published_date
-    
-    episode = {
-        "episode_number": episode_number,
-        "title": title,
-        "published_date": published_date_formatted,
-        "audio_url": audio_url
-    }
-    
-    return episode
+    return episodes[0]
 
 # Получение списка всех эпизодов из RSS-ленты
 def get_all_episodes_from_rss(limit=10):
-    """Получить информацию о последних эпизодах подкаста из RSS"""
-    logger.info("Загрузка RSS-ленты для получения списка эпизодов...")
-    response = requests.get(RSS_URL)
-    
-    if response.status_code != 200:
-        logger.error(f"Ошибка загрузки RSS: {response.status_code}")
-        return []
-    
-    # Парсинг XML
-    root = ET.fromstring(response.content)
-    
-    # Находим все эпизоды
-    items = root.findall(".//item")
-    if not items:
-        logger.error("Не удалось найти эпизоды в RSS")
-        return []
-    
-    episodes = []
-    for item in items[:limit]:  # Ограничиваем количество эпизодов
-        # Извлекаем данные
-        title = item.find("title").text
-        published_date = item.find("pubDate").text
-        
-        # Ищем URL аудиофайла
-        enclosure = item.find("enclosure")
-        if enclosure is None:
-            continue
-        audio_url = enclosure.get("url")
-        
-        # Ищем номер эпизода в заголовке
-        episode_number = None
-        for part in title.split():
-            if part.isdigit():
-                episode_number = int(part)
-                break
-        
-        if not episode_number:
-            continue
-        
-        # Преобразуем дату в более удобный формат
-        try:
-            dt = datetime.strptime(published_date, "%a, %d %b %Y %H:%M:%S %z")
-            published_date_formatted = dt.strftime("%Y-%m-%d %H:%M:%S")
-        except:
-            published_date_formatted = published_date
-        
-        episodes.append({
-            "episode_number": episode_number,
-            "title": title,
-            "published_date": published_date_formatted,
-            "audio_url": audio_url
-        })
-    
-    return episodes
+    """Получить информацию о последних эпизодах подкаста из RSS (с учетом кэша ленты)"""
+    return fetch_feed_episodes(limit)
 
 # Скачивание аудиофайла
-def download_episode(episode_number, audio_url):
-    """Скачать аудиофайл эпизода"""
+def download_episode(episode_number, audio_url, progress_callback=None, bandwidth_limiter=None, cancel_token=None):
+    """
+    Скачать аудиофайл эпизода (с докачкой и проверкой целостности)
+    
+    Args:
+        episode_number: Номер эпизода
+        audio_url: Адрес аудиофайла
+        progress_callback: Функция (downloaded_bytes, total_bytes) для отображения прогресса
+        bandwidth_limiter: BandwidthLimiter для ограничения скорости скачивания
+        cancel_token: CancelToken для отмены скачивания (временные файлы при отмене удаляются)
+    
+    Returns:
+        str: Путь к аудиофайлу или None в случае ошибки
+    """
     file_path = os.path.join(DOWNLOAD_DIR, f"episode_{episode_number}.mp3")
     
-    # Проверяем, существует ли файл уже
+    # Проверяем, существует ли файл уже и скачан ли он полностью
     if os.path.exists(file_path):
-        logger.info(f"Эпизод {episode_number} уже скачан")
-        return file_path
+        if is_download_complete(file_path, audio_url):
+            logger.info(f"Эпизод {episode_number} уже скачан")
+            return file_path
+        
+        # Недокачанный или непроверенный файл (скачан до появления проверок) продолжаем докачивать:
+        # если он полный, сервер ответит на запрос Range кодом 416
+        logger.warning(f"Файл эпизода {episode_number} неполный или не проверен, продолжаем скачивание")
+        os.replace(file_path, f"{file_path}.part")
     
     logger.info(f"Скачивание эпизода {episode_number}...")
-    response = requests.get(audio_url, stream=True)
-    
-    if response.status_code != 200:
-        logger.error(f"Ошибка скачивания: {response.status_code}")
+    try:
+        download_file(audio_url, file_path, progress_callback, bandwidth_limiter=bandwidth_limiter, cancel_token=cancel_token)
+    except DownloadError as e:
+        logger.error(str(e))
         return None
     
-    # Получаем размер файла для отображения прогресса
-    total_size = int(response.headers.get('content-length', 0))
-    block_size = 1024  # 1 Kb
-    
-    # Скачиваем с отображением прогресса
-    with open(file_path, 'wb') as f:
-        downloaded = 0
-        for data in response.iter_content(block_size):
-            f.write(data)
-            downloaded += len(data)
-            if total_size > 0:
-                progress = int(50 * downloaded / total_size)
-                sys.stdout.write(f"\r[{'=' * progress}{' ' * (50-progress)}] {downloaded / 1024 / 1024:.1f}MB / {total_size / 1024 / 1024:.1f}MB")
-                sys.stdout.flush()
-    
-    sys.stdout.write("\n")
     logger.info(f"Эпизод {episode_number} скачан: {file_path}")
     return file_path
 
 # Транскрибирование аудио
 def transcribe_audio(audio_path, model_name=WHISPER_MODEL, language="ru", initial_prompt=None, 
                     temperature=0.0, beam_size=5, condition_on_previous_text=True, verbose=False, 
-                    debug_output=False, use_diarization=True):
+                    debug_output=False, use_diarization=True, cancel_token=None):
     """
     Транскрибирует аудио файл с помощью локальной модели OpenAI Whisper.
     При включенной диаризации также определяет говорящих.
@@ -258,6 +177,7 @@ def transcribe_audio(audio_path, model_name=WHISPER_MODEL, language="ru", initia
         verbose (bool): Подробный вывод
         debug_output (bool): Вывод отладочной информации
         use_diarization (bool): Использовать диаризацию для определения говорящих
+        cancel_token (CancelToken): Токен отмены, проверяется перед декодированием каждого окна аудио
     
     Returns:
         str: Полный транскрибированный текст или None в случае ошибки
@@ -332,8 +252,7 @@ def transcribe_audio(audio_path, model_name=WHISPER_MODEL, language="ru", initia
     logger.info(f"Запуск процесса транскрибирования...")
     
     # Импорт модулей whisper и torch
-    import whisper
-    import torch
+    whisper, torch = _import_whisper()
     import threading
     from pathlib import Path
     
@@ -350,14 +269,27 @@ def transcribe_audio(audio_path, model_name=WHISPER_MODEL, language="ru", initia
         except Exception as e:
             logger.warning(f"Не удалось удалить файл прогресса: {e}")
     
+    model = None
+    cancelled = False
     try:
         # Проверка доступности CUDA
         device = "cuda" if torch.cuda.is_available() else "cpu"
         logger.info(f"Используется устройство: {device}")
         
         # Загрузка модели
+        check_cancelled(cancel_token)
         model = whisper.load_model(model_name, device=device)
         
+        # Whisper декодирует аудио окнами по 30 секунд; отмену проверяем перед каждым окном
+        if cancel_token is not None:
+            decode = model.decode
+            
+            def decode_with_cancel(*args, **kwargs):
+                cancel_token.raise_if_cancelled()
+                return decode(*args, **kwargs)
+            
+            model.decode = decode_with_cancel
+        
         logger.info(f"Начало транскрибирования файла {audio_path}...")
         logger.info("Этот процесс может занять длительное время в зависимости от размера файла")
         
@@ -462,6 +394,11 @@ def transcribe_audio(audio_path, model_name=WHISPER_MODEL, language="ru", initia
         
         return transcript
     
+    except JobCancelled:
+        cancelled = True
+        logger.info(f"Транскрибирование {audio_path} отменено")
+        raise
+    
     except Exception as e:
         logger.error(f"Ошибка при транскрибировании: {str(e)}")
         import traceback
@@ -482,10 +419,20 @@ def transcribe_audio(audio_path, model_name=WHISPER_MODEL, language="ru", initia
             except:
                 pass
             
-        # Закрываем файл прогресса с сообщением о завершении
+        # Освобождаем память модели (в том числе видеопамять), не дожидаясь сборщика мусора
+        model = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        
+        # Закрываем файл прогресса с сообщением о завершении (после отмены - удаляем)
         try:
-            with open(progress_file, "a") as f:
-                f.write(f"{datetime.now().isoformat()} - Функция транскрибирования завершена\n")
+            if cancelled:
+                if os.path.exists(progress_file):
+                    os.remove(progress_file)
+            else:
+                with open(progress_file, "a") as f:
+                    f.write(f"{datetime.now().isoformat()} - Функция транскрибирования завершена\n")
         except:
             pass
 
@@ -544,8 +491,9 @@ def should_update_transcript(episode_number, current_model=WHISPER_MODEL, force_
     return False
 
 # Извлечение рекомендаций из транскрипции
-def extract_recommendations(transcript_text, episode_number, api_key):
-    """Извлечение рекомендаций из транскрипции используя OpenAI API"""
+def extract_recommendations(transcript_text, episode_number, api_key, cancel_token=None):
+    """Извлечение рекомендаций из транскрипции используя OpenAI API (отмена проверяется перед каждой частью)"""
+    openai = import_openai()
     client = openai.OpenAI(api_key=api_key)
     
     logger.info("Анализ транскрипции для извлечения рекомендаций...")
@@ -594,6 +542,7 @@ def extract_recommendations(transcript_text, episode_number, api_key):
         all_recommendations = []
         
         for i, chunk in enumerate(chunks):
+            check_cancelled(cancel_token)
             logger.info(f"Обработка части {i+1}/{len(chunks)} транскрипции...")
             
             try:
@@ -670,72 +619,18 @@ def load_recommendations_from_json(episode_number):
         logger.error(f"Ошибка при загрузке продуктов/технологий из файла: {str(e)}")
         return None
 
-# Получение статуса эпизода
-def get_episode_status(episode_number):
-    """
-    Получает статус обработки эпизода
-    
-    Returns:
-        dict: Словарь с информацией о статусе эпизода
-        {
-            'exists': bool,  # Существует ли эпизод в базе
-            'downloaded': bool,  # Скачан ли аудиофайл
-            'transcribed': bool,  # Есть ли транскрипция
-            'recommendations': bool,  # Есть ли извлеченные рекомендации
-            'processed': int,  # Статус обработки из БД (0-2)
-        }
-    """
-    status = {
-        'exists': False,
-        'downloaded': False,
-        'transcribed': False,
-        'recommendations': False,
-        'processed': 0
-    }
-    
-    # Проверяем наличие в базе данных
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT id, processed FROM episodes WHERE episode_number = ?", (episode_number,))
-    result = cursor.fetchone()
-    
-    if result:
-        status['exists'] = True
-        status['processed'] = result[1]
-    
-    conn.close()
-    
-    # Проверяем наличие файлов
-    audio_path = os.path.join(DOWNLOAD_DIR, f"episode_{episode_number}.mp3")
-    transcript_path = os.path.join(TRANSCRIPT_DIR, f"episode_{episode_number}_transcript.txt")
-    recommendation_path = os.path.join(RECOMMENDATIONS_DIR, f"episode_{episode_number}_products.json")
-    
-    status['downloaded'] = os.path.exists(audio_path)
-    status['transcribed'] = os.path.exists(transcript_path)
-    status['recommendations'] = os.path.exists(recommendation_path)
-    
-    return status
+def _log_status(message, progress=None):
+    """Функция обновления статуса по умолчанию: только запись в лог"""
+    logger.info(message)
 
-# Обработка эпизода целиком
-def process_episode(episode_number, force_retranscribe=False, status_callback=None):
+# Подготовка ffmpeg для библиотек транскрибирования
+def prepare_ffmpeg(update_status=_log_status):
     """
-    Полная обработка эпизода: скачивание, транскрибирование и извлечение рекомендаций
-    
-    Args:
-        episode_number: Номер эпизода
-        force_retranscribe: Принудительное повторное транскрибирование
-        status_callback: Функция обратного вызова для обновления статуса (message, progress_percent)
+    Находит ffmpeg, копирует его в корень проекта (Windows) и добавляет корень проекта в PATH
     
     Returns:
-        bool: Успешно ли выполнена обработка
+        bool: Найден ли ffmpeg
     """
-    def update_status(message, progress=None):
-        """Обновляет статус выполнения, если предоставлен callback"""
-        if status_callback:
-            status_callback(message, progress)
-        logger.info(message)
-    
     # Проверяем наличие ffmpeg в самом начале
     ffmpeg_path = get_ffmpeg_path()
     if not ffmpeg_path:
@@ -745,11 +640,12 @@ def process_episode(episode_number, force_retranscribe=False, status_callback=No
     # Устанавливаем путь к ffmpeg для библиотек, которые его используют
     os.environ["FFMPEG_PATH"] = ffmpeg_path
     
+    # Определяем текущий рабочий каталог (корень проекта)
+    root_dir = os.getcwd()
+    
     # Копируем ffmpeg и ffprobe в корневой каталог проекта
     try:
         import shutil
-        # Определяем текущий рабочий каталог (корень проекта)
-        root_dir = os.getcwd()
         # Получаем пути к ffprobe
         ffprobe_path = os.path.join(os.path.dirname(ffmpeg_path), "ffprobe.exe")
         
@@ -771,53 +667,124 @@ def process_episode(episode_number, force_retranscribe=False, status_callback=No
     
     # Добавляем корневой каталог проекта в PATH
     original_path = os.environ.get('PATH', '')
-    os.environ['PATH'] = f"{root_dir}{os.pathsep}{original_path}"
+    if root_dir not in original_path.split(os.pathsep):
+        os.environ['PATH'] = f"{root_dir}{os.pathsep}{original_path}"
     update_status(f"Добавлен рабочий каталог {root_dir} в PATH", 3)
+    return True
+
+# Поиск эпизода в базе данных или в RSS-ленте
+def find_episode(episode_number, update_status=_log_status):
+    """
+    Находит эпизод в базе данных, а если его там нет - в RSS-ленте (с добавлением в базу)
     
-    update_status(f"Начало обработки эпизода #{episode_number}", 5)
-    
-    # Проверяем существование эпизода
+    Returns:
+        tuple: (episode_id, audio_url) или None, если эпизод не найден
+    """
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     cursor.execute("SELECT id, audio_url FROM episodes WHERE episode_number = ?", (episode_number,))
     result = cursor.fetchone()
+    conn.close()
     
     if result:
         episode_id, audio_url = result
         update_status(f"Найден эпизод #{episode_number} в базе данных (ID: {episode_id})", 10)
-    else:
-        # Получаем информацию из RSS
-        update_status("Поиск эпизода в RSS ленте...", 8)
-        episodes = get_all_episodes_from_rss(50)  # Получаем большой список для поиска
-        episode_data = None
-        
-        for ep in episodes:
-            if ep["episode_number"] == episode_number:
-                episode_data = ep
-                break
-        
-        if not episode_data:
-            update_status(f"Эпизод #{episode_number} не найден ни в базе данных, ни в RSS.", 0)
-            conn.close()
-            return False
-        
-        # Сохраняем информацию в базу
-        episode_id = save_episode_to_db(episode_data)
-        audio_url = episode_data["audio_url"]
-        update_status(f"Эпизод #{episode_number} добавлен в базу данных (ID: {episode_id})", 15)
+        return episode_id, audio_url
     
-    # Скачивание аудио
+    # Получаем информацию из RSS
+    update_status("Поиск эпизода в RSS ленте...", 8)
+    episodes = get_all_episodes_from_rss(50)  # Получаем большой список для поиска
+    episode_data = None
+    
+    for ep in episodes:
+        if ep["episode_number"] == episode_number:
+            episode_data = ep
+            break
+    
+    if not episode_data:
+        update_status(f"Эпизод #{episode_number} не найден ни в базе данных, ни в RSS. "
+                      f"Для старых эпизодов загрузите архив: python run.py --backfill", 0)
+        return None
+    
+    # Сохраняем информацию в базу
+    episode_id = save_episode_to_db(episode_data)
+    update_status(f"Эпизод #{episode_number} добавлен в базу данных (ID: {episode_id})", 15)
+    return episode_id, episode_data["audio_url"]
+
+# Этап скачивания
+def _resource_wait_status(update_status, resource, progress):
+    """Сообщение о позиции в очереди ресурса для status_callback"""
+    def on_wait(position):
+        update_status(f"Ожидание ресурса «{RESOURCE_TITLES[resource]}»: позиция {position} в очереди", progress)
+    return on_wait
+
+def run_download_stage(episode_number, audio_url, update_status=_log_status, bandwidth_limiter=None, cancel_token=None):
+    """
+    Скачивает аудиофайл эпизода и записывает состояние этапа в базу данных
+    
+    Этап выполняется под арендой: если другой процесс уже скачивает этот эпизод,
+    функция дождется завершения и использует скачанный файл.
+    
+    Returns:
+        str: Путь к аудиофайлу или None в случае ошибки
+    """
     update_status("Скачивание аудио файла...", 20)
-    audio_path = download_episode(episode_number, audio_url)
-    if not audio_path:
-        update_status(f"Не удалось скачать эпизод #{episode_number}", 0)
-        conn.close()
-        return False
+    
+    def download_progress(downloaded, total):
+        if total:
+            update_status(f"Скачано {downloaded / 1024 / 1024:.1f} МБ из {total / 1024 / 1024:.1f} МБ",
+                          20 + int(10 * downloaded / total))
+        else:
+            update_status(f"Скачано {downloaded / 1024 / 1024:.1f} МБ", 20)
+    
+    def wait_status(lease):
+        update_status(f"Эпизод #{episode_number} уже скачивается другим процессом, ожидание...", 20)
+    
+    with hold_lease(stage_lease_key(episode_number, "download"), on_wait=wait_status):
+        with acquire_resource("download", f"episode:{episode_number}",
+                              _resource_wait_status(update_status, "download", 20), cancel_token):
+            stage_started = time.time()
+            audio_path = download_episode(episode_number, audio_url, download_progress, bandwidth_limiter, cancel_token)
+        if not audio_path:
+            update_status(f"Не удалось скачать эпизод #{episode_number}", 0)
+            return None
+        
+        update_episode_stage(episode_number, "download", audio_path, time.time() - stage_started)
     
     update_status("Аудио файл успешно скачан", 30)
+    return audio_path
+
+# Этап транскрибирования
+def run_transcribe_stage(episode_id, episode_number, audio_path, force_retranscribe=False, update_status=_log_status,
+                         cancel_token=None):
+    """
+    Транскрибирует аудио (или загружает актуальную транскрипцию) и записывает состояние этапа
     
-    # Транскрибирование
+    Этап выполняется под арендой: если другой процесс уже транскрибирует этот эпизод,
+    функция дождется завершения и загрузит готовую транскрипцию вместо повторного запуска Whisper.
+    
+    Returns:
+        str: Текст транскрипции или None в случае ошибки
+    """
+    def wait_status(lease):
+        update_status(f"Эпизод #{episode_number} уже транскрибируется другим процессом, ожидание...", 35)
+    
+    with hold_lease(stage_lease_key(episode_number, "transcribe"), on_wait=wait_status) as waited:
+        # Транскрипция, созданная процессом, которого мы ждали, уже актуальна
+        if waited and get_episode_status(episode_number).get("transcribed"):
+            force_retranscribe = False
+        transcript = _transcribe_episode(episode_number, audio_path, force_retranscribe, update_status, cancel_token)
+    
+    if not transcript:
+        return None
+    
+    # Обновление статуса эпизода: транскрибирован
+    update_episode_status(episode_id, 1)
+    return transcript
+
+def _transcribe_episode(episode_number, audio_path, force_retranscribe, update_status, cancel_token=None):
+    """Транскрибирование или загрузка актуальной транскрипции (выполняется под арендой)"""
     transcript_path = os.path.join(TRANSCRIPT_DIR, f"episode_{episode_number}_transcript.txt")
     
     # Проверяем необходимость обновления транскрипции
@@ -828,69 +795,155 @@ def process_episode(episode_number, force_retranscribe=False, status_callback=No
         with open(transcript_path, 'r', encoding='utf-8') as f:
             transcript = f.read()
         update_status(f"Загружена существующая транскрипция (длина: {len(transcript)} символов)", 50)
+        update_episode_stage(episode_number, "transcribe", transcript_path)
     else:
         if need_update and os.path.exists(transcript_path):
             update_status(f"Обнаружена смена модели или флаг принудительного обновления. Запускаем новую транскрипцию...", 35)
         
         update_status("Запуск процесса транскрибирования. Это может занять длительное время...", 40)
-        
-        # Транскрибирование аудио с использованием локальной модели Whisper
-        transcript = transcribe_audio(
-            audio_path, 
-            model_name=WHISPER_MODEL,
-            language="ru",
-            initial_prompt=f"Подкаст Радио-Т с ведущими {', '.join(HOSTS)}",
-            temperature=0.0,
-            beam_size=5,
-            condition_on_previous_text=True,
-            verbose=True,
-            debug_output=True,
-            use_diarization=True
-        )
+        stage_started = time.time()
+        
+        # Транскрибирование аудио с использованием локальной модели Whisper;
+        # модель загружается только после получения слота, поэтому в памяти их не больше лимита
+        with acquire_resource("transcribe", f"episode:{episode_number}",
+                              _resource_wait_status(update_status, "transcribe", 40), cancel_token):
+            transcript = transcribe_audio(
+                audio_path, 
+                model_name=WHISPER_MODEL,
+                language="ru",
+                initial_prompt=f"Подкаст Радио-Т с ведущими {', '.join(HOSTS)}",
+                temperature=0.0,
+                beam_size=5,
+                condition_on_previous_text=True,
+                verbose=True,
+                debug_output=True,
+                use_diarization=True,
+                cancel_token=cancel_token
+            )
         
         if not transcript:
             update_status(f"Не удалось транскрибировать эпизод #{episode_number}", 0)
-            conn.close()
-            return False
+            return None
         
         # Сохранение транскрипции
         save_transcript(episode_number, transcript, WHISPER_MODEL)
+        update_episode_stage(episode_number, "transcribe", transcript_path, time.time() - stage_started)
         update_status("Транскрибирование завершено успешно", 60)
     
-    # Обновление статуса эпизода: транскрибирован
-    update_episode_status(episode_id, 1)
+    return transcript
+
+# Этап извлечения рекомендаций
+def run_extract_stage(episode_id, episode_number, transcript, update_status=_log_status, cancel_token=None):
+    """
+    Извлекает рекомендации из транскрипции, сохраняет их и обновляет аналитику
+    
+    Этап выполняется под арендой: если другой процесс уже извлекает рекомендации
+    этого эпизода, функция дождется завершения и вернет его результат.
     
+    Returns:
+        int: Количество сохраненных рекомендаций или None в случае ошибки
+    """
+    def wait_status(lease):
+        update_status(f"Рекомендации эпизода #{episode_number} уже извлекаются другим процессом, ожидание...", 70)
+    
+    with hold_lease(stage_lease_key(episode_number, "extract"), on_wait=wait_status) as waited:
+        if waited and get_episode_status(episode_number).get("recommendations"):
+            rec_count = len(get_episode_recommendations(episode_id))
+            update_status(f"Рекомендации эпизода #{episode_number} извлечены другим процессом", 95)
+            return rec_count
+        return _extract_episode(episode_id, episode_number, transcript, update_status, cancel_token)
+
+def _extract_episode(episode_id, episode_number, transcript, update_status, cancel_token=None):
+    """Извлечение и сохранение рекомендаций (выполняется под арендой)"""
     # Загрузка API ключа для анализа текста
     api_key = load_api_key()
     if not api_key:
         update_status("API ключ OpenAI не найден. Невозможно извлечь рекомендации.", 0)
-        conn.close()
-        return False
+        return None
     
     # Проверка работоспособности API ключа
     if not check_openai_api_key(api_key):
         update_status("API ключ OpenAI не работает. Проверьте квоту и лимиты.", 0)
-        conn.close()
-        return False
+        return None
     
     # Извлечение рекомендаций
     update_status("Извлечение рекомендаций из транскрипции...", 70)
-    recommendations = extract_recommendations(transcript, episode_number, api_key)
+    stage_started = time.time()
+    with acquire_resource("llm", f"episode:{episode_number}",
+                          _resource_wait_status(update_status, "llm", 70), cancel_token):
+        recommendations = extract_recommendations(transcript, episode_number, api_key, cancel_token)
     
     if not recommendations:
         update_status(f"Не удалось извлечь рекомендации для эпизода #{episode_number}", 0)
-        conn.close()
-        return False
+        return None
     
     # Сохранение рекомендаций в БД
     update_status("Сохранение рекомендаций в базу данных...", 90)
     from modules.utils.database import save_recommendations_to_db
-    rec_count = save_recommendations_to_db(recommendations, episode_id)
+    with acquire_resource("db", f"episode:{episode_number}",
+                          _resource_wait_status(update_status, "db", 90), cancel_token):
+        rec_count = save_recommendations_to_db(recommendations, episode_id)
+        recommendations_path = os.path.join(RECOMMENDATIONS_DIR, f"episode_{episode_number}_products.json")
+        update_episode_stage(episode_number, "extract", recommendations_path, time.time() - stage_started)
+        
+        # Обновление статуса эпизода: полностью обработан
+        update_episode_status(episode_id, 2)
+        
+        # Инкрементальное обновление аналитики по архиву
+        refresh_episode_analytics(episode_id)
+    return rec_count
+
+# Обработка эпизода целиком
+def process_episode(episode_number, force_retranscribe=False, status_callback=None, cancel_token=None):
+    """
+    Полная обработка эпизода: скачивание, транскрибирование и извлечение рекомендаций
     
-    # Обновление статуса эпизода: полностью обработан
-    update_episode_status(episode_id, 2)
+    Args:
+        episode_number: Номер эпизода
+        force_retranscribe: Принудительное повторное транскрибирование
+        status_callback: Функция обратного вызова для обновления статуса (message, progress_percent)
+        cancel_token: CancelToken для отмены обработки на границе блока (скачивания,
+            окна Whisper или части текста)
     
-    update_status(f"Обработка эпизода #{episode_number} успешно завершена. Извлечено {rec_count} рекомендаций", 100)
+    Returns:
+        bool: Успешно ли выполнена обработка
     
-    conn.close()
-    return True 
\ No newline at end of file
+    Raises:
+        JobCancelled: Если обработка отменена
+    """
+    def update_status(message, progress=None):
+        """Обновляет статус выполнения, если предоставлен callback"""
+        if status_callback:
+            status_callback(message, progress)
+        logger.info(message)
+    
+    if not prepare_ffmpeg(update_status):
+        return False
+    
+    update_status(f"Начало обработки эпизода #{episode_number}", 5)
+    
+    # Проверяем существование эпизода
+    found = find_episode(episode_number, update_status)
+    if not found:
+        return False
+    episode_id, audio_url = found
+    
+    # Скачивание аудио
+    audio_path = run_download_stage(episode_number, audio_url, update_status, cancel_token=cancel_token)
+    if not audio_path:
+        return False
+    
+    # Транскрибирование
+    check_cancelled(cancel_token)
+    transcript = run_transcribe_stage(episode_id, episode_number, audio_path, force_retranscribe, update_status, cancel_token)
+    if not transcript:
+        return False
+    
+    # Извлечение рекомендаций
+    check_cancelled(cancel_token)
+    rec_count = run_extract_stage(episode_id, episode_number, transcript, update_status, cancel_token)
+    if rec_count is None:
+        return False
+    
+    update_status(f"Обработка эпизода #{episode_number} успешно завершена. Извлечено {rec_count} рекомендаций", 100)
+    return True
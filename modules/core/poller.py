@@ -0,0 +1,128 @@
+"""
+Фоновый опрос RSS-ленты и автоматическая постановка новых эпизодов в обработку
+
+Лента запрашивается условно (ETag / Last-Modified, см. modules/utils/feed.py) раз в
+PODCAST_CHECK_INTERVAL секунд со случайным разбросом, чтобы несколько экземпляров не
+опрашивали ленту одновременно; на ответ 304 новые эпизоды не ищутся в ленте, но отложенные
+ставятся в обработку снова. После ошибок пауза между опросами растет экспоненциально.
+
+Новые эпизоды отмечаются в таблице pending_auto_episodes в той же транзакции, что и
+добавляются в базу данных, а отметка снимается только после успешной постановки в
+обработку. Поэтому эпизод, который не удалось поставить в обработку, повторяется
+при следующем опросе.
+"""
+
+import random
+import logging
+import threading
+
+from modules.utils.config import (
+    PODCAST_CHECK_INTERVAL, FEED_POLL_LIMIT, FEED_POLL_MAX_BACKOFF
+)
+from modules.utils.feed import fetch_feed_episodes
+from modules.utils.jobs import enqueue_job, JOB_PRIORITY_AUTO
+from modules.utils.database import save_new_episodes, get_pending_auto_episodes, remove_pending_auto_episode
+
+logger = logging.getLogger(__name__)
+
+# Доля случайного разброса интервала опроса
+POLL_JITTER = 0.1
+
+def poll_feed_once(on_new_episode=None):
+    """
+    Проверить ленту, добавить новые эпизоды в базу данных и поставить их в обработку
+
+    В обработку ставятся только эпизоды новее последнего известного. Если база данных
+    пуста, в обработку ставится только последний эпизод, а остальные лишь добавляются в базу.
+    Эпизоды, которые не удалось поставить в обработку при прошлых опросах, ставятся снова.
+
+    Args:
+        on_new_episode: Функция, вызываемая с номером каждого нового эпизода (от старых к новым);
+            исключение или возврат False оставляют эпизод до следующего опроса
+
+    Returns:
+        list: Номера эпизодов, поставленных в обработку
+    """
+    episodes = fetch_feed_episodes(FEED_POLL_LIMIT, force=True, stale_ok=False)
+    if not episodes:
+        raise RuntimeError("Не удалось получить эпизоды из RSS-ленты")
+
+    save_new_episodes(episodes, auto_process=True)
+
+    queued = []
+    for episode_number in get_pending_auto_episodes():
+        logger.info(f"Найден новый эпизод #{episode_number}")
+        if on_new_episode is not None:
+            try:
+                if on_new_episode(episode_number) is False:
+                    logger.error(f"Эпизод #{episode_number} не поставлен в обработку, повтор при следующем опросе")
+                    continue
+            except Exception as e:
+                # Ошибка одного эпизода не должна мешать остальным и откладывать опрос ленты
+                logger.error(f"Ошибка постановки эпизода #{episode_number} в обработку: {str(e)}")
+                continue
+        remove_pending_auto_episode(episode_number)
+        queued.append(episode_number)
+
+    return queued
+
+def enqueue_new_episode(episode_number):
+    """
+    Поставить новый эпизод в очередь задач с приоритетом фонового опроса (callback опроса)
+
+    Эпизод, уже ожидающий обработки или обрабатываемый, тоже считается поставленным.
+
+    Returns:
+        dict: Задача обработки эпизода
+    """
+    job, _ = enqueue_job(episode_number, False, JOB_PRIORITY_AUTO)
+    return job
+
+def next_poll_delay(failures, interval=PODCAST_CHECK_INTERVAL):
+    """Пауза до следующего опроса с учетом числа ошибок подряд и случайного разброса"""
+    delay = min(interval * (2 ** failures), max(interval, FEED_POLL_MAX_BACKOFF))
+    return delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+def run_feed_poller(on_new_episode=None, stop_event=None, interval=PODCAST_CHECK_INTERVAL):
+    """
+    Опрашивать ленту до установки stop_event
+
+    Args:
+        on_new_episode: Функция, вызываемая с номером каждого нового эпизода
+        stop_event: threading.Event для остановки опроса (None - опрашивать бесконечно)
+        interval: Интервал опроса в секундах
+    """
+    stop_event = stop_event or threading.Event()
+    failures = 0
+
+    logger.info(f"Запущен опрос RSS-ленты с интервалом {interval} с")
+    while not stop_event.is_set():
+        try:
+            poll_feed_once(on_new_episode)
+            failures = 0
+        except Exception as e:
+            failures += 1
+            logger.error(f"Ошибка опроса RSS-ленты (попытка {failures}): {str(e)}")
+
+        delay = next_poll_delay(failures, interval)
+        logger.debug(f"Следующий опрос RSS-ленты через {delay:.0f} с")
+        stop_event.wait(delay)
+
+    logger.info("Опрос RSS-ленты остановлен")
+
+def start_feed_poller(on_new_episode=None, interval=PODCAST_CHECK_INTERVAL):
+    """
+    Запустить опрос ленты в фоновом потоке
+
+    Returns:
+        threading.Event: Событие, установка которого останавливает опрос
+    """
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=run_feed_poller,
+        args=(on_new_episode, stop_event, interval),
+        name="feed-poller",
+        daemon=True
+    )
+    thread.start()
+    return stop_event
@@ -0,0 +1,194 @@
+"""
+Воркер очереди задач обработки эпизодов
+
+Воркер забирает задачи из таблицы jobs (см. modules/utils/jobs.py), обрабатывает эпизод
+и сохраняет прогресс в той же таблице, откуда его читает веб-сервер. Воркеров можно
+запускать сколько угодно и на любых машинах с доступом к базе данных:
+
+    python run.py --worker
+
+Веб-сервер может дополнительно запускать WEB_EMBEDDED_WORKERS воркеров в отдельных
+процессах (по умолчанию 0). При остановке воркер прерывает текущую задачу на ближайшей
+границе блока и возвращает ее в очередь, не расходуя попытку.
+"""
+
+import time
+import signal
+import logging
+import platform
+import threading
+import multiprocessing
+
+from modules.utils.config import LEASE_TTL, JOB_POLL_INTERVAL, JOB_CANCEL_POLL_INTERVAL, WORKER_SHUTDOWN_TIMEOUT
+from modules.utils.leases import make_owner_id
+from modules.utils.cancellation import CancelToken, JobCancelled
+from modules.utils.jobs import (
+    claim_job, heartbeat_job, update_job_progress, finish_job, is_job_cancel_requested, cancel_job, release_job
+)
+
+logger = logging.getLogger(__name__)
+
+# Установка метода запуска процессов для Windows - делаем это на уровне модуля
+if platform.system() == 'Windows':
+    try:
+        multiprocessing.set_start_method('spawn', force=True)
+    except RuntimeError:
+        # Если метод уже был установлен, игнорируем ошибку
+        pass
+
+def _watch_job(job_id, owner, cancel_token, stop_event, worker_stop=None):
+    """
+    Сопровождать выполняющуюся задачу до установки stop_event: продлевать ее аренду
+    каждые LEASE_TTL/3 секунд и устанавливать cancel_token, когда запрошена отмена
+    задачи или остановка воркера (worker_stop)
+    """
+    renewed_at = time.monotonic()
+    while not stop_event.wait(JOB_CANCEL_POLL_INTERVAL):
+        try:
+            if not cancel_token.cancelled and worker_stop is not None and worker_stop.is_set():
+                logger.info(f"Воркер останавливается, задача {job_id} будет возвращена в очередь")
+                cancel_token.cancel()
+
+            if not cancel_token.cancelled and is_job_cancel_requested(job_id):
+                logger.info(f"Запрошена отмена задачи {job_id}, обработка будет остановлена")
+                cancel_token.cancel()
+
+            if time.monotonic() - renewed_at >= LEASE_TTL / 3:
+                renewed_at = time.monotonic()
+                if not heartbeat_job(job_id, owner):
+                    logger.error(f"Аренда задачи {job_id} потеряна (задача возвращена в очередь)")
+                    return
+        except Exception as e:
+            logger.warning(f"Не удалось обновить состояние задачи {job_id}: {str(e)}")
+
+def run_job(job, owner, worker_stop=None):
+    """
+    Выполнить захваченную задачу и сохранить ее результат
+
+    Args:
+        worker_stop: Событие остановки воркера; после его установки задача прерывается
+            и возвращается в очередь
+
+    Returns:
+        str: Новое состояние задачи ("completed", "queued" для повтора или после остановки
+            воркера, "failed" или "cancelled")
+    """
+    # Импорт здесь, чтобы процесс воркера загружал тяжелые модули только при запуске задачи
+    from modules.core.podcast import process_episode
+
+    job_id = job["id"]
+    episode_number = job["episode_number"]
+    logger.info(f"Воркер {owner}: задача {job_id}, эпизод #{episode_number} (попытка {job['attempts']})")
+
+    def status_update_callback(message, progress):
+        if progress is not None:
+            update_job_progress(job_id, owner, message, progress)
+
+    cancel_token = CancelToken()
+    stop_event = threading.Event()
+    watcher = threading.Thread(
+        target=_watch_job, args=(job_id, owner, cancel_token, stop_event, worker_stop),
+        name=f"job-{job_id}", daemon=True
+    )
+    watcher.start()
+    try:
+        if process_episode(episode_number, job["force_retranscribe"], status_update_callback, cancel_token):
+            success, message = True, "Эпизод успешно обработан"
+        else:
+            success, message = False, "При обработке эпизода возникли ошибки"
+    except JobCancelled:
+        # Временные файлы удалены этапами обработки, память модели освобождена
+        if worker_stop is not None and worker_stop.is_set() and not is_job_cancel_requested(job_id):
+            release_job(job_id, owner)
+            logger.info(f"Задача {job_id} (эпизод #{episode_number}) возвращена в очередь")
+            return "queued"
+        cancel_job(job_id, owner)
+        logger.info(f"Задача {job_id} (эпизод #{episode_number}) отменена")
+        return "cancelled"
+    except Exception as e:
+        logger.exception(f"Ошибка при выполнении задачи {job_id}")
+        success, message = False, f"Ошибка: {str(e)}"
+    finally:
+        stop_event.set()
+
+    status = finish_job(job_id, owner, success, message)
+    logger.info(f"Задача {job_id} (эпизод #{episode_number}): {status}")
+    return status
+
+def run_worker(stop_event=None, poll_interval=JOB_POLL_INTERVAL):
+    """
+    Обрабатывать задачи из очереди до установки stop_event
+
+    Args:
+        stop_event: threading.Event или multiprocessing.Event для остановки воркера
+            (текущая задача прерывается и возвращается в очередь)
+        poll_interval: Интервал проверки пустой очереди в секундах
+    """
+    stop_event = stop_event or threading.Event()
+    owner = make_owner_id()
+    logger.info(f"Воркер очереди {owner} запущен")
+
+    while not stop_event.is_set():
+        try:
+            job = claim_job(owner)
+        except Exception as e:
+            logger.error(f"Ошибка чтения очереди задач: {str(e)}")
+            job = None
+
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+
+        run_job(job, owner, stop_event)
+
+    logger.info(f"Воркер очереди {owner} остановлен")
+
+def _worker_process_main(stop_event):
+    """Точка входа процесса встроенного воркера - на верхнем уровне модуля для spawn"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Ctrl+C получает вся группа процессов: воркер останавливает веб-сервер через stop_event,
+    # чтобы успеть вернуть задачу в очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        run_worker(stop_event)
+    except KeyboardInterrupt:
+        pass
+
+def start_worker_processes(count):
+    """
+    Запустить count воркеров очереди в отдельных процессах
+
+    Процессы запускаются методом spawn (не наследуют цикл событий веб-сервера) и не
+    являются демонами: остановить их нужно через stop_worker_processes(), чтобы
+    выполняющиеся задачи вернулись в очередь.
+
+    Returns:
+        tuple: (событие остановки, список процессов)
+    """
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    processes = []
+    for index in range(count):
+        process = context.Process(
+            target=_worker_process_main, args=(stop_event,), name=f"queue-worker-{index}"
+        )
+        process.start()
+        processes.append(process)
+    return stop_event, processes
+
+def stop_worker_processes(stop_event, processes, timeout=WORKER_SHUTDOWN_TIMEOUT):
+    """
+    Остановить воркеры, запущенные start_worker_processes() (блокирующий вызов)
+
+    Воркеры возвращают текущие задачи в очередь на ближайшей границе блока обработки.
+    Процессы, не успевшие остановиться за timeout секунд, завершаются принудительно,
+    а их задачи вернутся в очередь после истечения аренды.
+    """
+    stop_event.set()
+    deadline = time.monotonic() + timeout
+    for process in processes:
+        process.join(max(0, deadline - time.monotonic()))
+        if process.is_alive():
+            logger.warning(f"Воркер {process.name} не остановился за {timeout} с, процесс завершается")
+            process.terminate()
+            process.join()
@@ -4,13 +4,18 @@
 
 import os
 import logging
-from .database import get_all_episodes
+from .database import get_all_episodes, reconcile_episode_stages
 
-def recover_episodes():
+def recover_episodes(repair=True):
     """
     Восстановление информации об эпизодах на основе существующих файлов
     
+    Args:
+        repair: Сверить состояние этапов в базе данных с файлами на диске
+    
     Returns:
         list: Список восстановленных эпизодов или None, если восстановление не требуется
     """
+    if repair:
+        reconcile_episode_stages()
     return get_all_episodes() 
\ No newline at end of file
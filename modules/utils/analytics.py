@@ -0,0 +1,469 @@
+"""
+Материализованная аналитика по всему архиву эпизодов
+
+Агрегаты (топ продуктов, упоминания по ведущим, первое и последнее появление продукта,
+динамика упоминаний по месяцам) хранятся в отдельных таблицах. Они пересчитываются
+инкрементально после обработки эпизода, поэтому чтение не зависит от размера архива.
+"""
+
+import re
+import sqlite3
+import logging
+from modules.utils.config import DB_PATH
+from modules.utils.helpers import normalize_product_name, split_host_field
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество параметров в одном условии IN (...)
+_IN_CHUNK_SIZE = 500
+
+# Сколько последних записей журнала изменений продуктов хранится для инкрементальных читателей
+_PRODUCT_CHANGES_KEEP = 10000
+
+def init_analytics_tables(cursor):
+    """Создание таблиц аналитики (вызывается из init_db)"""
+    # Вклад каждого эпизода: одна строка на пару (продукт, ведущий).
+    # mentions - упоминания продукта этим ведущим; product_mentions - упоминания продукта
+    # в эпизоде, записанные только в одну строку продукта, чтобы не считать их дважды
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analytics_episode_mentions (
+        episode_id INTEGER,
+        episode_number INTEGER,
+        published_date TEXT,
+        period TEXT,
+        product_key TEXT,
+        product_name TEXT,
+        host TEXT,
+        mentions INTEGER,
+        product_mentions INTEGER
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_mentions_episode ON analytics_episode_mentions(episode_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_mentions_product ON analytics_episode_mentions(product_key)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_mentions_host ON analytics_episode_mentions(host)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_mentions_period ON analytics_episode_mentions(period, product_key)")
+
+    # Агрегаты по продуктам
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analytics_products (
+        product_key TEXT PRIMARY KEY,
+        product_name TEXT,
+        mention_count INTEGER,
+        episode_count INTEGER,
+        first_episode INTEGER,
+        last_episode INTEGER,
+        first_date TEXT,
+        last_date TEXT
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_products_mentions ON analytics_products(mention_count DESC)")
+
+    # Журнал пересчитанных продуктов: по нему индекс автодополнения веб-сервера
+    # обновляет только изменившиеся продукты
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analytics_product_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_key TEXT
+    )
+    ''')
+
+    # Агрегаты по ведущим
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analytics_hosts (
+        host TEXT PRIMARY KEY,
+        mention_count INTEGER,
+        episode_count INTEGER,
+        product_count INTEGER
+    )
+    ''')
+
+    # Динамика упоминаний продуктов по месяцам
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analytics_trends (
+        period TEXT,
+        product_key TEXT,
+        product_name TEXT,
+        mention_count INTEGER,
+        PRIMARY KEY (period, product_key)
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_analytics_trends_product ON analytics_trends(product_key, period)")
+
+    # Общая динамика упоминаний по месяцам
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS analytics_periods (
+        period TEXT PRIMARY KEY,
+        mention_count INTEGER,
+        episode_count INTEGER
+    )
+    ''')
+
+def _period_from_date(published_date):
+    """Месяц публикации в формате YYYY-MM или None, если дата не распознана"""
+    if published_date and re.match(r"^\d{4}-\d{2}", published_date):
+        return published_date[:7]
+    return None
+
+def _chunks(values):
+    """Разбивает список значений на части для условий IN (...)"""
+    values = list(values)
+    for i in range(0, len(values), _IN_CHUNK_SIZE):
+        yield values[i:i + _IN_CHUNK_SIZE]
+
+def _collect_episode_mentions(cursor, episode_id):
+    """Строит строки вклада эпизода из таблицы recommendations"""
+    cursor.execute("""
+    SELECT e.episode_number, e.published_date, r.product_name, r.mentioned_by
+    FROM recommendations r
+    JOIN episodes e ON r.episode_id = e.id
+    WHERE r.episode_id = ?
+    """, (episode_id,))
+
+    mentions = {}
+    product_mentions = {}
+    for episode_number, published_date, product_name, mentioned_by in cursor.fetchall():
+        product_key = normalize_product_name(product_name)
+        if not product_key:
+            continue
+
+        product_mentions[product_key] = product_mentions.get(product_key, 0) + 1
+
+        # Упоминание без известного ведущего учитывается с пустым host
+        hosts = split_host_field(mentioned_by) or [""]
+        for host in hosts:
+            key = (product_key, host)
+            if key not in mentions:
+                mentions[key] = [episode_number, published_date, product_name, 0]
+            mentions[key][3] += 1
+
+    rows = []
+    for (product_key, host), (episode_number, published_date, product_name, count) in mentions.items():
+        rows.append((
+            episode_id, episode_number, published_date, _period_from_date(published_date),
+            product_key, product_name, host, count,
+            # Общее число упоминаний продукта записывается только в первую строку продукта
+            product_mentions.pop(product_key, 0)
+        ))
+    return rows
+
+def _recompute_products(cursor, product_keys):
+    """Пересчитывает агрегаты analytics_products и analytics_trends для указанных продуктов"""
+    for chunk in _chunks(product_keys):
+        placeholders = ", ".join("?" * len(chunk))
+
+        cursor.execute(f"DELETE FROM analytics_products WHERE product_key IN ({placeholders})", chunk)
+        cursor.execute(f"DELETE FROM analytics_trends WHERE product_key IN ({placeholders})", chunk)
+        cursor.executemany("INSERT INTO analytics_product_changes (product_key) VALUES (?)", [(key,) for key in chunk])
+
+        # Отображаемое название берется из последнего по времени упоминания
+        cursor.execute(f"""
+        SELECT product_key, product_name
+        FROM analytics_episode_mentions
+        WHERE product_key IN ({placeholders})
+        ORDER BY episode_number
+        """, chunk)
+        names = dict(cursor.fetchall())
+
+        cursor.execute(f"""
+        SELECT product_key, SUM(product_mentions), COUNT(DISTINCT episode_id),
+               MIN(episode_number), MAX(episode_number), MIN(published_date), MAX(published_date)
+        FROM analytics_episode_mentions
+        WHERE product_key IN ({placeholders})
+        GROUP BY product_key
+        """, chunk)
+        cursor.executemany("""
+        INSERT INTO analytics_products
+        (product_key, product_name, mention_count, episode_count,
+         first_episode, last_episode, first_date, last_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(row[0], names.get(row[0], row[0])) + tuple(row[1:]) for row in cursor.fetchall()])
+
+        cursor.execute(f"""
+        SELECT period, product_key, SUM(product_mentions)
+        FROM analytics_episode_mentions
+        WHERE product_key IN ({placeholders}) AND period IS NOT NULL
+        GROUP BY period, product_key
+        """, chunk)
+        cursor.executemany("""
+        INSERT INTO analytics_trends (period, product_key, product_name, mention_count)
+        VALUES (?, ?, ?, ?)
+        """, [(period, key, names.get(key, key), count) for period, key, count in cursor.fetchall()])
+
+def _recompute_hosts(cursor, hosts):
+    """Пересчитывает агрегаты analytics_hosts для указанных ведущих"""
+    hosts = [host for host in hosts if host]
+    for chunk in _chunks(hosts):
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"DELETE FROM analytics_hosts WHERE host IN ({placeholders})", chunk)
+        cursor.execute(f"""
+        INSERT INTO analytics_hosts (host, mention_count, episode_count, product_count)
+        SELECT host, SUM(mentions), COUNT(DISTINCT episode_id), COUNT(DISTINCT product_key)
+        FROM analytics_episode_mentions
+        WHERE host IN ({placeholders})
+        GROUP BY host
+        """, chunk)
+
+def _recompute_periods(cursor, periods):
+    """Пересчитывает агрегаты analytics_periods для указанных месяцев"""
+    periods = [period for period in periods if period]
+    for chunk in _chunks(periods):
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"DELETE FROM analytics_periods WHERE period IN ({placeholders})", chunk)
+        cursor.execute(f"""
+        INSERT INTO analytics_periods (period, mention_count, episode_count)
+        SELECT period, SUM(product_mentions), COUNT(DISTINCT episode_id)
+        FROM analytics_episode_mentions
+        WHERE period IN ({placeholders})
+        GROUP BY period
+        """, chunk)
+
+def _affected_keys(cursor, episode_id):
+    """Продукты, ведущие и месяцы, в которые эпизод вносит вклад"""
+    cursor.execute("""
+    SELECT product_key, host, period FROM analytics_episode_mentions WHERE episode_id = ?
+    """, (episode_id,))
+    rows = cursor.fetchall()
+    return {row[0] for row in rows}, {row[1] for row in rows}, {row[2] for row in rows}
+
+def refresh_episode_analytics(episode_id):
+    """
+    Инкрементально обновляет аналитику после обработки эпизода
+
+    Заменяет вклад эпизода и пересчитывает агрегаты только для затронутых продуктов,
+    ведущих и месяцев.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    old_products, old_hosts, old_periods = _affected_keys(cursor, episode_id)
+
+    cursor.execute("DELETE FROM analytics_episode_mentions WHERE episode_id = ?", (episode_id,))
+    rows = _collect_episode_mentions(cursor, episode_id)
+    cursor.executemany("""
+    INSERT INTO analytics_episode_mentions
+    (episode_id, episode_number, published_date, period, product_key, product_name, host,
+     mentions, product_mentions)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+    products = old_products | {row[4] for row in rows}
+    hosts = old_hosts | {row[6] for row in rows}
+    periods = old_periods | {row[3] for row in rows}
+
+    _recompute_products(cursor, products)
+    _recompute_hosts(cursor, hosts)
+    _recompute_periods(cursor, periods)
+    _prune_product_changes(cursor)
+
+    conn.commit()
+    conn.close()
+
+    logger.info(f"Аналитика обновлена для эпизода (ID: {episode_id}): продуктов {len(products)}")
+
+def rebuild_analytics():
+    """Полностью перестраивает таблицы аналитики по всем рекомендациям"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    for table in ("analytics_episode_mentions", "analytics_products", "analytics_hosts",
+                  "analytics_trends", "analytics_periods"):
+        cursor.execute(f"DELETE FROM {table}")
+
+    cursor.execute("SELECT DISTINCT episode_id FROM recommendations")
+    for (episode_id,) in cursor.fetchall():
+        cursor.executemany("""
+        INSERT INTO analytics_episode_mentions
+        (episode_id, episode_number, published_date, period, product_key, product_name, host,
+         mentions, product_mentions)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, _collect_episode_mentions(conn.cursor(), episode_id))
+
+    cursor.execute("SELECT DISTINCT product_key FROM analytics_episode_mentions")
+    _recompute_products(cursor, [row[0] for row in cursor.fetchall()])
+    cursor.execute("SELECT DISTINCT host FROM analytics_episode_mentions")
+    _recompute_hosts(cursor, [row[0] for row in cursor.fetchall()])
+    cursor.execute("SELECT DISTINCT period FROM analytics_episode_mentions")
+    _recompute_periods(cursor, [row[0] for row in cursor.fetchall()])
+    _prune_product_changes(cursor)
+
+    conn.commit()
+    conn.close()
+
+    logger.info("Таблицы аналитики перестроены")
+
+def _prune_product_changes(cursor):
+    """Удаляет старые записи журнала изменений продуктов"""
+    cursor.execute("""
+    DELETE FROM analytics_product_changes
+    WHERE seq <= (SELECT MAX(seq) FROM analytics_product_changes) - ?
+    """, (_PRODUCT_CHANGES_KEEP,))
+
+def get_product_names():
+    """
+    Получить названия и количество упоминаний всех продуктов (для индекса автодополнения)
+
+    Returns:
+        tuple: (список (product_key, product_name, mention_count), номер последнего изменения)
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Одна транзакция чтения: номер изменения соответствует прочитанным строкам
+    cursor.execute("BEGIN")
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM analytics_product_changes")
+    last_seq = cursor.fetchone()[0]
+    cursor.execute("SELECT product_key, product_name, mention_count FROM analytics_products")
+    rows = cursor.fetchall()
+
+    conn.close()
+    return rows, last_seq
+
+def get_product_changes(after_seq):
+    """
+    Получить продукты, пересчитанные после изменения after_seq
+
+    Returns:
+        tuple: (список (product_key, product_name или None, mention_count или None) -
+            None означает, что продукт удален; номер последнего изменения) или None,
+            если журнал уже не содержит всех изменений и нужна полная загрузка
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("BEGIN")
+    cursor.execute("SELECT MIN(seq), MAX(seq) FROM analytics_product_changes")
+    first_seq, last_seq = cursor.fetchone()
+    if last_seq is None or last_seq <= after_seq:
+        conn.close()
+        return [], after_seq
+    if first_seq > after_seq + 1:
+        conn.close()
+        return None
+
+    cursor.execute("""
+    SELECT c.product_key, p.product_name, p.mention_count
+    FROM (SELECT DISTINCT product_key FROM analytics_product_changes WHERE seq > ?) c
+    LEFT JOIN analytics_products p ON p.product_key = c.product_key
+    """, (after_seq,))
+    rows = cursor.fetchall()
+
+    conn.close()
+    return rows, last_seq
+
+def analytics_needs_rebuild():
+    """Проверяет, что рекомендации есть, а таблицы аналитики еще не заполнены"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM recommendations)")
+    has_recommendations = cursor.fetchone()[0]
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM analytics_episode_mentions)")
+    has_analytics = cursor.fetchone()[0]
+
+    conn.close()
+    return bool(has_recommendations and not has_analytics)
+
+def _product_from_row(row):
+    """Преобразует строку analytics_products в словарь"""
+    return {
+        "key": row[0],
+        "name": row[1],
+        "mention_count": row[2],
+        "episode_count": row[3],
+        "first_episode": row[4],
+        "last_episode": row[5],
+        "first_date": row[6],
+        "last_date": row[7]
+    }
+
+def get_top_products(limit=20):
+    """Получить самые упоминаемые продукты архива"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+    SELECT product_key, product_name, mention_count, episode_count,
+           first_episode, last_episode, first_date, last_date
+    FROM analytics_products
+    ORDER BY mention_count DESC, product_key
+    LIMIT ?
+    """, (limit,))
+
+    products = [_product_from_row(row) for row in cursor.fetchall()]
+
+    conn.close()
+    return products
+
+def get_product_stats(product_name):
+    """Получить статистику по продукту (первое и последнее появление, динамика) или None"""
+    product_key = normalize_product_name(product_name)
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+    SELECT product_key, product_name, mention_count, episode_count,
+           first_episode, last_episode, first_date, last_date
+    FROM analytics_products
+    WHERE product_key = ?
+    """, (product_key,))
+    row = cursor.fetchone()
+
+    if not row:
+        conn.close()
+        return None
+
+    product = _product_from_row(row)
+
+    cursor.execute("""
+    SELECT period, mention_count FROM analytics_trends
+    WHERE product_key = ?
+    ORDER BY period
+    """, (product_key,))
+    product["trend"] = [{"period": period, "mention_count": count} for period, count in cursor.fetchall()]
+
+    conn.close()
+    return product
+
+def get_host_stats():
+    """Получить количество упоминаний по ведущим"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+    SELECT host, mention_count, episode_count, product_count
+    FROM analytics_hosts
+    ORDER BY mention_count DESC
+    """)
+
+    hosts = []
+    for row in cursor.fetchall():
+        hosts.append({
+            "host": row[0],
+            "mention_count": row[1],
+            "episode_count": row[2],
+            "product_count": row[3]
+        })
+
+    conn.close()
+    return hosts
+
+def get_mention_trends(periods=24):
+    """Получить общую динамику упоминаний за последние месяцы (в хронологическом порядке)"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+    SELECT period, mention_count, episode_count
+    FROM analytics_periods
+    ORDER BY period DESC
+    LIMIT ?
+    """, (periods,))
+
+    trends = [
+        {"period": row[0], "mention_count": row[1], "episode_count": row[2]}
+        for row in cursor.fetchall()
+    ]
+
+    conn.close()
+    return list(reversed(trends))
@@ -0,0 +1,46 @@
+"""
+Кооперативная отмена обработки эпизода
+
+Токен отмены передается в этапы обработки, и они проверяют его на границах блоков:
+после каждого блока скачивания, перед декодированием каждого окна Whisper и перед
+каждой частью текста при извлечении рекомендаций. Воркер очереди устанавливает токен,
+когда пользователь отменяет задачу (см. modules/core/worker.py).
+"""
+
+import threading
+
+class JobCancelled(BaseException):
+    """
+    Обработка отменена пользователем
+
+    Наследуется от BaseException (как asyncio.CancelledError), чтобы отмену не
+    перехватывали обработчики except Exception внутри этапов обработки.
+    """
+
+class CancelToken:
+    """Флаг отмены, общий для всех потоков обработки одной задачи"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Запросить отмену"""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout):
+        """Подождать timeout секунд или до запроса отмены; возвращает True, если отмена запрошена"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        """Прервать обработку исключением JobCancelled, если отмена запрошена"""
+        if self._event.is_set():
+            raise JobCancelled()
+
+def check_cancelled(cancel_token):
+    """Проверить необязательный токен отмены (None - обработку нельзя отменить)"""
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
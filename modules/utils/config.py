@@ -4,14 +4,53 @@
 
 import os
 
+def _read_env_file(path=".env"):
+    """Переменные из файла .env (строки KEY=VALUE, комментарии после # отбрасываются)"""
+    values = {}
+    if not os.path.exists(path):
+        return values
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#") or "=" not in line:
+                    continue
+                name, value = line.split("=", 1)
+                values[name.strip()] = value.split(" #", 1)[0].strip()
+    except OSError:
+        pass
+    return values
+
+_ENV_FILE = _read_env_file()
+
+def _env(name, default):
+    """Значение настройки: переменная окружения, затем .env, затем значение по умолчанию"""
+    return os.environ.get(name, _ENV_FILE.get(name, default))
+
 # --- Пути к директориям и файлам ---
 DOWNLOAD_DIR = "downloads"
 TRANSCRIPT_DIR = "transcripts"
 RECOMMENDATIONS_DIR = "recommendations"
 DB_PATH = "database/radiot_advice.db"
+EXPORT_DIR = "exports"
+FEED_CACHE_PATH = "database/feed_cache.json"
 
 # --- Настройки подкаста ---
 RSS_URL = "https://radio-t.com/podcast.rss"
+RSS_FETCH_TIMEOUT = 30  # Таймаут загрузки RSS-ленты в секундах
+RSS_CACHE_TTL = int(_env("RSS_CACHE_TTL", "300"))  # Время жизни кэша RSS-ленты в секундах
+# Интервал опроса ленты в секундах (значение в .env может содержать комментарий)
+PODCAST_CHECK_INTERVAL = int(_env("PODCAST_CHECK_INTERVAL", "3600").split("#")[0])
+FEED_POLL_LIMIT = 10  # Сколько последних эпизодов ленты проверяет фоновый опрос
+FEED_POLL_MAX_BACKOFF = 6 * 3600  # Максимальная пауза между опросами после ошибок в секундах
+FEED_POLLER_ENABLED = _env("FEED_POLLER_ENABLED", "false").lower() == "true"  # Опрос ленты в веб-сервере
+# Ленты, по которым перечисляется полный архив эпизодов (текущая лента и архивная)
+ARCHIVE_RSS_URLS = [RSS_URL, "https://radio-t.com/podcast-archives.rss"]
+# Параллелизм этапов конвейера обработки нескольких эпизодов (в том числе бэкфилла)
+PIPELINE_DOWNLOAD_WORKERS = 4
+PIPELINE_TRANSCRIBE_WORKERS = 1
+PIPELINE_EXTRACT_WORKERS = 2
+PIPELINE_QUEUE_SIZE = 2  # Сколько эпизодов может ждать следующего этапа (ограничивает забег скачиваний)
 HOSTS = ["Umputun", "Bobuk", "Gray", "Ksenks", "Alek.sys"]
 
 # Словарь алиасов для ведущих
@@ -23,9 +62,87 @@ HOST_ALIASES = {
     "Alek.sys": ["Алексис", "Алекс", "Александр", "Саша", "Алексей"]
 }
 
+# --- Настройки HTTP-клиента ---
+HTTP_CONNECT_TIMEOUT = 10  # Таймаут установки соединения в секундах
+HTTP_READ_TIMEOUT = 60  # Таймаут ожидания данных в секундах
+HTTP_RETRIES = 3  # Повторы при ошибках соединения и ответах 429/5xx
+HTTP_RETRY_BACKOFF = 1.0  # Базовая пауза между повторами (растет экспоненциально)
+HTTP_POOL_SIZE = 32  # Максимум соединений с одним хостом в пуле
+# Ограничение скорости фоновых скачиваний (бэкфилла) в байтах в секунду, 0 - без ограничения
+BACKFILL_BANDWIDTH_LIMIT = int(_env("BACKFILL_BANDWIDTH_LIMIT", "0"))
+
+# --- Настройки скачивания ---
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Размер блока чтения/записи при скачивании (1 МБ)
+DOWNLOAD_RETRIES = 5  # Количество попыток докачки после обрыва соединения
+DOWNLOAD_PROGRESS_INTERVAL = 1.0  # Минимальный интервал между сообщениями о прогрессе в секундах
+DOWNLOAD_SEGMENTS = int(_env("DOWNLOAD_SEGMENTS", "4"))  # Количество параллельных соединений на файл
+DOWNLOAD_SEGMENT_MIN_SIZE = 16 * 1024 * 1024  # Файлы меньшего размера скачиваются одним потоком
+
 # --- Настройки Whisper ---
 WHISPER_MODEL = "large"  # Изменено с 'base' на 'large' для лучшего качества транскрипции
 
+# --- Настройки веб-сервера ---
+# Размер пула потоков для блокирующих операций (SQLite, файловая система) в веб-сервере
+WEB_IO_THREADS = int(_env("WEB_IO_THREADS", "8"))
+
+# Сколько секунд браузер и прокси могут отдавать из кэша страницы полностью обработанных эпизодов
+EPISODE_CACHE_MAX_AGE = int(_env("EPISODE_CACHE_MAX_AGE", "300"))
+EPISODE_CACHE_STALE = 60  # Сколько секунд после истечения можно отдавать устаревшую копию, перепроверяя ее
+
+# Объем кэша отрисованных страниц эпизодов в памяти веб-сервера в байтах
+FRAGMENT_CACHE_MAX_BYTES = int(_env("FRAGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Сжатие ответов: ответы меньше COMPRESSION_MIN_SIZE байт отправляются как есть
+COMPRESSION_MIN_SIZE = int(_env("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = 6  # Уровень сжатия gzip (1-9)
+COMPRESSION_BROTLI_QUALITY = 5  # Качество сжатия brotli (0-11), если установлен пакет brotli
+
+# Сколько строк потоковый экспорт (/export/recommendations.ndjson) читает из курсора за раз
+EXPORT_BATCH_SIZE = 500
+
+# Размер страницы JSON API /api/v1 по умолчанию и максимальный
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Как часто индекс автодополнения проверяет изменения продуктов при обращениях к /autocomplete, в секундах
+AUTOCOMPLETE_REFRESH_INTERVAL = 30
+
+# Интервал проверки изменений задач для потоков событий (SSE) в секундах
+TASK_EVENTS_POLL_INTERVAL = 0.05
+TASK_EVENTS_IDLE_POLL_INTERVAL = 1  # Интервал проверки завершения задач, пока потоков событий нет, в секундах
+TASK_EVENTS_KEEPALIVE = 15  # Интервал комментариев keep-alive в потоке событий в секундах
+
+# --- Координация между процессами ---
+LEASE_TTL = 120  # Срок аренды этапа обработки без продления (heartbeat) в секундах
+LEASE_POLL_INTERVAL = 5  # Интервал проверки освобождения аренды ожидающим процессом в секундах
+
+# --- Очередь задач ---
+JOB_MAX_ATTEMPTS = 3  # Количество попыток обработки эпизода до пометки задачи как неудачной
+JOB_RETRY_BACKOFF = 60  # Пауза перед первым повтором неудачной задачи в секундах (удваивается)
+JOB_POLL_INTERVAL = 2  # Интервал проверки очереди свободным воркером в секундах
+JOB_CANCEL_POLL_INTERVAL = 1  # Интервал проверки запроса отмены выполняющейся задачи в секундах
+# Сколько воркеров очереди веб-сервер запускает в отдельных процессах (0 - только внешние воркеры,
+# python run.py --worker). Встроенные воркеры останавливаются вместе с веб-сервером, поэтому
+# по умолчанию очередь обрабатывают отдельные процессы воркеров
+WEB_EMBEDDED_WORKERS = int(_env("WEB_EMBEDDED_WORKERS", "0"))
+# Сколько секунд веб-сервер при остановке ждет, пока встроенные воркеры вернут задачи в очередь
+WORKER_SHUTDOWN_TIMEOUT = 60
+
+# --- Планировщик ресурсов ---
+# Сколько операций каждого класса может выполняться одновременно во всех процессах
+RESOURCE_LIMITS = {
+    "download": int(_env("RESOURCE_LIMIT_DOWNLOAD", "4")),  # Скачивание аудиофайлов (сеть)
+    "transcribe": int(_env("RESOURCE_LIMIT_TRANSCRIBE", "1")),  # Модель Whisper (CPU/GPU и память)
+    "llm": int(_env("RESOURCE_LIMIT_LLM", "8")),  # Запросы к API LLM
+    "db": int(_env("RESOURCE_LIMIT_DB", "1")),  # Запись результатов в базу данных
+}
+RESOURCE_POLL_INTERVAL = 1  # Интервал проверки освобождения слота ожидающей операцией в секундах
+RESOURCE_WAITER_TTL = 30  # Через сколько секунд без обновления заявка в очереди ресурса удаляется
+
+# --- Согласование статусов ---
+# Сверять статусы этапов в базе данных с файлами на диске при запуске веб-сервера
+REPAIR_STATUS_ON_START = _env("REPAIR_STATUS_ON_START", "false").lower() == "true"
+
 # --- Создание необходимых директорий ---
 for directory in [DOWNLOAD_DIR, TRANSCRIPT_DIR, RECOMMENDATIONS_DIR, os.path.dirname(DB_PATH)]:
     os.makedirs(directory, exist_ok=True) 
\ No newline at end of file
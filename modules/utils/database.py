@@ -2,18 +2,110 @@
 Функции для работы с базой данных
 """
 
+import os
 import sqlite3
 import logging
-from modules.utils.config import DB_PATH
-from modules.utils.helpers import get_main_host_name
+from datetime import datetime
+from modules.utils.config import DB_PATH, EXPORT_BATCH_SIZE
+from modules.utils.helpers import get_main_host_name, get_episode_file_paths, split_host_field
+from modules.utils.analytics import init_analytics_tables, analytics_needs_rebuild, rebuild_analytics
+from modules.utils.leases import init_lease_table
+from modules.utils.jobs import init_jobs_table
+from modules.utils.scheduler import init_scheduler_table
 
 logger = logging.getLogger(__name__)
 
+# Столбцы таблицы episodes с состоянием этапов обработки
+EPISODE_STAGE_COLUMNS = [
+    ("downloaded", "INTEGER DEFAULT 0"),
+    ("transcribed", "INTEGER DEFAULT 0"),
+    ("extracted", "INTEGER DEFAULT 0"),
+    ("audio_path", "TEXT"),
+    ("transcript_path", "TEXT"),
+    ("recommendations_path", "TEXT"),
+    ("audio_size", "INTEGER"),
+    ("transcript_size", "INTEGER"),
+    ("recommendations_size", "INTEGER"),
+    ("downloaded_at", "TEXT"),
+    ("transcribed_at", "TEXT"),
+    ("extracted_at", "TEXT"),
+    ("download_seconds", "REAL"),
+    ("transcribe_seconds", "REAL"),
+    ("extract_seconds", "REAL"),
+    ("updated_at", "TEXT"),
+]
+
+# Соответствие этапа обработки столбцам: (флаг, путь, размер, время завершения, длительность)
+EPISODE_STAGES = {
+    "download": ("downloaded", "audio_path", "audio_size", "downloaded_at", "download_seconds"),
+    "transcribe": ("transcribed", "transcript_path", "transcript_size", "transcribed_at", "transcribe_seconds"),
+    "extract": ("extracted", "recommendations_path", "recommendations_size", "extracted_at", "extract_seconds"),
+}
+
+# Столбцы, которые выбираются при чтении эпизодов
+EPISODE_SELECT_COLUMNS = (
+    "id, episode_number, title, published_date, processed, "
+    + ", ".join(name for name, _ in EPISODE_STAGE_COLUMNS)
+)
+
+def _now():
+    """Текущее время в формате, используемом в базе данных"""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def _migrate_episodes_table(cursor):
+    """
+    Добавляет в таблицу episodes недостающие столбцы состояния этапов
+    
+    Returns:
+        bool: True, если были добавлены новые столбцы
+    """
+    cursor.execute("PRAGMA table_info(episodes)")
+    columns = [col[1] for col in cursor.fetchall()]
+    
+    added = False
+    for name, column_type in EPISODE_STAGE_COLUMNS:
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE episodes ADD COLUMN {name} {column_type}")
+            added = True
+    
+    return added
+
+def _status_key(flag_col):
+    """Ключ словаря статуса, соответствующий флагу этапа"""
+    return "recommendations" if flag_col == "extracted" else flag_col
+
+def _episode_from_row(row):
+    """Преобразует строку таблицы episodes (EPISODE_SELECT_COLUMNS) в словарь"""
+    stage = dict(zip([name for name, _ in EPISODE_STAGE_COLUMNS], row[5:]))
+    
+    status = {
+        "exists": True,
+        "downloaded": bool(stage["downloaded"]),
+        "transcribed": bool(stage["transcribed"]),
+        "recommendations": bool(stage["extracted"]),
+        "processed": row[4],
+    }
+    # Пути к артефактам, размеры, время и длительность этапов
+    status.update({name: stage[name] for name, _ in EPISODE_STAGE_COLUMNS[3:]})
+    
+    return {
+        "id": row[0],
+        "episode_number": row[1],
+        "title": row[2],
+        "published_date": row[3],
+        "processed": row[4],
+        "updated_at": stage["updated_at"],
+        "status": status
+    }
+
 def init_db():
     """Создание необходимых таблиц в базе данных"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
+    # Режим WAL позволяет читать базу параллельно с записью из обработчиков эпизодов
+    cursor.execute("PRAGMA journal_mode=WAL")
+    
     # Таблица эпизодов
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS episodes (
@@ -26,6 +118,9 @@ def init_db():
     )
     ''')
     
+    # Столбцы состояния этапов обработки (для существующих баз добавляются миграцией)
+    stages_added = _migrate_episodes_table(cursor)
+    
     # Таблица продуктов/технологий
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS recommendations (
@@ -45,9 +140,44 @@ def init_db():
     )
     ''')
     
+    # Индекс для выборки рекомендаций эпизода (episode_number уже проиндексирован как UNIQUE)
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_recommendations_episode_id
+    ON recommendations(episode_id, id)
+    ''')
+    
+    # Таблицы материализованной аналитики
+    init_analytics_tables(cursor)
+    
+    # Аренды этапов обработки для координации процессов
+    init_lease_table(cursor)
+    
+    # Очередь задач обработки эпизодов
+    init_jobs_table(cursor)
+    
+    # Очередь ожидания ресурсов планировщика
+    init_scheduler_table(cursor)
+    
+    # Новые эпизоды из ленты, которые еще не удалось поставить в обработку
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS pending_auto_episodes (
+        episode_number INTEGER PRIMARY KEY,
+        discovered_at TEXT
+    )
+    ''')
+    
     conn.commit()
     conn.close()
     
+    # Для существующего архива заполняем новые столбцы по файлам на диске
+    if stages_added:
+        logger.info("Добавлены столбцы состояния этапов, выполняется сверка с файлами на диске")
+        reconcile_episode_stages()
+    
+    # Первичное заполнение аналитики для уже обработанного архива
+    if analytics_needs_rebuild():
+        rebuild_analytics()
+    
     logger.info("База данных инициализирована")
 
 def save_episode_to_db(episode):
@@ -75,17 +205,258 @@ def save_episode_to_db(episode):
     conn.close()
     return episode_id
 
+def save_new_episodes(episodes, auto_process=False):
+    """
+    Добавить в базу данных эпизоды, которых в ней еще нет (одной транзакцией)
+    
+    Args:
+        episodes: Список эпизодов (словари с episode_number, title, published_date, audio_url)
+        auto_process: В той же транзакции отметить для автоматической обработки эпизоды
+            новее последнего известного (если база пуста - только самый новый из добавленных);
+            отметки снимает remove_pending_auto_episode() после постановки в обработку
+    
+    Returns:
+        list: Номера добавленных эпизодов в порядке следования во входном списке
+    """
+    if not episodes:
+        return []
+    
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    
+    cursor.execute("SELECT MAX(episode_number) FROM episodes")
+    latest_known = cursor.fetchone()[0]
+    
+    numbers = [episode["episode_number"] for episode in episodes]
+    placeholders = ", ".join("?" * len(numbers))
+    cursor.execute(f"SELECT episode_number FROM episodes WHERE episode_number IN ({placeholders})", numbers)
+    existing = {row[0] for row in cursor.fetchall()}
+    
+    now = _now()
+    added = []
+    rows = []
+    for episode in episodes:
+        if episode["episode_number"] in existing:
+            continue
+        existing.add(episode["episode_number"])
+        added.append(episode["episode_number"])
+        rows.append((episode["episode_number"], episode["title"], episode["published_date"], episode["audio_url"], now))
+    
+    cursor.executemany("""
+    INSERT OR IGNORE INTO episodes (episode_number, title, published_date, audio_url, processed, updated_at)
+    VALUES (?, ?, ?, ?, 0, ?)
+    """, rows)
+    
+    if auto_process:
+        if latest_known is None:
+            pending = sorted(added, reverse=True)[:1]
+        else:
+            pending = [number for number in added if number > latest_known]
+        cursor.executemany(
+            "INSERT OR IGNORE INTO pending_auto_episodes (episode_number, discovered_at) VALUES (?, ?)",
+            [(number, now) for number in pending]
+        )
+    
+    conn.commit()
+    conn.close()
+    
+    if added:
+        logger.info(f"Добавлено новых эпизодов в базу данных: {len(added)}")
+    return added
+
+def get_pending_auto_episodes():
+    """
+    Эпизоды, отмеченные для автоматической обработки и еще не поставленные в нее
+    
+    Отметки эпизодов, рекомендации которых уже извлечены (например, обработанных
+    вручную), снимаются.
+    
+    Returns:
+        list: Номера эпизодов по возрастанию
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+    DELETE FROM pending_auto_episodes
+    WHERE episode_number NOT IN (SELECT episode_number FROM episodes WHERE extracted = 0)
+    """)
+    cursor.execute("SELECT episode_number FROM pending_auto_episodes ORDER BY episode_number")
+    result = [row[0] for row in cursor.fetchall()]
+    
+    conn.commit()
+    conn.close()
+    return result
+
+def remove_pending_auto_episode(episode_number):
+    """Снять отметку автоматической обработки (эпизод поставлен в обработку)"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute("DELETE FROM pending_auto_episodes WHERE episode_number = ?", (episode_number,))
+    conn.commit()
+    conn.close()
+
+def get_max_episode_number():
+    """Получить наибольший номер эпизода в базе данных или None, если эпизодов нет"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT MAX(episode_number) FROM episodes")
+    result = cursor.fetchone()[0]
+    
+    conn.close()
+    return result
+
 def update_episode_status(episode_id, status):
     """Обновить статус обработки эпизода"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    cursor.execute("UPDATE episodes SET processed = ? WHERE id = ?", (status, episode_id))
+    cursor.execute("UPDATE episodes SET processed = ?, updated_at = ? WHERE id = ?", (status, _now(), episode_id))
     conn.commit()
     conn.close()
     
     logger.info(f"Статус эпизода (ID: {episode_id}) обновлен на {status}")
 
+def update_episode_stage(episode_number, stage, path=None, duration=None, done=True):
+    """
+    Записать в базу данных состояние этапа обработки эпизода
+    
+    Args:
+        episode_number: Номер эпизода
+        stage: Этап обработки ("download", "transcribe" или "extract")
+        path: Путь к артефакту этапа
+        duration: Длительность этапа в секундах (None, если этап не выполнялся)
+        done: Завершен ли этап (False сбрасывает состояние этапа)
+    """
+    flag_col, path_col, size_col, at_col, seconds_col = EPISODE_STAGES[stage]
+    
+    size = None
+    if done and path and os.path.exists(path):
+        size = os.path.getsize(path)
+    
+    now = _now()
+    
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute(f"""
+    UPDATE episodes
+    SET {flag_col} = ?, {path_col} = ?, {size_col} = ?, {at_col} = ?,
+        {seconds_col} = COALESCE(?, {seconds_col}), updated_at = ?
+    WHERE episode_number = ?
+    """, (
+        1 if done else 0,
+        path if done else None,
+        size,
+        now if done else None,
+        duration,
+        now,
+        episode_number
+    ))
+    conn.commit()
+    conn.close()
+    
+    logger.info(f"Этап '{stage}' эпизода #{episode_number}: {'завершен' if done else 'сброшен'}")
+
+def get_episode_status(episode_number):
+    """
+    Получает статус обработки эпизода из базы данных (без обращения к файловой системе)
+    
+    Returns:
+        dict: Словарь с информацией о статусе эпизода
+        {
+            'exists': bool,  # Существует ли эпизод в базе
+            'downloaded': bool,  # Скачан ли аудиофайл
+            'transcribed': bool,  # Есть ли транскрипция
+            'recommendations': bool,  # Есть ли извлеченные рекомендации
+            'processed': int,  # Статус обработки из БД (0-2)
+            ...  # Пути к артефактам, их размеры, время и длительность этапов
+        }
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute(f"SELECT {EPISODE_SELECT_COLUMNS} FROM episodes WHERE episode_number = ?", (episode_number,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if not row:
+        return {
+            'exists': False,
+            'downloaded': False,
+            'transcribed': False,
+            'recommendations': False,
+            'processed': 0
+        }
+    
+    return _episode_from_row(row)["status"]
+
+def reconcile_episode_stages():
+    """
+    Сверяет состояние этапов в базе данных с файлами на диске и исправляет расхождения
+    
+    Returns:
+        int: Количество исправленных эпизодов
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute(f"SELECT {EPISODE_SELECT_COLUMNS} FROM episodes")
+    episodes = [_episode_from_row(row) for row in cursor.fetchall()]
+    
+    now = _now()
+    repaired = 0
+    
+    for episode in episodes:
+        paths = get_episode_file_paths(episode["episode_number"])
+        recommendations_path = paths["recommendations"]
+        if not os.path.exists(recommendations_path) and os.path.exists(paths["recommendations_legacy"]):
+            recommendations_path = paths["recommendations_legacy"]
+        
+        disk_state = {
+            "download": paths["audio"],
+            "transcribe": paths["transcript"],
+            "extract": recommendations_path,
+        }
+        
+        updates = {}
+        for stage, path in disk_state.items():
+            flag_col, path_col, size_col, at_col, _ = EPISODE_STAGES[stage]
+            exists = os.path.exists(path)
+            size = os.path.getsize(path) if exists else None
+            status = episode["status"]
+            
+            if exists:
+                if not status[_status_key(flag_col)] or status[path_col] != path or status[size_col] != size:
+                    updates[flag_col] = 1
+                    updates[path_col] = path
+                    updates[size_col] = size
+                    if not status[at_col]:
+                        updates[at_col] = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+            elif status[_status_key(flag_col)]:
+                updates[flag_col] = 0
+                updates[path_col] = None
+                updates[size_col] = None
+                updates[at_col] = None
+        
+        if updates:
+            updates["updated_at"] = now
+            assignments = ", ".join(f"{column} = ?" for column in updates)
+            cursor.execute(
+                f"UPDATE episodes SET {assignments} WHERE id = ?",
+                (*updates.values(), episode["id"])
+            )
+            repaired += 1
+    
+    conn.commit()
+    conn.close()
+    
+    logger.info(f"Сверка статусов с файлами завершена, исправлено эпизодов: {repaired}")
+    return repaired
+
 def save_recommendations_to_db(recommendations, episode_id):
     """Сохранить рекомендации в базу данных"""
     if not recommendations:
@@ -162,29 +533,68 @@ def save_recommendations_to_db(recommendations, episode_id):
     return saved_count
 
 def get_all_episodes():
-    """Получить список всех эпизодов из базы данных"""
+    """Получить список всех эпизодов из базы данных вместе со статусом этапов обработки"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
-    cursor.execute("""
-    SELECT id, episode_number, title, published_date, processed 
+    cursor.execute(f"""
+    SELECT {EPISODE_SELECT_COLUMNS}
     FROM episodes 
     ORDER BY episode_number DESC
     """)
     
-    episodes = []
-    for row in cursor.fetchall():
-        episodes.append({
-            "id": row[0],
-            "episode_number": row[1],
-            "title": row[2],
-            "published_date": row[3],
-            "processed": row[4]
-        })
+    episodes = [_episode_from_row(row) for row in cursor.fetchall()]
     
     conn.close()
     return episodes
 
+def get_episode_by_number(episode_number):
+    """Получить эпизод по номеру (поиск по уникальному индексу) или None, если его нет"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute(f"SELECT {EPISODE_SELECT_COLUMNS} FROM episodes WHERE episode_number = ?", (episode_number,))
+    row = cursor.fetchone()
+    
+    conn.close()
+    return _episode_from_row(row) if row else None
+
+def get_episodes_page(limit=20, before=None):
+    """
+    Получить страницу эпизодов, отсортированных по убыванию номера (keyset-пагинация)
+    
+    Args:
+        limit: Количество эпизодов на странице
+        before: Номер эпизода, после которого начинается страница (None - первая страница)
+    
+    Returns:
+        tuple: (список эпизодов, курсор следующей страницы или None)
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    if before is None:
+        cursor.execute(f"""
+        SELECT {EPISODE_SELECT_COLUMNS}
+        FROM episodes
+        ORDER BY episode_number DESC
+        LIMIT ?
+        """, (limit,))
+    else:
+        cursor.execute(f"""
+        SELECT {EPISODE_SELECT_COLUMNS}
+        FROM episodes
+        WHERE episode_number < ?
+        ORDER BY episode_number DESC
+        LIMIT ?
+        """, (before, limit))
+    
+    episodes = [_episode_from_row(row) for row in cursor.fetchall()]
+    conn.close()
+    
+    next_cursor = episodes[-1]["episode_number"] if len(episodes) == limit else None
+    return episodes, next_cursor
+
 def get_episode_recommendations(episode_id):
     """Получить рекомендации для конкретного эпизода"""
     conn = sqlite3.connect(DB_PATH)
@@ -215,6 +625,144 @@ def get_episode_recommendations(episode_id):
     conn.close()
     return recommendations
 
+def iter_recommendations(episode_from=None, episode_to=None, host=None, date_from=None, date_to=None,
+                         batch_size=EXPORT_BATCH_SIZE):
+    """
+    Читать рекомендации архива частями по мере обхода курсора
+    
+    В памяти находится не больше batch_size строк, сколько бы рекомендаций ни было
+    выбрано. Порядок - по номеру эпизода, внутри эпизода - по id рекомендации
+    (обход индексов без сортировки). Соединение закрывается, когда генератор
+    исчерпан или закрыт; его части можно читать из разных потоков по очереди.
+    
+    Args:
+        episode_from, episode_to: Диапазон номеров эпизодов (включительно)
+        host: Ведущий, упомянувший продукт (любой алиас из HOST_ALIASES)
+        date_from, date_to: Диапазон дат публикации эпизода "YYYY-MM-DD" (включительно)
+        batch_size: Количество строк, читаемых из курсора за раз
+    
+    Yields:
+        list: Непустые списки рекомендаций
+    """
+    conditions = []
+    params = []
+    if episode_from is not None:
+        conditions.append("e.episode_number >= ?")
+        params.append(episode_from)
+    if episode_to is not None:
+        conditions.append("e.episode_number <= ?")
+        params.append(episode_to)
+    if date_from is not None:
+        conditions.append("e.published_date >= ?")
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append("substr(e.published_date, 1, 10) <= ?")
+        params.append(date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    # Поле mentioned_by - свободный текст с алиасами, поэтому ведущий сравнивается после разбора
+    host = get_main_host_name(host) if host else None
+    
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+        SELECT e.episode_number, e.published_date, r.id, r.product_name, r.description,
+               r.mentioned_by, r.hosts_opinion, r.ai_comment, r.website, r.timestamp, r.confidence
+        FROM episodes e
+        JOIN recommendations r ON r.episode_id = e.id
+        {where}
+        ORDER BY e.episode_number, r.id
+        """, params)
+        
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            
+            batch = []
+            for row in rows:
+                hosts = split_host_field(row[5])
+                if host is not None and host not in hosts:
+                    continue
+                batch.append({
+                    "episode_number": row[0],
+                    "published_date": row[1],
+                    "id": row[2],
+                    "name": row[3],
+                    "description": row[4],
+                    "mentioned_by": row[5],
+                    "hosts": hosts,
+                    "hosts_opinion": row[6],
+                    "ai_comment": row[7],
+                    "website": row[8],
+                    "timestamp": row[9],
+                    "confidence": row[10]
+                })
+            if batch:
+                yield batch
+    finally:
+        conn.close()
+
+def search_recommendations_page(search_term, limit=20, after=None):
+    """
+    Поиск рекомендаций по ключевому слову с keyset-пагинацией
+    
+    Результаты отсортированы по убыванию номера эпизода, внутри эпизода - по id рекомендации.
+    
+    Args:
+        search_term: Поисковый запрос
+        limit: Количество результатов на странице
+        after: Курсор (episode_number, id) последнего результата предыдущей страницы
+    
+    Returns:
+        tuple: (список результатов, курсор следующей страницы или None)
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    search_pattern = f"%{search_term}%"
+    params = [search_pattern, search_pattern]
+    keyset_condition = ""
+    
+    if after is not None:
+        after_episode, after_id = after
+        keyset_condition = "AND (e.episode_number < ? OR (e.episode_number = ? AND r.id > ?))"
+        params.extend([after_episode, after_episode, after_id])
+    
+    params.append(limit)
+    
+    cursor.execute(f"""
+    SELECT r.id, e.episode_number, r.product_name, r.description,
+           r.mentioned_by, r.hosts_opinion, r.ai_comment, r.website
+    FROM recommendations r
+    JOIN episodes e ON r.episode_id = e.id
+    WHERE (r.product_name LIKE ? OR r.description LIKE ?)
+    {keyset_condition}
+    ORDER BY e.episode_number DESC, r.id
+    LIMIT ?
+    """, params)
+    
+    results = []
+    for row in cursor.fetchall():
+        results.append({
+            "id": row[0],
+            "episode_number": row[1],
+            "name": row[2],
+            "description": row[3],
+            "mentioned_by": row[4],
+            "hosts_opinion": row[5],
+            "ai_comment": row[6],
+            "website": row[7]
+        })
+    
+    conn.close()
+    
+    next_cursor = None
+    if len(results) == limit:
+        next_cursor = (results[-1]["episode_number"], results[-1]["id"])
+    return results, next_cursor
+
 def search_recommendations(search_term):
     """Поиск рекомендаций по ключевому слову"""
     conn = sqlite3.connect(DB_PATH)
@@ -0,0 +1,330 @@
+"""
+Экспорт архива в колоночные форматы (Parquet / Arrow IPC) для офлайн-анализа
+
+Структура каталога экспорта:
+    episodes.parquet                              - все эпизоды
+    recommendations/episode=N/part-0.parquet      - рекомендации эпизода N
+    transcript_segments/episode=N/part-0.parquet  - сегменты транскрипции эпизода N
+    _manifest.json                                - версии выгруженных эпизодов
+
+Данные читаются и записываются пачками, поэтому память не зависит от размера архива.
+Экспорт инкрементальный: партиции перезаписываются только для эпизодов, у которых
+изменилось время обновления (updated_at) с момента прошлого экспорта. Одновременно
+в каталог выполняется только один экспорт (аренда в базе данных, см. leases.py).
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import logging
+from datetime import datetime
+from modules.utils.config import DB_PATH, EXPORT_DIR
+from modules.utils.helpers import get_episode_file_paths
+from modules.utils.leases import make_owner_id, try_acquire_lease, keep_lease_alive, release_lease
+
+logger = logging.getLogger(__name__)
+
+# Количество строк в одной пачке
+EXPORT_BATCH_SIZE = 5000
+
+# Расширения файлов для поддерживаемых форматов
+EXPORT_FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+MANIFEST_NAME = "_manifest.json"
+
+# Таблицы, выгружаемые партициями по эпизодам
+PARTITIONED_TABLES = ("recommendations", "transcript_segments")
+
+class ExportInProgressError(Exception):
+    """В каталог уже выполняется другой экспорт"""
+
+def _import_pyarrow():
+    """Импорт pyarrow (необязательная зависимость, нужна только для экспорта)"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+        return pyarrow
+    except ImportError:
+        raise RuntimeError("Для экспорта требуется библиотека pyarrow. Установите её с помощью pip install pyarrow")
+
+def _schemas(pa):
+    """Схемы выгружаемых таблиц"""
+    return {
+        "episodes": pa.schema([
+            ("episode_number", pa.int64()),
+            ("title", pa.string()),
+            ("published_date", pa.string()),
+            ("audio_url", pa.string()),
+            ("processed", pa.int64()),
+            ("downloaded", pa.bool_()),
+            ("transcribed", pa.bool_()),
+            ("extracted", pa.bool_()),
+            ("audio_size", pa.int64()),
+            ("transcribe_seconds", pa.float64()),
+            ("updated_at", pa.string()),
+        ]),
+        "recommendations": pa.schema([
+            ("id", pa.int64()),
+            ("episode_number", pa.int64()),
+            ("product_name", pa.string()),
+            ("description", pa.string()),
+            ("mentioned_by", pa.string()),
+            ("hosts_opinion", pa.string()),
+            ("ai_comment", pa.string()),
+            ("website", pa.string()),
+            ("timestamp", pa.string()),
+            ("confidence", pa.int64()),
+        ]),
+        "transcript_segments": pa.schema([
+            ("episode_number", pa.int64()),
+            ("segment_index", pa.int64()),
+            ("text", pa.string()),
+        ]),
+    }
+
+class _BatchWriter:
+    """Пишет пачки строк в файл Parquet или Arrow IPC через временный файл"""
+
+    def __init__(self, pa, path, schema, fmt):
+        self.pa = pa
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.schema = schema
+        self.rows = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if fmt == "parquet":
+            self.writer = pa.parquet.ParquetWriter(self.tmp_path, schema)
+        else:
+            self.sink = pa.OSFile(self.tmp_path, "wb")
+            self.writer = pa.ipc.new_file(self.sink, schema)
+
+    def write_rows(self, columns, rows):
+        """Записать пачку строк (список кортежей в порядке columns)"""
+        if not rows:
+            return
+        arrays = [
+            self.pa.array([row[i] for row in rows], type=self.schema.field(name).type)
+            for i, name in enumerate(columns)
+        ]
+        self.writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self):
+        """Завершить запись и атомарно переместить файл на место"""
+        self.writer.close()
+        if hasattr(self, "sink"):
+            self.sink.close()
+        os.replace(self.tmp_path, self.path)
+
+def _load_manifest(output_dir):
+    """Загрузить манифест прошлого экспорта"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать манифест экспорта: {str(e)}")
+        return {}
+
+def _save_manifest(output_dir, manifest):
+    """Сохранить манифест экспорта"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+def _partition_path(output_dir, table, episode_number, ext):
+    """Путь к файлу партиции эпизода"""
+    return os.path.join(output_dir, table, f"episode={episode_number}", f"part-0.{ext}")
+
+def _clear_export(output_dir):
+    """Удалить все файлы прошлого экспорта (партиции и таблицы эпизодов во всех форматах)"""
+    for table in PARTITIONED_TABLES:
+        shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+    for ext in EXPORT_FORMATS.values():
+        path = os.path.join(output_dir, f"episodes.{ext}")
+        if os.path.exists(path):
+            os.remove(path)
+
+def _export_episodes(pa, conn, output_dir, fmt, ext, schema):
+    """Выгрузить таблицу эпизодов пачками"""
+    columns = schema.names
+    writer = _BatchWriter(pa, os.path.join(output_dir, f"episodes.{ext}"), schema, fmt)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT episode_number, title, published_date, audio_url, processed,
+           downloaded, transcribed, extracted, audio_size, transcribe_seconds, updated_at
+    FROM episodes
+    ORDER BY episode_number
+    """)
+    while True:
+        rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+        if not rows:
+            break
+        rows = [row[:5] + tuple(bool(flag) for flag in row[5:8]) + row[8:] for row in rows]
+        writer.write_rows(columns, rows)
+
+    writer.close()
+    return writer.rows
+
+def _export_recommendations(pa, conn, path, episode_id, fmt, schema):
+    """Выгрузить рекомендации эпизода в партицию"""
+    columns = schema.names
+    writer = _BatchWriter(pa, path, schema, fmt)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT r.id, e.episode_number, r.product_name, r.description, r.mentioned_by,
+           r.hosts_opinion, r.ai_comment, r.website, r.timestamp, r.confidence
+    FROM recommendations r
+    JOIN episodes e ON r.episode_id = e.id
+    WHERE r.episode_id = ?
+    ORDER BY r.id
+    """, (episode_id,))
+    while True:
+        rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+        if not rows:
+            break
+        writer.write_rows(columns, rows)
+
+    writer.close()
+    return writer.rows
+
+def _export_transcript_segments(pa, path, episode_number, transcript_path, fmt, schema):
+    """Выгрузить сегменты (непустые строки) транскрипции эпизода в партицию"""
+    columns = schema.names
+    writer = _BatchWriter(pa, path, schema, fmt)
+
+    batch = []
+    segment_index = 0
+    with open(transcript_path, "r", encoding="utf-8") as f:
+        for line in f:
+            text = line.strip()
+            if not text:
+                continue
+            batch.append((episode_number, segment_index, text))
+            segment_index += 1
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                writer.write_rows(columns, batch)
+                batch = []
+    writer.write_rows(columns, batch)
+
+    writer.close()
+    return writer.rows
+
+def export_archive(output_dir=EXPORT_DIR, fmt="parquet", full=False):
+    """
+    Выгрузить эпизоды, рекомендации и сегменты транскрипций в колоночные файлы
+
+    Args:
+        output_dir: Каталог экспорта
+        fmt: Формат файлов ("parquet" или "arrow")
+        full: Перезаписать все партиции, игнорируя манифест прошлого экспорта
+
+    Returns:
+        dict: Сводка экспорта (количество выгруженных и пропущенных эпизодов, строк)
+
+    Raises:
+        ExportInProgressError: Если в этот каталог уже выполняется экспорт
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат экспорта: {fmt}")
+
+    pa = _import_pyarrow()
+
+    # Экспорты в один каталог пишут одни и те же временные файлы, поэтому не пересекаются
+    lease_key = f"export:{os.path.abspath(output_dir)}"
+    owner = make_owner_id()
+    if not try_acquire_lease(lease_key, owner):
+        raise ExportInProgressError(f"Экспорт в {output_dir} уже выполняется")
+    stop_event = keep_lease_alive(lease_key, owner)
+    try:
+        return _export_archive(pa, output_dir, fmt, full)
+    finally:
+        stop_event.set()
+        release_lease(lease_key, owner)
+
+def _export_archive(pa, output_dir, fmt, full):
+    """Экспорт архива под арендой каталога (см. export_archive)"""
+    schemas = _schemas(pa)
+    ext = EXPORT_FORMATS[fmt]
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = _load_manifest(output_dir)
+
+    # При смене формата или полном экспорте партиции прошлого экспорта не переиспользуются
+    # и удаляются, чтобы в каталоге не остались файлы другого формата и удаленных эпизодов
+    if full or manifest.get("format") != fmt:
+        manifest = {}
+        _clear_export(output_dir)
+    exported_versions = manifest.get("episodes", {})
+
+    summary = {
+        "output_dir": output_dir,
+        "format": fmt,
+        "episodes_exported": 0,
+        "episodes_skipped": 0,
+        "episodes_removed": 0,
+        "recommendation_rows": 0,
+        "segment_rows": 0,
+    }
+
+    conn = sqlite3.connect(DB_PATH)
+    summary["episode_rows"] = _export_episodes(pa, conn, output_dir, fmt, ext, schemas["episodes"])
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, episode_number, updated_at, transcript_path FROM episodes ORDER BY episode_number")
+    episodes = cursor.fetchall()
+
+    new_versions = {}
+    for episode_id, episode_number, updated_at, transcript_path in episodes:
+        key = str(episode_number)
+        version = updated_at or ""
+        new_versions[key] = version
+
+        recommendations_path = _partition_path(output_dir, "recommendations", episode_number, ext)
+        if exported_versions.get(key) == version and os.path.exists(recommendations_path):
+            summary["episodes_skipped"] += 1
+            continue
+
+        summary["recommendation_rows"] += _export_recommendations(
+            pa, conn, recommendations_path, episode_id, fmt, schemas["recommendations"]
+        )
+
+        segments_path = _partition_path(output_dir, "transcript_segments", episode_number, ext)
+        transcript_path = transcript_path or get_episode_file_paths(episode_number)["transcript"]
+        if os.path.exists(transcript_path):
+            summary["segment_rows"] += _export_transcript_segments(
+                pa, segments_path, episode_number, transcript_path, fmt, schemas["transcript_segments"]
+            )
+        elif os.path.exists(segments_path):
+            os.remove(segments_path)
+
+        summary["episodes_exported"] += 1
+
+    conn.close()
+
+    # Удаляем партиции эпизодов, которых больше нет в базе данных
+    for key in set(exported_versions) - set(new_versions):
+        for table in PARTITIONED_TABLES:
+            partition_dir = os.path.dirname(_partition_path(output_dir, table, key, ext))
+            shutil.rmtree(partition_dir, ignore_errors=True)
+        summary["episodes_removed"] += 1
+
+    _save_manifest(output_dir, {
+        "format": fmt,
+        "exported_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "episodes": new_versions
+    })
+
+    logger.info(
+        f"Экспорт завершен: выгружено эпизодов {summary['episodes_exported']}, "
+        f"пропущено без изменений {summary['episodes_skipped']}"
+    )
+    return summary
@@ -0,0 +1,431 @@
+"""
+Функции для работы с RSS-лентой подкаста
+
+Лента разбирается потоком: загрузка и разбор прекращаются, как только получено
+нужное количество эпизодов.
+
+Лента кэшируется в памяти и на диске. Пока кэш свежий (RSS_CACHE_TTL), запросы
+в сеть не выполняются. Кэш никогда не уменьшается: загрузка разбирает не меньше
+эпизодов, чем уже есть в кэше, и не меньше FEED_MIN_EPISODES, чтобы одна загрузка
+отвечала на запросы всех страниц. Вместе с эпизодами сохраняются валидаторы ответа
+(ETag / Last-Modified): после истечения срока лента запрашивается условно
+(If-None-Match / If-Modified-Since), если кэш может ответить на запрос. Ответ 304
+означает, что лента не изменилась, а значит, не изменились и разобранные из нее первые
+эпизоды, поэтому он лишь продлевает срок жизни кэша.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+import requests
+
+from modules.utils.http_client import get_session
+from modules.utils.config import RSS_URL, RSS_FETCH_TIMEOUT, RSS_CACHE_TTL, FEED_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Размер части ленты, передаваемой потоковому парсеру
+FEED_CHUNK_SIZE = 64 * 1024
+
+# Сколько эпизодов разбирать при загрузке не меньше (самый большой запрос страниц - find_episode)
+FEED_MIN_EPISODES = 50
+
+# Кэш ленты в памяти: etag, last_modified, fetched_at, complete, episodes
+_feed_cache = None
+_feed_cache_lock = threading.Lock()
+
+# Одновременно выполняется не более одного запроса ленты в процессе, остальные ждут его
+# результат. Блокировку берут и синхронная загрузка (консоль, опрос ленты), и асинхронная
+# загрузка веб-сервера (modules/api/aio.py)
+feed_fetch_lock = threading.Lock()
+
+def parse_feed_item(item):
+    """
+    Извлекает информацию об эпизоде из элемента <item> RSS-ленты
+
+    Returns:
+        dict: Информация об эпизоде или None, если элемент не описывает эпизод
+    """
+    # Извлекаем данные
+    title = item.findtext("title")
+    published_date = item.findtext("pubDate")
+
+    if not title:
+        return None
+
+    # Ищем URL аудиофайла
+    enclosure = item.find("enclosure")
+    if enclosure is None:
+        return None
+    audio_url = enclosure.get("url")
+
+    # Ищем номер эпизода в заголовке
+    episode_number = None
+    for part in title.split():
+        if part.isdigit():
+            episode_number = int(part)
+            break
+
+    if not episode_number:
+        return None
+
+    # Преобразуем дату в более удобный формат
+    try:
+        dt = datetime.strptime(published_date, "%a, %d %b %Y %H:%M:%S %z")
+        published_date_formatted = dt.strftime("%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        published_date_formatted = published_date
+
+    return {
+        "episode_number": episode_number,
+        "title": title,
+        "published_date": published_date_formatted,
+        "audio_url": audio_url
+    }
+
+class FeedParser:
+    """
+    Потоковый разбор RSS-ленты
+
+    Данные подаются частями через feed(), эпизоды извлекаются по мере закрытия
+    элементов <item>, после чего элементы удаляются из дерева. Разбор прекращается,
+    как только получено limit эпизодов, поэтому остаток ленты можно не загружать.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.episodes = []
+        # Лента разобрана до конца (а не остановлена по лимиту)
+        self.complete = False
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._parents = []
+
+    @property
+    def done(self):
+        """Дальнейший разбор не нужен"""
+        return self.complete or (self.limit is not None and len(self.episodes) >= self.limit)
+
+    def feed(self, chunk):
+        """
+        Передать очередную часть ленты
+
+        Returns:
+            list: Эпизоды, извлеченные из этой части
+        """
+        if self.done:
+            return []
+        self._parser.feed(chunk)
+        return self._read_events()
+
+    def close(self):
+        """
+        Завершить разбор
+
+        Returns:
+            list: Все извлеченные эпизоды
+        """
+        if not self.done:
+            self._parser.close()
+            self._read_events()
+            self.complete = True
+        return self.episodes
+
+    def _read_events(self):
+        """Обработать накопленные события парсера"""
+        produced = []
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                self._parents.append(elem)
+                continue
+
+            self._parents.pop()
+            if elem.tag != "item":
+                continue
+
+            episode = parse_feed_item(elem)
+            # Разобранный элемент больше не нужен - освобождаем память
+            if self._parents:
+                self._parents[-1].remove(elem)
+
+            if episode is not None:
+                self.episodes.append(episode)
+                produced.append(episode)
+                if self.done:
+                    break
+        return produced
+
+def iter_feed_episodes(chunks, limit=None):
+    """
+    Лениво извлекает эпизоды из ленты, переданной частями
+
+    Args:
+        chunks: Итерируемый объект с частями ленты (bytes)
+        limit: Максимальное количество эпизодов (None - все эпизоды)
+
+    Yields:
+        dict: Информация об эпизоде
+    """
+    parser = FeedParser(limit)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            return
+
+    # Эпизоды, завершившиеся в последней части ленты
+    count = len(parser.episodes)
+    parser.close()
+    yield from parser.episodes[count:]
+
+def parse_feed_episodes(content, limit=None):
+    """
+    Разбирает содержимое RSS-ленты и возвращает список эпизодов
+
+    Args:
+        content: Содержимое RSS-ленты (bytes)
+        limit: Максимальное количество эпизодов (None - все эпизоды)
+
+    Returns:
+        list: Список эпизодов в порядке следования в ленте (сначала новые)
+    """
+    chunks = (content[i:i + FEED_CHUNK_SIZE] for i in range(0, len(content), FEED_CHUNK_SIZE))
+    episodes = list(iter_feed_episodes(chunks, limit))
+
+    if not episodes:
+        logger.error("Не удалось найти эпизоды в RSS")
+
+    return episodes
+
+def _load_feed_cache():
+    """Получить кэш ленты (при первом обращении загружается с диска)"""
+    global _feed_cache
+    if _feed_cache is None:
+        _feed_cache = {}
+        if os.path.exists(FEED_CACHE_PATH):
+            try:
+                with open(FEED_CACHE_PATH, "r", encoding="utf-8") as f:
+                    _feed_cache = json.load(f)
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать кэш RSS-ленты: {str(e)}")
+    return _feed_cache
+
+def _save_feed_cache(cache):
+    """Сохранить кэш ленты на диск"""
+    try:
+        with open(f"{FEED_CACHE_PATH}.tmp", "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(f"{FEED_CACHE_PATH}.tmp", FEED_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить кэш RSS-ленты: {str(e)}")
+
+def _cached_episodes(cache, limit):
+    """Первые limit эпизодов из кэша или None, если кэш не содержит столько эпизодов"""
+    if "episodes" not in cache:
+        return None
+    episodes = cache["episodes"]
+    if limit is None or len(episodes) < limit:
+        # В неполном кэше (лента разобрана не до конца) может не хватить эпизодов
+        if not cache.get("complete"):
+            return None
+        return list(episodes)
+    return episodes[:limit]
+
+def get_cached_feed_episodes(limit=None, max_age=RSS_CACHE_TTL):
+    """
+    Получить эпизоды из кэша, если он не старше max_age секунд
+
+    Returns:
+        list: Список эпизодов или None, если кэш отсутствует, устарел или неполон
+    """
+    with _feed_cache_lock:
+        cache = _load_feed_cache()
+        if max_age is not None and time.time() - cache.get("fetched_at", 0) > max_age:
+            return None
+        return _cached_episodes(cache, limit)
+
+def get_feed_parse_limit(limit=None):
+    """
+    Сколько эпизодов разобрать при загрузке ленты для запроса limit эпизодов
+
+    Returns:
+        int: Не меньше limit, FEED_MIN_EPISODES и количества эпизодов в кэше;
+            None - разобрать ленту целиком
+    """
+    with _feed_cache_lock:
+        cache = _load_feed_cache()
+        if limit is None or cache.get("complete"):
+            return None
+        return max(limit, FEED_MIN_EPISODES, len(cache.get("episodes", [])))
+
+def get_feed_request_headers(limit=None):
+    """Заголовки условного запроса ленты (если кэш может ответить на запрос после ответа 304)"""
+    with _feed_cache_lock:
+        cache = _load_feed_cache()
+        headers = {}
+        if _cached_episodes(cache, limit) is not None:
+            if cache.get("etag"):
+                headers["If-None-Match"] = cache["etag"]
+            if cache.get("last_modified"):
+                headers["If-Modified-Since"] = cache["last_modified"]
+        return headers
+
+def store_feed_not_modified(limit=None):
+    """
+    Обработать ответ 304: продлить срок жизни кэша
+
+    Returns:
+        list: Список эпизодов из кэша или None, если кэш не может ответить на запрос
+    """
+    with _feed_cache_lock:
+        cache = _load_feed_cache()
+        episodes = _cached_episodes(cache, limit)
+        if episodes is not None:
+            cache["fetched_at"] = time.time()
+            _save_feed_cache(cache)
+        return episodes
+
+def store_feed_episodes(headers, parser, limit=None):
+    """
+    Сохранить в кэш результат разбора ленты
+
+    Эпизоды из кэша, которых нет в неполном разборе, сохраняются после разобранных,
+    поэтому кэш не уменьшается. Валидаторы сохраняются и для неполного разбора: старые
+    эпизоды ленты не меняются, а ответ 304 подтверждает, что не изменились и новые.
+
+    Args:
+        headers: Заголовки ответа
+        parser: FeedParser, которым разобрана лента
+        limit: Количество эпизодов, которое нужно вернуть
+
+    Returns:
+        list: Список эпизодов
+    """
+    global _feed_cache
+
+    episodes = list(parser.episodes)
+    with _feed_cache_lock:
+        if not parser.complete:
+            parsed = {episode["episode_number"] for episode in episodes}
+            oldest = min(parsed, default=None)
+            episodes.extend(
+                episode for episode in _load_feed_cache().get("episodes", [])
+                if episode["episode_number"] not in parsed and (oldest is None or episode["episode_number"] < oldest)
+            )
+
+        cache = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "complete": parser.complete,
+            "episodes": episodes
+        }
+        _feed_cache = cache
+        _save_feed_cache(cache)
+
+    if not episodes:
+        logger.error("Не удалось найти эпизоды в RSS")
+
+    return list(episodes) if limit is None else episodes[:limit]
+
+def get_feed_episodes_fetched_since(started_at, limit=None):
+    """
+    Эпизоды из кэша, если ленту загрузили после started_at (пока ждали feed_fetch_lock)
+
+    Returns:
+        list: Список эпизодов или None, если лента не загружалась или кэш не отвечает на запрос
+    """
+    with _feed_cache_lock:
+        cache = _load_feed_cache()
+        if cache.get("fetched_at", 0) < started_at:
+            return None
+        return _cached_episodes(cache, limit)
+
+def get_stale_feed_episodes(limit=None):
+    """Эпизоды из кэша без учета срока жизни (используется при ошибках загрузки)"""
+    with _feed_cache_lock:
+        cache = _load_feed_cache()
+        episodes = cache.get("episodes", [])
+        return list(episodes) if limit is None else episodes[:limit]
+
+def _download_feed(headers, limit, stale_ok=True):
+    """
+    Загрузить и разобрать ленту потоком, прекращая загрузку после get_feed_parse_limit(limit) эпизодов
+
+    Returns:
+        list: Список эпизодов или None, если нужен повторный безусловный запрос
+    """
+    logger.info("Загрузка RSS-ленты для получения списка эпизодов...")
+    with get_session().get(RSS_URL, headers=headers, timeout=RSS_FETCH_TIMEOUT, stream=True) as response:
+        if response.status_code == 304:
+            return store_feed_not_modified(limit)
+
+        if response.status_code != 200:
+            logger.error(f"Ошибка загрузки RSS: {response.status_code}")
+            return get_stale_feed_episodes(limit) if stale_ok else []
+
+        parser = FeedParser(get_feed_parse_limit(limit))
+        for chunk in response.iter_content(FEED_CHUNK_SIZE):
+            parser.feed(chunk)
+            if parser.done:
+                break
+        parser.close()
+
+    return store_feed_episodes(response.headers, parser, limit)
+
+def fetch_feed_episodes(limit=None, force=False, stale_ok=True):
+    """
+    Получить эпизоды из RSS-ленты с учетом кэша
+
+    Args:
+        limit: Максимальное количество эпизодов (None - все эпизоды)
+        force: Игнорировать срок жизни кэша и выполнить условный запрос
+        stale_ok: При ошибке загрузки вернуть устаревший кэш (иначе пустой список)
+
+    Returns:
+        list: Список эпизодов в порядке следования в ленте (сначала новые)
+    """
+    if not force:
+        episodes = get_cached_feed_episodes(limit)
+        if episodes is not None:
+            return episodes
+
+    started_at = time.time()
+    with feed_fetch_lock:
+        # Пока мы ждали, ленту мог обновить другой поток или веб-сервер
+        episodes = get_feed_episodes_fetched_since(started_at, limit)
+        if episodes is not None:
+            return episodes
+
+        for headers in (get_feed_request_headers(limit), {}):
+            try:
+                episodes = _download_feed(headers, limit, stale_ok)
+            except (requests.RequestException, ET.ParseError) as e:
+                logger.error(f"Ошибка загрузки RSS: {str(e)}")
+                return get_stale_feed_episodes(limit) if stale_ok else []
+
+            if episodes is not None:
+                return episodes
+
+    return []
+
+def fetch_feed_url_episodes(url):
+    """
+    Загрузить и полностью разобрать ленту по адресу без использования кэша (для архивных лент)
+
+    Returns:
+        list: Список эпизодов ленты
+
+    Raises:
+        requests.RequestException, ET.ParseError: При ошибке загрузки или разбора
+    """
+    logger.info(f"Загрузка ленты {url}...")
+    with get_session().get(url, timeout=RSS_FETCH_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        parser = FeedParser()
+        for chunk in response.iter_content(FEED_CHUNK_SIZE):
+            parser.feed(chunk)
+        return parser.close()
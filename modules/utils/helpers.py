@@ -6,13 +6,31 @@ import os
 import re
 import json
 import logging
+import importlib.util
 
 logger = logging.getLogger(__name__)
 
-try:
-    import openai
-except ImportError:
-    logger.error("Библиотека openai не установлена. Установите её с помощью pip install openai")
+def check_processing_dependencies():
+    """
+    Проверить, что установлены библиотеки для обработки эпизодов (без их импорта)
+    
+    Returns:
+        bool: True, если все зависимости доступны
+    """
+    missing = [name for name in ("openai", "whisper", "torch") if importlib.util.find_spec(name) is None]
+    if missing:
+        logger.error(f"Отсутствуют необходимые зависимости: {', '.join(missing)}")
+        logger.error("Установите их: pip install openai git+https://github.com/openai/whisper.git torch")
+        return False
+    return True
+
+def import_openai():
+    """Импорт openai (загружается только при анализе текста, а не при запуске веб-интерфейса)"""
+    try:
+        import openai
+        return openai
+    except ImportError:
+        raise RuntimeError("Библиотека openai не установлена. Установите её с помощью pip install openai")
 
 def load_api_key():
     """Загрузка API ключа из .env файла (для анализа текста)"""
@@ -43,6 +61,7 @@ def load_api_key():
 def check_openai_api_key(api_key):
     """Проверяет работоспособность API ключа OpenAI"""
     try:
+        openai = import_openai()
         client = openai.OpenAI(api_key=api_key)
         response = client.models.list()
         return True
@@ -111,6 +130,39 @@ def get_main_host_name(alias):
     # Если алиас не найден, возвращаем исходное значение
     return alias
 
+def normalize_product_name(name):
+    """Приводит название продукта к каноническому ключу (нижний регистр, единичные пробелы)"""
+    return re.sub(r"\s+", " ", (name or "").strip()).lower()
+
+def split_host_field(value):
+    """
+    Разбирает свободное текстовое поле с ведущими ("Umputun, Бобук и Грей")
+    
+    Returns:
+        list: Основные имена ведущих без 'unknown' и пустых значений
+    """
+    hosts = []
+    for part in re.split(r",|;|/|&|\s+и\s+|\s+and\s+", value or ""):
+        part = part.strip()
+        if not part or part.lower() == "unknown":
+            continue
+        host = get_main_host_name(part)
+        if host not in hosts:
+            hosts.append(host)
+    return hosts
+
+def get_episode_file_paths(episode_number):
+    """Возвращает ожидаемые пути к файлам эпизода на диске"""
+    from modules.utils.config import DOWNLOAD_DIR, TRANSCRIPT_DIR, RECOMMENDATIONS_DIR
+    
+    return {
+        "audio": os.path.join(DOWNLOAD_DIR, f"episode_{episode_number}.mp3"),
+        "transcript": os.path.join(TRANSCRIPT_DIR, f"episode_{episode_number}_transcript.txt"),
+        "recommendations": os.path.join(RECOMMENDATIONS_DIR, f"episode_{episode_number}_products.json"),
+        # Старый формат файла с рекомендациями
+        "recommendations_legacy": os.path.join(RECOMMENDATIONS_DIR, f"episode_{episode_number}_recommendations.json"),
+    }
+
 def format_time(seconds):
     """Форматирует время в секундах в формат HH:MM:SS"""
     hours = seconds // 3600
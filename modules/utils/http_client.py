@@ -0,0 +1,175 @@
+"""
+Общий HTTP-клиент для всех сетевых запросов
+
+Синхронные запросы выполняются через одну сессию requests с пулом keep-alive
+соединений, таймаутами по умолчанию и ограниченными повторами с экспоненциальной
+паузой. Скачивание файлов использует отдельную сессию, которая повторяет только ответы
+429/5xx: после обрыва соединения загрузчик сам продолжает файл с места остановки
+(modules/core/downloader.py), и повторы urllib3 умножали бы число попыток.
+Для веб-сервера создается асинхронный клиент httpx с теми же настройками.
+По каждому хосту собираются метрики: число запросов и ошибок, средняя и
+максимальная задержка до получения заголовков ответа.
+"""
+
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from modules.utils.config import (
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_RETRIES, HTTP_RETRY_BACKOFF, HTTP_POOL_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых запрос повторяется
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Метрики задержки по хостам
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+_session = None
+_download_session = None
+_session_lock = threading.Lock()
+
+def _record(host, seconds=None, error=False):
+    """Учесть запрос к хосту в метриках"""
+    with _metrics_lock:
+        stats = _metrics.setdefault(host, {
+            "requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": None
+        })
+        stats["requests"] += 1
+        if error:
+            stats["errors"] += 1
+        if seconds is not None:
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            stats["last_seconds"] = seconds
+
+def get_http_metrics():
+    """
+    Получить метрики запросов по хостам
+
+    Returns:
+        dict: {хост: {requests, errors, avg_seconds, max_seconds, last_seconds}}
+    """
+    with _metrics_lock:
+        result = {}
+        for host, stats in _metrics.items():
+            timed = stats["requests"] - stats["errors"]
+            result[host] = {
+                "requests": stats["requests"],
+                "errors": stats["errors"],
+                "avg_seconds": round(stats["total_seconds"] / timed, 4) if timed else None,
+                "max_seconds": round(stats["max_seconds"], 4),
+                "last_seconds": round(stats["last_seconds"], 4) if stats["last_seconds"] is not None else None,
+            }
+        return result
+
+class _Session(requests.Session):
+    """Сессия с таймаутами по умолчанию и учетом метрик"""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        host = urlsplit(url).netloc
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            _record(host, error=True)
+            raise
+        _record(host, time.perf_counter() - started)
+        return response
+
+def _create_session(connection_retries):
+    """Сессия с пулом соединений и повторами; connection_retries - повторы ошибок соединения и чтения"""
+    retry = Retry(
+        total=HTTP_RETRIES,
+        connect=connection_retries,
+        read=connection_retries,
+        other=connection_retries,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = _Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_session():
+    """Получить общую сессию requests (создается при первом обращении)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session(HTTP_RETRIES)
+        return _session
+
+def get_download_session():
+    """
+    Получить сессию для скачивания файлов (создается при первом обращении)
+
+    Ошибки соединения и чтения не повторяются: их повторяет загрузчик с докачкой
+    (DOWNLOAD_RETRIES), а ответы 429/5xx повторяются, как в общей сессии.
+    """
+    global _download_session
+    with _session_lock:
+        if _download_session is None:
+            _download_session = _create_session(0)
+        return _download_session
+
+class BandwidthLimiter:
+    """
+    Ограничение суммарной скорости чтения (алгоритм token bucket)
+
+    Один ограничитель можно использовать из нескольких потоков: например, для всех
+    скачиваний бэкфилла, чтобы он не занимал весь канал.
+    """
+
+    def __init__(self, bytes_per_second):
+        self.rate = float(bytes_per_second)
+        self.allowance = self.rate
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, size):
+        """Учесть size прочитанных байт и при необходимости подождать"""
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.allowance -= size
+            delay = -self.allowance / self.rate if self.allowance < 0 else 0
+        if delay > 0:
+            time.sleep(delay)
+
+def create_async_client(timeout=HTTP_READ_TIMEOUT):
+    """
+    Создать асинхронный клиент httpx с пулом соединений, таймаутами и метриками
+
+    Повторы выполняются транспортом только при ошибках установки соединения.
+    """
+    import httpx
+
+    async def on_request(request):
+        request.extensions["started_at"] = time.perf_counter()
+
+    async def on_response(response):
+        started = response.request.extensions.get("started_at")
+        _record(response.request.url.netloc.decode(), time.perf_counter() - started if started else None)
+
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+        transport=httpx.AsyncHTTPTransport(retries=HTTP_RETRIES),
+        event_hooks={"request": [on_request], "response": [on_response]},
+        follow_redirects=True,
+    )
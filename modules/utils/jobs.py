@@ -0,0 +1,496 @@
+"""
+Очередь задач обработки эпизодов в базе данных
+
+Задачи хранятся в таблице jobs, поэтому переживают перезапуск веб-сервера и видны
+из любого процесса: веб-сервер (в том числе несколько воркеров uvicorn) только ставит
+задачи и читает их состояние, а выполняют их отдельные процессы-воркеры
+(python run.py --worker или воркеры, встроенные в веб-сервер через WEB_EMBEDDED_WORKERS).
+
+Воркер захватывает задачу с наибольшим приоритетом и продлевает аренду задачи (heartbeat).
+Если воркер завершился аварийно, аренда истекает через LEASE_TTL секунд и задача снова
+попадает в очередь. Неудачные задачи повторяются с экспоненциальной паузой, пока не
+исчерпано JOB_MAX_ATTEMPTS попыток.
+
+Отмена ожидающей задачи выполняется сразу, а у выполняющейся задачи выставляется
+флаг cancel_requested: воркер замечает его и останавливает обработку на ближайшей
+границе блока (см. modules/utils/cancellation.py).
+"""
+
+import time
+import sqlite3
+import logging
+
+from modules.utils.config import DB_PATH, LEASE_TTL, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты задач: запуск пользователем обслуживается раньше автоматической обработки
+JOB_PRIORITY_MANUAL = 10
+JOB_PRIORITY_AUTO = 0
+
+# Номер завершения задачи: вычисляется внутри завершающей транзакции, а запись в SQLite
+# выполняется по одной транзакции, поэтому номера растут в порядке фиксации
+_NEXT_FINISH_SEQ = "(SELECT COALESCE(MAX(finish_seq), 0) + 1 FROM jobs)"
+
+_JOB_COLUMNS = """
+    id, task_id, episode_number, force_retranscribe, priority, status, progress, message,
+    attempts, max_attempts, owner, created_at, started_at, finished_at, cancel_requested
+"""
+
+def init_jobs_table(cursor):
+    """Создание таблицы очереди задач (вызывается из init_db)"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id TEXT NOT NULL,
+        episode_number INTEGER NOT NULL,
+        force_retranscribe INTEGER DEFAULT 0,
+        priority INTEGER DEFAULT 0,
+        status TEXT NOT NULL,
+        progress INTEGER DEFAULT 0,
+        message TEXT,
+        attempts INTEGER DEFAULT 0,
+        max_attempts INTEGER DEFAULT 3,
+        owner TEXT,
+        available_at REAL NOT NULL,
+        lease_expires_at REAL,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        cancel_requested INTEGER DEFAULT 0,
+        finish_seq INTEGER
+    )
+    ''')
+
+    # Столбцы отмены и номера завершения для таблиц, созданных до их появления
+    cursor.execute("PRAGMA table_info(jobs)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "cancel_requested" not in columns:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER DEFAULT 0")
+    if "finish_seq" not in columns:
+        cursor.execute("ALTER TABLE jobs ADD COLUMN finish_seq INTEGER")
+
+    # Выборка следующей задачи воркером и поиск последней задачи эпизода
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_jobs_queue
+    ON jobs(status, priority DESC, id)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_jobs_task_id
+    ON jobs(task_id, id)
+    ''')
+    # Поиск задач, завершившихся после отметки (обработчики завершения в веб-сервере)
+    cursor.execute("DROP INDEX IF EXISTS idx_jobs_finished_at")
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_jobs_finish_seq
+    ON jobs(finish_seq, id)
+    ''')
+
+def _connect():
+    # Явные транзакции BEGIN IMMEDIATE сериализуют захват задач между процессами
+    return sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+
+def _job_from_row(row):
+    """Преобразовать строку таблицы jobs в словарь"""
+    return {
+        "id": row[0],
+        "task_id": row[1],
+        "episode_number": row[2],
+        "force_retranscribe": bool(row[3]),
+        "priority": row[4],
+        "status": row[5],
+        "progress": row[6],
+        "message": row[7],
+        "attempts": row[8],
+        "max_attempts": row[9],
+        "owner": row[10],
+        "created_at": row[11],
+        "started_at": row[12],
+        "finished_at": row[13],
+        "cancel_requested": bool(row[14]),
+    }
+
+def _set_queue_positions(cursor, jobs):
+    """
+    Добавить ожидающим задачам позицию в очереди (queue_position, начиная с 1)
+
+    Порядок тот же, что при захвате задач воркерами: по приоритету, затем по номеру.
+    """
+    for job in jobs:
+        job["queue_position"] = None
+        if job["status"] != "queued":
+            continue
+        cursor.execute("""
+        SELECT COUNT(*) FROM jobs
+        WHERE status = 'queued' AND (priority > ? OR (priority = ? AND id < ?))
+        """, (job["priority"], job["priority"], job["id"]))
+        job["queue_position"] = cursor.fetchone()[0] + 1
+
+def episode_task_id(episode_number):
+    """Идентификатор задачи обработки эпизода (используется в URL /tasks/{task_id})"""
+    return f"episode_{episode_number}"
+
+def enqueue_job(episode_number, force_retranscribe=False, priority=JOB_PRIORITY_AUTO, max_attempts=JOB_MAX_ATTEMPTS):
+    """
+    Поставить эпизод в очередь обработки
+
+    Returns:
+        tuple: (задача, True) для новой задачи или (активная задача, False), если эпизод
+            уже ждет обработки или обрабатывается
+    """
+    task_id = episode_task_id(episode_number)
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(f"""
+        SELECT {_JOB_COLUMNS} FROM jobs
+        WHERE task_id = ? AND status IN ('queued', 'running')
+        ORDER BY id DESC LIMIT 1
+        """, (task_id,))
+        row = cursor.fetchone()
+        if row:
+            # Повторный запуск пользователем поднимает приоритет уже ожидающей задачи
+            if priority > row[4]:
+                cursor.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, row[0]))
+            cursor.execute("COMMIT")
+            return _job_from_row(row), False
+
+        cursor.execute("""
+        INSERT INTO jobs (task_id, episode_number, force_retranscribe, priority, status, progress,
+                          message, max_attempts, available_at, created_at)
+        VALUES (?, ?, ?, ?, 'queued', 0, 'Задача поставлена в очередь', ?, ?, ?)
+        """, (task_id, episode_number, int(force_retranscribe), priority, max_attempts, now, now))
+        job_id = cursor.lastrowid
+        cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+        job = _job_from_row(cursor.fetchone())
+        cursor.execute("COMMIT")
+    finally:
+        conn.close()
+
+    logger.info(f"Эпизод #{episode_number} поставлен в очередь (задача {job['id']}, приоритет {priority})")
+    return job, True
+
+def _requeue_expired_jobs(cursor, now):
+    """Вернуть в очередь задачи воркеров, переставших продлевать аренду"""
+    cursor.execute(f"""
+    UPDATE jobs SET status = 'cancelled', owner = NULL,
+        finished_at = ?, finish_seq = {_NEXT_FINISH_SEQ}, message = 'Обработка отменена'
+    WHERE status = 'running' AND lease_expires_at < ? AND cancel_requested = 1
+    """, (now, now))
+    cursor.execute(f"""
+    UPDATE jobs SET status = 'failed', owner = NULL, finished_at = ?, finish_seq = {_NEXT_FINISH_SEQ},
+        message = 'Воркер перестал отвечать, попытки исчерпаны'
+    WHERE status = 'running' AND lease_expires_at < ? AND attempts >= max_attempts
+    """, (now, now))
+    cursor.execute("""
+    UPDATE jobs SET status = 'queued', owner = NULL, available_at = ?,
+        message = 'Воркер перестал отвечать, задача возвращена в очередь'
+    WHERE status = 'running' AND lease_expires_at < ?
+    """, (now, now))
+    if cursor.rowcount:
+        logger.warning(f"Возвращено в очередь задач с истекшей арендой: {cursor.rowcount}")
+
+def claim_job(owner, ttl=LEASE_TTL):
+    """
+    Захватить следующую задачу из очереди (наибольший приоритет, затем порядок постановки)
+
+    Returns:
+        dict: Захваченная задача или None, если очередь пуста
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        _requeue_expired_jobs(cursor, now)
+
+        cursor.execute("""
+        SELECT id FROM jobs
+        WHERE status = 'queued' AND available_at <= ?
+        ORDER BY priority DESC, id
+        LIMIT 1
+        """, (now,))
+        row = cursor.fetchone()
+        if not row:
+            cursor.execute("COMMIT")
+            return None
+
+        cursor.execute("""
+        UPDATE jobs SET status = 'running', owner = ?, attempts = attempts + 1,
+            started_at = ?, lease_expires_at = ?, message = 'Начало обработки эпизода'
+        WHERE id = ?
+        """, (owner, now, now + ttl, row[0]))
+        cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (row[0],))
+        job = _job_from_row(cursor.fetchone())
+        cursor.execute("COMMIT")
+        return job
+    finally:
+        conn.close()
+
+def heartbeat_job(job_id, owner, ttl=LEASE_TTL):
+    """
+    Продлить аренду задачи
+
+    Returns:
+        bool: False, если задача больше не принадлежит owner
+    """
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND owner = ? AND status = 'running'",
+            (time.time() + ttl, job_id, owner)
+        )
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+def update_job_progress(job_id, owner, message, progress, ttl=LEASE_TTL):
+    """Сохранить сообщение и процент выполнения задачи (заодно продлевает аренду)"""
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+        UPDATE jobs SET message = ?, progress = ?, lease_expires_at = ?
+        WHERE id = ? AND owner = ? AND status = 'running'
+        """, (message, progress, time.time() + ttl, job_id, owner))
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+def finish_job(job_id, owner, success, message):
+    """
+    Завершить задачу; неудачная задача возвращается в очередь, пока не исчерпаны попытки
+
+    Returns:
+        str: Новое состояние задачи ("completed", "queued", "failed" или "cancelled")
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT attempts, max_attempts, cancel_requested FROM jobs WHERE id = ? AND owner = ?", (job_id, owner))
+        row = cursor.fetchone()
+        if not row:
+            cursor.execute("ROLLBACK")
+            logger.warning(f"Задача {job_id} больше не принадлежит воркеру {owner}")
+            return None
+
+        attempts, max_attempts, cancel_requested = row
+        if not success and cancel_requested:
+            # Отмененную задачу не повторяем, даже если обработка успела завершиться ошибкой
+            status = "cancelled"
+            cursor.execute(f"""
+            UPDATE jobs SET status = 'cancelled', progress = 0, message = 'Обработка отменена', owner = NULL,
+                finished_at = ?, finish_seq = {_NEXT_FINISH_SEQ}
+            WHERE id = ?
+            """, (now, job_id))
+        elif success:
+            status = "completed"
+            cursor.execute(f"""
+            UPDATE jobs SET status = 'completed', progress = 100, message = ?, owner = NULL,
+                finished_at = ?, finish_seq = {_NEXT_FINISH_SEQ}
+            WHERE id = ?
+            """, (message, now, job_id))
+        elif attempts < max_attempts:
+            status = "queued"
+            delay = JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+            cursor.execute("""
+            UPDATE jobs SET status = 'queued', progress = 0, owner = NULL, available_at = ?, message = ?
+            WHERE id = ?
+            """, (now + delay, f"{message}. Повтор через {int(delay)} сек. (попытка {attempts} из {max_attempts})", job_id))
+        else:
+            status = "failed"
+            cursor.execute(f"""
+            UPDATE jobs SET status = 'failed', progress = 0, message = ?, owner = NULL,
+                finished_at = ?, finish_seq = {_NEXT_FINISH_SEQ}
+            WHERE id = ?
+            """, (message, now, job_id))
+        cursor.execute("COMMIT")
+        return status
+    finally:
+        conn.close()
+
+def get_job(task_id):
+    """
+    Получить задачу по номеру (например, "42") или последнюю задачу эпизода ("episode_700")
+
+    Returns:
+        dict: Задача или None
+    """
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        if task_id.isdigit():
+            cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (int(task_id),))
+        else:
+            cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE task_id = ? ORDER BY id DESC LIMIT 1", (task_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = _job_from_row(row)
+        _set_queue_positions(cursor, [job])
+    finally:
+        conn.close()
+
+    return job
+
+def get_latest_jobs(task_ids):
+    """
+    Получить несколько задач одним запросом (идентификаторы в том же виде, что и для get_job)
+
+    Returns:
+        dict: task_id -> задача (идентификаторы без задач отсутствуют)
+    """
+    job_ids = [int(task_id) for task_id in task_ids if task_id.isdigit()]
+    names = [task_id for task_id in task_ids if not task_id.isdigit()]
+    if not job_ids and not names:
+        return {}
+
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+        SELECT {_JOB_COLUMNS} FROM jobs
+        WHERE id IN ({", ".join("?" * len(job_ids))})
+           OR id IN (SELECT MAX(id) FROM jobs WHERE task_id IN ({", ".join("?" * len(names))}) GROUP BY task_id)
+        """, job_ids + names)
+        found = [_job_from_row(row) for row in cursor.fetchall()]
+        _set_queue_positions(cursor, found)
+    finally:
+        conn.close()
+
+    jobs = {}
+    for job in found:
+        if job["id"] in job_ids:
+            jobs[str(job["id"])] = job
+        if job["task_id"] in names:
+            jobs[job["task_id"]] = job
+    return jobs
+
+def get_finished_jobs(after=None):
+    """
+    Задачи, перешедшие в конечное состояние после отметки after
+
+    Отметка - номер завершения (finish_seq), а не время finished_at: время задают разные
+    процессы, и задача, зафиксированная позже задачи с большим временем, была бы пропущена.
+
+    Args:
+        after: Отметка (finish_seq, id) из прошлого вызова; None - только получить
+            текущую отметку, не возвращая уже завершенные задачи
+
+    Returns:
+        tuple: (список задач в порядке завершения, новая отметка)
+    """
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        if after is None:
+            cursor.execute("SELECT finish_seq, id FROM jobs WHERE finish_seq IS NOT NULL ORDER BY finish_seq DESC, id DESC LIMIT 1")
+            row = cursor.fetchone()
+            return [], (row[0], row[1]) if row else (0, 0)
+
+        cursor.execute(f"""
+        SELECT finish_seq, {_JOB_COLUMNS} FROM jobs
+        WHERE finish_seq > ? OR (finish_seq = ? AND id > ?)
+        ORDER BY finish_seq, id
+        """, (after[0], after[0], after[1]))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    if rows:
+        after = (rows[-1][0], rows[-1][1])
+    return [_job_from_row(row[1:]) for row in rows], after
+
+def request_job_cancel(task_id):
+    """
+    Отменить задачу: ожидающая задача отменяется сразу, выполняющейся выставляется флаг отмены
+
+    Returns:
+        tuple: (задача после изменения, True) или (задача, False), если задача уже завершена;
+            None, если задача не найдена
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        if task_id.isdigit():
+            cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (int(task_id),))
+        else:
+            cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE task_id = ? ORDER BY id DESC LIMIT 1", (task_id,))
+        row = cursor.fetchone()
+        if not row:
+            cursor.execute("ROLLBACK")
+            return None
+
+        job_id, status = row[0], row[5]
+        if status not in ("queued", "running"):
+            cursor.execute("ROLLBACK")
+            return _job_from_row(row), False
+
+        if status == "queued":
+            cursor.execute(f"""
+            UPDATE jobs SET status = 'cancelled', cancel_requested = 1,
+                finished_at = ?, finish_seq = {_NEXT_FINISH_SEQ}, message = 'Обработка отменена'
+            WHERE id = ?
+            """, (now, job_id))
+        else:
+            cursor.execute("""
+            UPDATE jobs SET cancel_requested = 1, message = 'Отмена обработки...'
+            WHERE id = ?
+            """, (job_id,))
+        cursor.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+        job = _job_from_row(cursor.fetchone())
+        cursor.execute("COMMIT")
+    finally:
+        conn.close()
+
+    logger.info(f"Запрошена отмена задачи {job['id']} (эпизод #{job['episode_number']}, состояние {job['status']})")
+    return job, True
+
+def is_job_cancel_requested(job_id):
+    """Запрошена ли отмена задачи"""
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+    return bool(row and row[0])
+
+def release_job(job_id, owner):
+    """
+    Вернуть выполнявшуюся задачу в очередь без учета попытки (воркер останавливается)
+
+    Returns:
+        bool: False, если задача больше не принадлежит owner
+    """
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+        UPDATE jobs SET status = 'queued', progress = 0, owner = NULL, available_at = ?,
+            attempts = MAX(attempts - 1, 0), message = 'Воркер остановлен, задача возвращена в очередь'
+        WHERE id = ? AND owner = ? AND status = 'running'
+        """, (time.time(), job_id, owner))
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+def cancel_job(job_id, owner):
+    """Отметить выполнявшуюся задачу отмененной (вызывается воркером после остановки обработки)"""
+    conn = _connect()
+    try:
+        conn.execute(f"""
+        UPDATE jobs SET status = 'cancelled', progress = 0, message = 'Обработка отменена', owner = NULL,
+            finished_at = ?, finish_seq = {_NEXT_FINISH_SEQ}
+        WHERE id = ? AND owner = ?
+        """, (time.time(), job_id, owner))
+    finally:
+        conn.close()
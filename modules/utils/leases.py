@@ -0,0 +1,185 @@
+"""
+Аренды (leases) в базе данных для координации процессов
+
+Аренда с ключом, например "episode:700:transcribe", гарантирует, что этап обработки
+эпизода одновременно выполняет только один процесс (веб-сервер, консоль, воркер).
+Владелец продлевает аренду фоновым потоком (heartbeat); если процесс завершился
+аварийно, аренда истекает через LEASE_TTL секунд и ее может захватить другой процесс.
+Остальные участники ждут освобождения аренды и затем используют готовый результат.
+"""
+
+import os
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+from modules.utils.config import DB_PATH, LEASE_TTL, LEASE_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+def init_lease_table(cursor):
+    """Создание таблицы аренд (вызывается из init_db)"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS leases (
+        lease_key TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        acquired_at REAL NOT NULL,
+        heartbeat_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    ''')
+
+def make_owner_id():
+    """Уникальный идентификатор владельца аренды: хост, процесс и случайный суффикс"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def _connect():
+    # Явные транзакции BEGIN IMMEDIATE сериализуют захват аренды между процессами
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    return conn
+
+def try_acquire_lease(lease_key, owner, ttl=LEASE_TTL):
+    """
+    Захватить аренду, если она свободна, истекла или уже принадлежит owner
+
+    Returns:
+        bool: Захвачена ли аренда
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT owner, expires_at FROM leases WHERE lease_key = ?", (lease_key,))
+        row = cursor.fetchone()
+
+        if row and row[0] != owner and row[1] > now:
+            cursor.execute("ROLLBACK")
+            return False
+
+        if row and row[0] != owner:
+            logger.warning(f"Аренда {lease_key} владельца {row[0]} истекла и перехвачена")
+
+        cursor.execute("""
+        INSERT INTO leases (lease_key, owner, acquired_at, heartbeat_at, expires_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(lease_key) DO UPDATE SET
+            owner = excluded.owner,
+            acquired_at = CASE WHEN leases.owner = excluded.owner THEN leases.acquired_at ELSE excluded.acquired_at END,
+            heartbeat_at = excluded.heartbeat_at,
+            expires_at = excluded.expires_at
+        """, (lease_key, owner, now, now, now + ttl))
+        cursor.execute("COMMIT")
+        return True
+    finally:
+        conn.close()
+
+def renew_lease(lease_key, owner, ttl=LEASE_TTL):
+    """
+    Продлить аренду (heartbeat)
+
+    Returns:
+        bool: False, если аренда больше не принадлежит owner
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE leases SET heartbeat_at = ?, expires_at = ? WHERE lease_key = ? AND owner = ?",
+            (now, now + ttl, lease_key, owner)
+        )
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+def release_lease(lease_key, owner):
+    """Освободить аренду, если она принадлежит owner"""
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM leases WHERE lease_key = ? AND owner = ?", (lease_key, owner))
+    finally:
+        conn.close()
+
+def get_lease(lease_key):
+    """Получить информацию об активной аренде или None"""
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT owner, acquired_at, heartbeat_at, expires_at FROM leases WHERE lease_key = ? AND expires_at > ?",
+            (lease_key, time.time())
+        )
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+
+    if not row:
+        return None
+    return {"lease_key": lease_key, "owner": row[0], "acquired_at": row[1], "heartbeat_at": row[2], "expires_at": row[3]}
+
+def _heartbeat(lease_key, owner, ttl, stop_event):
+    """Продлевать аренду каждые ttl/3 секунд до установки stop_event"""
+    while not stop_event.wait(ttl / 3):
+        try:
+            if not renew_lease(lease_key, owner, ttl):
+                logger.error(f"Аренда {lease_key} потеряна (перехвачена другим процессом)")
+                return
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось продлить аренду {lease_key}: {str(e)}")
+
+def keep_lease_alive(lease_key, owner, ttl=LEASE_TTL):
+    """
+    Запустить фоновое продление аренды
+
+    Returns:
+        threading.Event: Установка события останавливает продление
+    """
+    stop_event = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(lease_key, owner, ttl, stop_event),
+        name=f"lease-{lease_key}", daemon=True
+    )
+    heartbeat.start()
+    return stop_event
+
+@contextmanager
+def hold_lease(lease_key, ttl=LEASE_TTL, on_wait=None):
+    """
+    Выполнить блок кода, удерживая аренду; если она занята - дождаться освобождения
+
+    Args:
+        lease_key: Ключ аренды
+        ttl: Срок аренды без продления в секундах
+        on_wait: Функция (lease), вызываемая один раз, если пришлось ждать другого владельца
+
+    Yields:
+        bool: True, если перед захватом пришлось ждать другого владельца (результат его
+            работы, скорее всего, уже готов и его нужно переиспользовать)
+    """
+    owner = make_owner_id()
+    waited = False
+
+    while not try_acquire_lease(lease_key, owner, ttl):
+        if not waited:
+            waited = True
+            lease = get_lease(lease_key)
+            logger.info(f"Аренда {lease_key} занята ({lease['owner'] if lease else 'неизвестно'}), ожидание...")
+            if on_wait:
+                on_wait(lease)
+        time.sleep(LEASE_POLL_INTERVAL)
+
+    stop_event = keep_lease_alive(lease_key, owner, ttl)
+    try:
+        yield waited
+    finally:
+        stop_event.set()
+        release_lease(lease_key, owner)
+
+def stage_lease_key(episode_number, stage):
+    """Ключ аренды этапа обработки эпизода"""
+    return f"episode:{episode_number}:{stage}"
@@ -0,0 +1,211 @@
+"""
+Планировщик ресурсов для этапов обработки эпизодов
+
+Этапы обработки расходуют разные ресурсы: скачивание - сеть, транскрибирование -
+CPU/GPU и память под модель Whisper, извлечение рекомендаций - запросы к API LLM,
+сохранение результатов - запись в SQLite. Для каждого класса ресурсов задан лимит
+одновременных операций (RESOURCE_LIMITS), общий для всех процессов: веб-сервера,
+воркеров очереди, консоли и бэкфилла.
+
+Слоты ресурса - аренды "resource:<ресурс>:<номер слота>" в таблице leases, поэтому
+слот процесса, завершившегося аварийно, освобождается через LEASE_TTL секунд.
+Ожидающие записываются в таблицу resource_waiters и получают слоты строго по очереди;
+позиция в очереди сообщается через on_wait и видна в GET /scheduler.
+"""
+
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+from modules.utils.config import (
+    DB_PATH, LEASE_TTL, RESOURCE_LIMITS, RESOURCE_POLL_INTERVAL, RESOURCE_WAITER_TTL
+)
+from modules.utils.leases import make_owner_id, keep_lease_alive, release_lease
+from modules.utils.cancellation import check_cancelled
+
+logger = logging.getLogger(__name__)
+
+# Названия ресурсов для сообщений о статусе
+RESOURCE_TITLES = {
+    "download": "скачивание",
+    "transcribe": "транскрибирование",
+    "llm": "запросы к LLM",
+    "db": "запись в базу данных",
+}
+
+def init_scheduler_table(cursor):
+    """Создание таблицы очереди ожидания ресурсов (вызывается из init_db)"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS resource_waiters (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        resource TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        label TEXT,
+        enqueued_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_resource_waiters_resource
+    ON resource_waiters(resource, id)
+    ''')
+
+def _connect():
+    # Явные транзакции BEGIN IMMEDIATE сериализуют выдачу слотов между процессами
+    return sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+
+def _slot_key(resource, slot):
+    return f"resource:{resource}:{slot}"
+
+def _held_slots(cursor, resource, now):
+    """Занятые слоты ресурса: номер слота -> владелец"""
+    cursor.execute(
+        "SELECT lease_key, owner FROM leases WHERE lease_key LIKE ? AND expires_at > ?",
+        (f"resource:{resource}:%", now)
+    )
+    return {int(key.rsplit(":", 1)[1]): owner for key, owner in cursor.fetchall()}
+
+def _try_take_slot(ticket_id, resource, owner, limit, ttl):
+    """
+    Попытаться получить слот ресурса для заявки ticket_id
+
+    Returns:
+        tuple: (номер слота или None, позиция заявки в очереди начиная с 1)
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+
+        # Заявки процессов, переставших продлевать ожидание, не должны держать очередь
+        cursor.execute("DELETE FROM resource_waiters WHERE expires_at < ?", (now,))
+        cursor.execute(
+            "UPDATE resource_waiters SET expires_at = ? WHERE id = ?",
+            (now + RESOURCE_WAITER_TTL, ticket_id)
+        )
+        cursor.execute(
+            "SELECT COUNT(*) FROM resource_waiters WHERE resource = ? AND id < ?",
+            (resource, ticket_id)
+        )
+        position = cursor.fetchone()[0] + 1
+
+        held = _held_slots(cursor, resource, now)
+        free = [slot for slot in range(limit) if slot not in held]
+        if position > len(free):
+            cursor.execute("COMMIT")
+            return None, position
+
+        slot = free[0]
+        cursor.execute("""
+        INSERT INTO leases (lease_key, owner, acquired_at, heartbeat_at, expires_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(lease_key) DO UPDATE SET
+            owner = excluded.owner,
+            acquired_at = excluded.acquired_at,
+            heartbeat_at = excluded.heartbeat_at,
+            expires_at = excluded.expires_at
+        """, (_slot_key(resource, slot), owner, now, now, now + ttl))
+        cursor.execute("DELETE FROM resource_waiters WHERE id = ?", (ticket_id,))
+        cursor.execute("COMMIT")
+        return slot, position
+    finally:
+        conn.close()
+
+def _enqueue_waiter(resource, owner, label):
+    """Встать в очередь ожидания ресурса; возвращает номер заявки"""
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO resource_waiters (resource, owner, label, enqueued_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (resource, owner, label, now, now + RESOURCE_WAITER_TTL)
+        )
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+def _remove_waiter(ticket_id):
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM resource_waiters WHERE id = ?", (ticket_id,))
+    finally:
+        conn.close()
+
+@contextmanager
+def acquire_resource(resource, label=None, on_wait=None, cancel_token=None, ttl=LEASE_TTL):
+    """
+    Выполнить блок кода, заняв слот ресурса; если свободных слотов нет - ждать в очереди
+
+    Args:
+        resource: Класс ресурса (ключ RESOURCE_LIMITS)
+        label: Описание операции для GET /scheduler (например, "episode:700")
+        on_wait: Функция (position), вызываемая при каждом изменении позиции в очереди
+        cancel_token: CancelToken; отмена прерывает ожидание исключением JobCancelled
+        ttl: Срок аренды слота без продления в секундах
+    """
+    limit = RESOURCE_LIMITS[resource]
+    owner = make_owner_id()
+    ticket_id = _enqueue_waiter(resource, owner, label)
+
+    slot = None
+    reported_position = None
+    try:
+        while True:
+            slot, position = _try_take_slot(ticket_id, resource, owner, limit, ttl)
+            if slot is not None:
+                break
+            if position != reported_position:
+                reported_position = position
+                logger.info(f"Ресурс {resource} занят, {label or owner}: позиция в очереди {position}")
+                if on_wait:
+                    on_wait(position)
+            time.sleep(RESOURCE_POLL_INTERVAL)
+            check_cancelled(cancel_token)
+    except BaseException:
+        if slot is None:
+            _remove_waiter(ticket_id)
+        raise
+
+    slot_key = _slot_key(resource, slot)
+    stop_event = keep_lease_alive(slot_key, owner, ttl)
+    try:
+        yield slot
+    finally:
+        stop_event.set()
+        release_lease(slot_key, owner)
+
+def get_scheduler_status():
+    """
+    Состояние ресурсов: лимит, занятые слоты и очередь ожидания с позициями
+
+    Returns:
+        dict: ресурс -> {"title", "limit", "running", "waiting"}
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.cursor()
+        status = {}
+        for resource, limit in RESOURCE_LIMITS.items():
+            held = _held_slots(cursor, resource, now)
+            cursor.execute("""
+            SELECT label, owner, enqueued_at FROM resource_waiters
+            WHERE resource = ? AND expires_at >= ?
+            ORDER BY id
+            """, (resource, now))
+            waiting = [
+                {"position": index + 1, "label": label, "owner": owner, "waiting_seconds": round(now - enqueued_at, 1)}
+                for index, (label, owner, enqueued_at) in enumerate(cursor.fetchall())
+            ]
+            status[resource] = {
+                "title": RESOURCE_TITLES.get(resource, resource),
+                "limit": limit,
+                "running": [{"slot": slot, "owner": owner} for slot, owner in sorted(held.items())],
+                "waiting": waiting,
+            }
+        return status
+    finally:
+        conn.close()
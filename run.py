@@ -22,19 +22,118 @@ def main():
     parser = argparse.ArgumentParser(description="Радио-Т Транскрибер")
     parser.add_argument("--web", action="store_true", help="Запустить веб-интерфейс")
     parser.add_argument("--console", action="store_true", help="Запустить консольный интерфейс")
-    parser.add_argument("--process", type=int, help="Обработать эпизод с указанным номером")
+    parser.add_argument("--process", type=int, nargs="+", metavar="N", help="Обработать эпизоды с указанными номерами (несколько эпизодов обрабатываются конвейером)")
     parser.add_argument("--force-retranscribe", action="store_true", help="Принудительно повторно транскрибировать аудио")
+    parser.add_argument("--poll", action="store_true", help="Опрашивать RSS-ленту и ставить новые эпизоды в очередь задач (вместе с --web - в веб-сервере)")
+    parser.add_argument("--worker", action="store_true", help="Запустить воркер очереди задач обработки эпизодов (задачи ставит веб-интерфейс)")
+    parser.add_argument("--backfill", nargs="?", const="", metavar="START-END", help="Загрузить метаданные всего архива и обработать эпизоды диапазона (например, 600-700)")
+    parser.add_argument("--download-workers", type=int, help="Параллельные скачивания в конвейере (по умолчанию 4)")
+    parser.add_argument("--transcribe-workers", type=int, help="Параллельные транскрибирования в конвейере (по умолчанию 1)")
+    parser.add_argument("--extract-workers", type=int, help="Параллельные извлечения рекомендаций в конвейере (по умолчанию 2)")
+    parser.add_argument("--bandwidth-limit", type=float, help="Ограничение суммарной скорости скачиваний бэкфилла в МБ/с")
+    parser.add_argument("--repair-status", action="store_true", help="Сверить статусы эпизодов в базе данных с файлами на диске")
+    parser.add_argument("--export", nargs="?", const="exports", metavar="DIR", help="Выгрузить архив в Parquet/Arrow (по умолчанию в каталог exports)")
+    parser.add_argument("--export-format", choices=["parquet", "arrow"], default="parquet", help="Формат экспорта")
+    parser.add_argument("--export-full", action="store_true", help="Перезаписать все партиции экспорта")
     
     args = parser.parse_args()
     
-    # Проверяем наличие зависимостей
-    try:
-        import openai
-        import whisper
-        import torch
-    except ImportError:
-        logger.error("Отсутствуют необходимые зависимости.")
-        logger.error("Установите их: pip install openai git+https://github.com/openai/whisper.git torch")
+    # Библиотеки машинного обучения нужны только для обработки эпизодов; веб-интерфейс,
+    # консоль, экспорт и сверка статусов запускаются без них
+    needs_processing = args.process or args.worker or args.backfill
+    if needs_processing:
+        from modules.utils.helpers import check_processing_dependencies
+        if not check_processing_dependencies():
+            return
+    
+    # Сверка статусов эпизодов с файлами на диске
+    if args.repair_status:
+        from modules.utils.database import init_db, reconcile_episode_stages
+        
+        init_db()
+        repaired = reconcile_episode_stages()
+        logger.info(f"Сверка завершена, исправлено эпизодов: {repaired}")
+        return
+    
+    # Загрузка архива эпизодов
+    if args.backfill is not None:
+        from modules.core.backfill import import_archive, backfill_episodes
+        from modules.utils.database import init_db
+        from modules.utils.config import (
+            PIPELINE_DOWNLOAD_WORKERS, PIPELINE_TRANSCRIBE_WORKERS, PIPELINE_EXTRACT_WORKERS,
+            BACKFILL_BANDWIDTH_LIMIT
+        )
+        
+        init_db()
+        import_archive()
+        
+        if not args.backfill:
+            logger.info("Метаданные архива загружены. Для обработки укажите диапазон: --backfill START-END")
+            return
+        
+        # Диапазон: "600-700", "600-" (до последнего), "-700" (с первого) или "650" (один эпизод)
+        try:
+            start, separator, end = args.backfill.partition("-")
+            start = int(start) if start else None
+            if separator:
+                end = int(end) if end else None
+            else:
+                end = start
+        except ValueError:
+            logger.error(f"Некорректный диапазон эпизодов: {args.backfill}")
+            return
+        
+        try:
+            counts = backfill_episodes(
+                start, end,
+                args.download_workers or PIPELINE_DOWNLOAD_WORKERS,
+                args.transcribe_workers or PIPELINE_TRANSCRIBE_WORKERS,
+                args.extract_workers or PIPELINE_EXTRACT_WORKERS,
+                args.force_retranscribe,
+                bandwidth_limit=int(args.bandwidth_limit * 1024 * 1024) if args.bandwidth_limit else BACKFILL_BANDWIDTH_LIMIT
+            )
+        except KeyboardInterrupt:
+            return
+        logger.info(f"Бэкфилл завершен: {counts}")
+        return
+    
+    # Экспорт архива в колоночные файлы
+    if args.export:
+        from modules.utils.database import init_db
+        from modules.utils.export import export_archive, ExportInProgressError
+        
+        init_db()
+        try:
+            summary = export_archive(args.export, args.export_format, args.export_full)
+        except (RuntimeError, ExportInProgressError) as e:
+            logger.error(str(e))
+            return
+        logger.info(f"Экспорт в {summary['output_dir']}: {summary}")
+        return
+    
+    # Воркер очереди задач: обрабатывает эпизоды, поставленные в очередь веб-интерфейсом
+    if args.worker:
+        from modules.core.worker import run_worker
+        from modules.utils.database import init_db
+        
+        init_db()
+        try:
+            run_worker()
+        except KeyboardInterrupt:
+            logger.info("Воркер очереди остановлен пользователем")
+        return
+    
+    # Фоновый опрос RSS-ленты без веб-интерфейса: новые эпизоды ставятся в очередь задач,
+    # а обрабатывают их воркеры (python run.py --worker)
+    if args.poll and not args.web:
+        from modules.core.poller import run_feed_poller, enqueue_new_episode
+        from modules.utils.database import init_db
+        
+        init_db()
+        try:
+            run_feed_poller(enqueue_new_episode)
+        except KeyboardInterrupt:
+            logger.info("Опрос RSS-ленты остановлен пользователем")
         return
     
     # Если не указаны аргументы, запускаем консольный интерфейс по умолчанию
@@ -46,7 +145,7 @@ def main():
         try:
             from modules.api.server import start_server
             logger.info("Запуск веб-интерфейса...")
-            start_server()
+            start_server(poll=args.poll)
         except ImportError as e:
             logger.error("Не удалось запустить веб-интерфейс.")
             logger.error(f"Ошибка: {str(e)}")
@@ -71,13 +170,40 @@ def main():
         # Инициализация базы данных
         init_db()
         
-        logger.info(f"Запуск обработки эпизода #{args.process}...")
-        result = process_episode(args.process, args.force_retranscribe)
+        if len(args.process) == 1:
+            episode_number = args.process[0]
+            logger.info(f"Запуск обработки эпизода #{episode_number}...")
+            result = process_episode(episode_number, args.force_retranscribe)
+            
+            if result:
+                logger.info(f"Эпизод #{episode_number} успешно обработан!")
+            else:
+                logger.error(f"При обработке эпизода #{episode_number} возникли ошибки.")
+            return
+        
+        # Несколько эпизодов обрабатываются конвейером: этапы разных эпизодов идут параллельно
+        from modules.core.pipeline import run_pipeline
+        from modules.utils.config import (
+            PIPELINE_DOWNLOAD_WORKERS, PIPELINE_TRANSCRIBE_WORKERS, PIPELINE_EXTRACT_WORKERS
+        )
+        
+        logger.info(f"Запуск конвейерной обработки эпизодов: {', '.join(map(str, args.process))}")
+        try:
+            results = run_pipeline(
+                args.process,
+                args.download_workers or PIPELINE_DOWNLOAD_WORKERS,
+                args.transcribe_workers or PIPELINE_TRANSCRIBE_WORKERS,
+                args.extract_workers or PIPELINE_EXTRACT_WORKERS,
+                force_retranscribe=args.force_retranscribe
+            )
+        except KeyboardInterrupt:
+            return
         
-        if result:
-            logger.info(f"Эпизод #{args.process} успешно обработан!")
+        failed = [str(number) for number, ok in results.items() if not ok]
+        if failed:
+            logger.error(f"При обработке эпизодов возникли ошибки: {', '.join(failed)}")
         else:
-            logger.error(f"При обработке эпизода #{args.process} возникли ошибки.")
+            logger.info(f"Все эпизоды ({len(results)}) успешно обработаны!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,24 @@
+"""
+Временная база данных для тестов
+
+Модули импортируют DB_PATH из конфигурации, поэтому путь подменяется в каждом
+загруженном модуле пакета modules, после чего создаются таблицы.
+"""
+
+import os
+import sys
+import tempfile
+from unittest import mock
+
+from modules.utils.database import init_db
+
+def use_temp_db(test_case):
+    """Подменить DB_PATH на временный файл до конца теста и создать таблицы; возвращает путь"""
+    path = os.path.join(tempfile.mkdtemp(prefix="radiot_test_"), "test.db")
+    for name, module in list(sys.modules.items()):
+        if name.startswith("modules.") and hasattr(module, "DB_PATH"):
+            patch = mock.patch.object(module, "DB_PATH", path)
+            patch.start()
+            test_case.addCleanup(patch.stop)
+    init_db()
+    return path
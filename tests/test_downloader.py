@@ -0,0 +1,141 @@
+"""
+Скачивание файлов: проверка завершенности, счетчик повторов и проверка диапазона докачки
+
+Сервер заменяет поддельная сессия requests, отдающая файл по Range и обрывающая
+соединения по сценарию теста.
+"""
+
+import os
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import requests
+
+from modules.core import downloader
+from modules.utils.cancellation import CancelToken, JobCancelled
+
+CONTENT = os.urandom(16 * 1024)
+
+class FakeResponse:
+    def __init__(self, status_code, chunks=(), headers=None, error=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._chunks = chunks
+        self._error = error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def iter_content(self, chunk_size):
+        yield from self._chunks
+        if self._error is not None:
+            raise self._error
+
+class FlakySession:
+    """Отдает CONTENT, обрывая каждое соединение после break_after байт"""
+
+    def __init__(self, break_after=None, wrong_range=False):
+        self.break_after = break_after
+        self.wrong_range = wrong_range
+        self.head_headers = {"Content-Length": str(len(CONTENT))}
+        self.head_error = None
+        self.gets = 0
+
+    def head(self, url, **kwargs):
+        if self.head_error is not None:
+            raise self.head_error
+        return FakeResponse(200, headers=self.head_headers)
+
+    def get(self, url, headers=None, **kwargs):
+        self.gets += 1
+        start = int(headers["Range"][6:-1]) if headers else 0
+        if self.wrong_range and start:
+            # Сервер игнорирует смещение и отдает файл с начала, но отвечает 206
+            self.wrong_range = False
+            start = 0
+        body = CONTENT[start:]
+        response_headers = {"Content-Length": str(len(body))}
+        status = 200
+        if headers:
+            status = 206
+            response_headers["Content-Range"] = f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}"
+
+        error = None
+        if self.break_after is not None and len(body) > self.break_after:
+            body, error = body[:self.break_after], requests.ConnectionError("connection reset")
+        return FakeResponse(status, [body], response_headers, error)
+
+class OfflineSession(FlakySession):
+    """Поддерживает диапазоны, но каждый запрос GET заканчивается ошибкой соединения"""
+
+    def __init__(self):
+        super().__init__()
+        self.head_headers = {"Content-Length": str(len(CONTENT)), "Accept-Ranges": "bytes"}
+
+    def get(self, url, headers=None, **kwargs):
+        self.gets += 1
+        raise requests.ConnectionError("connection refused")
+
+class DownloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(prefix="downloader_test_"), "episode.mp3")
+        patch = mock.patch.object(downloader.time, "sleep")
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_unconfirmed_file_is_not_complete(self):
+        with open(self.path, "wb") as f:
+            f.write(CONTENT[:1000])
+        session = FlakySession()
+
+        self.assertFalse(downloader.is_download_complete(self.path, None, session))
+        session.head_error = requests.ConnectionError("offline")
+        self.assertFalse(downloader.is_download_complete(self.path, "https://cdn.example.com/a.mp3", session))
+        session.head_error, session.head_headers = None, {}
+        self.assertFalse(downloader.is_download_complete(self.path, "https://cdn.example.com/a.mp3", session))
+
+        # Размер, подтвержденный сервером, сохраняется контрольной суммой
+        with open(self.path, "wb") as f:
+            f.write(CONTENT)
+        session.head_headers = {"Content-Length": str(len(CONTENT))}
+        self.assertTrue(downloader.is_download_complete(self.path, "https://cdn.example.com/a.mp3", session))
+        self.assertTrue(os.path.exists(f"{self.path}.sha256"))
+
+    def test_retries_are_counted_in_a_row(self):
+        # Обрывов больше DOWNLOAD_RETRIES, но каждое соединение передает данные
+        session = FlakySession(break_after=1024)
+        downloader.download_file("https://cdn.example.com/a.mp3", self.path, session=session, segments=1)
+
+        self.assertGreater(session.gets, downloader.DOWNLOAD_RETRIES + 1)
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), CONTENT)
+
+    def test_mismatched_range_restarts_download(self):
+        session = FlakySession(break_after=4096, wrong_range=True)
+        downloader.download_file("https://cdn.example.com/a.mp3", self.path, session=session, segments=1)
+
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), CONTENT)
+
+    def test_cancel_interrupts_segment_backoff(self):
+        session = OfflineSession()
+        cancel_token = CancelToken()
+        threading.Timer(0.2, cancel_token.cancel).start()
+
+        started = time.monotonic()
+        with mock.patch.object(downloader, "DOWNLOAD_SEGMENT_MIN_SIZE", 1024):
+            with self.assertRaises(JobCancelled):
+                downloader.download_file(
+                    "https://cdn.example.com/a.mp3", self.path, session=session, segments=4, cancel_token=cancel_token
+                )
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertFalse(os.path.exists(f"{self.path}.segmented.part"))
+
+if __name__ == "__main__":
+    unittest.main()
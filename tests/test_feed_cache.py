@@ -0,0 +1,162 @@
+"""
+Кэш RSS-ленты: количество запросов ленты при открытии страниц веб-интерфейса
+
+Лента отдается httpx.MockTransport (веб-сервер) и поддельной сессией requests (консоль
+и опрос ленты), которые считают запросы и поддерживают If-None-Match.
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+import unittest
+import threading
+from unittest import mock
+
+import httpx
+
+from modules.api import aio
+from modules.utils import feed
+from modules.utils.config import FEED_POLL_LIMIT
+
+ETAG = '"feed-v1"'
+
+def make_feed(count, newest=900):
+    """RSS-лента из count эпизодов (сначала новые)"""
+    items = "".join(
+        f"<item><title>Радио-Т {number}</title><pubDate>Sat, 06 Jan 2024 20:00:00 +0000</pubDate>"
+        f"<enclosure url=\"https://cdn.example.com/rt_podcast{number}.mp3\" type=\"audio/mp3\"/></item>"
+        for number in range(newest, newest - count, -1)
+    )
+    return f"<?xml version=\"1.0\"?><rss><channel><title>Радио-Т</title>{items}</channel></rss>".encode("utf-8")
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self._body), chunk_size):
+            yield self._body[i:i + chunk_size]
+
+class FakeSession:
+    """Поддельная сессия requests; если задан gate, ответ задерживается до его установки"""
+
+    def __init__(self, body=None, gate=None):
+        self.body = body if body is not None else make_feed(20)
+        self.etag = ETAG
+        self.gate = gate
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append(headers)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if headers.get("If-None-Match") == self.etag:
+            return FakeResponse(304, headers={"ETag": self.etag})
+        return FakeResponse(200, self.body, {"ETag": self.etag})
+
+class FeedCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.body = make_feed(200)
+        self.etag = ETAG
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            if request.headers.get("If-None-Match") == self.etag:
+                return httpx.Response(304, headers={"ETag": self.etag})
+            return httpx.Response(200, content=self.body, headers={"ETag": self.etag})
+
+        work_dir = tempfile.mkdtemp(prefix="feed_cache_test_")
+        patches = [
+            mock.patch.object(feed, "FEED_CACHE_PATH", os.path.join(work_dir, "feed_cache.json")),
+            mock.patch.object(feed, "_feed_cache", None),
+            mock.patch.object(aio, "_feed_lock", None),
+            mock.patch.object(aio, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler))),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def expire_cache(self):
+        feed._feed_cache["fetched_at"] = time.time() - feed.RSS_CACHE_TTL - 1
+
+    async def test_index_page_fetches_feed_once(self):
+        # Главная страница параллельно запрашивает последний эпизод и 10 последних
+        latest, episodes = await asyncio.gather(
+            aio.get_latest_episode_async(), aio.get_all_episodes_from_rss_async(10)
+        )
+        self.assertEqual(latest["episode_number"], 900)
+        self.assertEqual(len(episodes), 10)
+        self.assertEqual(len(self.requests), 1)
+
+        # Пока кэш свежий, страницы с большим количеством эпизодов не обращаются к ленте
+        self.assertEqual(len(await aio.get_all_episodes_from_rss_async(20)), 20)
+        self.assertEqual(len(await aio.get_all_episodes_from_rss_async(50)), 50)
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_partial_cache_is_not_shrunk(self):
+        await aio.get_all_episodes_from_rss_async(80)
+        self.expire_cache()
+        await aio.get_all_episodes_from_rss_async(1)
+        self.assertEqual(len(self.requests), 2)
+
+        self.assertEqual(len(await aio.get_all_episodes_from_rss_async(80)), 80)
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_expired_cache_is_revalidated(self):
+        # Страницы запрашивают 1 и 10 эпизодов, опрос ленты - FEED_POLL_LIMIT: лента разбирается не целиком
+        self.assertEqual(len(await aio.get_all_episodes_from_rss_async(10)), 10)
+        self.assertFalse(feed._feed_cache["complete"])
+
+        for limit in (10, FEED_POLL_LIMIT, 1):
+            self.expire_cache()
+            self.assertEqual(len(await aio.get_all_episodes_from_rss_async(limit)), limit)
+            self.assertEqual(self.requests[-1].headers.get("If-None-Match"), ETAG)
+        self.assertEqual(len(self.requests), 4)
+
+    async def test_changed_feed_is_downloaded(self):
+        await aio.get_all_episodes_from_rss_async(10)
+
+        # Новый эпизод меняет ETag: условный запрос получает 200 и новую ленту
+        self.body = make_feed(201, newest=901)
+        self.etag = '"feed-v2"'
+        self.expire_cache()
+        episodes = await aio.get_all_episodes_from_rss_async(10)
+        self.assertEqual(self.requests[-1].headers.get("If-None-Match"), ETAG)
+        self.assertEqual(episodes[0]["episode_number"], 901)
+        self.assertEqual(feed._feed_cache["etag"], '"feed-v2"')
+        self.assertEqual(len(self.requests), 2)
+
+    async def test_sync_and_async_fetches_share_one_request(self):
+        # Опрос ленты в потоке веб-сервера загружает ленту, когда ее запрашивает страница
+        gate = threading.Event()
+        session = FakeSession(self.body, gate)
+        with mock.patch.object(feed, "get_session", lambda: session):
+            poll = threading.Thread(
+                target=feed.fetch_feed_episodes, args=(feed.FEED_MIN_EPISODES,), kwargs={"force": True}
+            )
+            poll.start()
+            while not session.requests:
+                await asyncio.sleep(0.01)
+
+            page = asyncio.create_task(aio.get_all_episodes_from_rss_async(10))
+            await asyncio.sleep(0.1)
+            gate.set()
+            self.assertEqual(len(await page), 10)
+            poll.join()
+
+        self.assertEqual(len(session.requests), 1)
+        self.assertEqual(len(self.requests), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+"""
+Кэш отрисованных страниц: размер считается в байтах UTF-8, вытесняются давно не использованные
+"""
+
+import unittest
+
+from modules.api.fragment_cache import FragmentCache
+
+PAGE = ("Рекомендации эпизода " * 10).encode("utf-8")
+
+class FragmentCacheTest(unittest.TestCase):
+    def test_size_is_counted_in_bytes(self):
+        cache = FragmentCache(max_bytes=len(PAGE) * 2)
+        cache.put((700, "recommendations.html", "v1"), PAGE)
+        self.assertEqual(cache.stats()["bytes"], len(PAGE))
+        self.assertGreater(cache.stats()["bytes"], len(PAGE.decode("utf-8")))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = FragmentCache(max_bytes=len(PAGE) * 2)
+        cache.put((700, "recommendations.html", "v1"), PAGE)
+        cache.put((701, "recommendations.html", "v1"), PAGE)
+        cache.get((700, "recommendations.html", "v1"))
+        cache.put((702, "recommendations.html", "v1"), PAGE)
+
+        self.assertIsNone(cache.get((701, "recommendations.html", "v1")))
+        self.assertEqual(cache.get((700, "recommendations.html", "v1")), PAGE)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_invalidate_episode(self):
+        cache = FragmentCache()
+        cache.put((700, "recommendations.html", "v1"), PAGE)
+        cache.put((700, "episode_details.html", "v1"), PAGE)
+        cache.put((701, "recommendations.html", "v1"), PAGE)
+        cache.invalidate_episode(700)
+
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertEqual(cache.stats()["bytes"], len(PAGE))
+
+if __name__ == "__main__":
+    unittest.main()
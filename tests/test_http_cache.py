@@ -0,0 +1,42 @@
+"""
+Заголовки кэширования страниц эпизода: обработанный эпизод кэшируется, пока не поставлен
+в очередь на повторную обработку
+"""
+
+import unittest
+
+from fastapi.testclient import TestClient
+
+from modules.api.server import app
+from modules.utils.database import save_new_episodes, get_episode_by_number, update_episode_status
+from modules.utils.jobs import enqueue_job, JOB_PRIORITY_MANUAL
+
+from temp_db import use_temp_db
+
+EPISODE = {
+    "episode_number": 900, "title": "Радио-Т 900", "published_date": "2024-01-06 20:00:00",
+    "audio_url": "https://cdn.example.com/rt_podcast900.mp3"
+}
+
+class EpisodeCacheHeadersTest(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self)
+        save_new_episodes([EPISODE])
+        update_episode_status(get_episode_by_number(900)["id"], 2)
+        self.client = TestClient(app)
+
+    def assert_cache_control(self, expected_prefix):
+        for url in ("/episodes/900", "/episodes/900/recommendations", "/episodes/900/details"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertTrue(response.headers["Cache-Control"].startswith(expected_prefix), url)
+
+    def test_processed_episode_is_cached(self):
+        self.assert_cache_control("public, max-age=")
+
+    def test_requeued_episode_is_not_cached(self):
+        enqueue_job(900, True, JOB_PRIORITY_MANUAL)
+        self.assert_cache_control("no-cache")
+
+if __name__ == "__main__":
+    unittest.main()
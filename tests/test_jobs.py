@@ -0,0 +1,139 @@
+"""
+Очередь задач в базе данных: постановка без дублей, порядок захвата, истекшая аренда,
+повторы с паузой, возврат в очередь и отмена
+"""
+
+import time
+import unittest
+from unittest import mock
+
+from modules.utils import jobs
+from modules.utils.jobs import (
+    enqueue_job, claim_job, finish_job, release_job, cancel_job, request_job_cancel, get_job, get_finished_jobs,
+    JOB_PRIORITY_AUTO, JOB_PRIORITY_MANUAL
+)
+
+from temp_db import use_temp_db
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self)
+
+    def advance_clock(self, seconds):
+        """Сдвинуть часы очереди вперед до конца теста"""
+        now = time.time() + seconds
+        patch = mock.patch.object(jobs.time, "time", return_value=now)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_enqueue_deduplicates_and_bumps_priority(self):
+        job, created = enqueue_job(700)
+        self.assertTrue(created)
+
+        again, created = enqueue_job(700, priority=JOB_PRIORITY_MANUAL)
+        self.assertFalse(created)
+        self.assertEqual(again["id"], job["id"])
+        self.assertEqual(get_job("episode_700")["priority"], JOB_PRIORITY_MANUAL)
+
+        # Повтор с меньшим приоритетом не понижает его
+        enqueue_job(700, priority=JOB_PRIORITY_AUTO)
+        self.assertEqual(get_job("episode_700")["priority"], JOB_PRIORITY_MANUAL)
+
+    def test_claim_order(self):
+        first, _ = enqueue_job(700)
+        second, _ = enqueue_job(701)
+        manual, _ = enqueue_job(702, priority=JOB_PRIORITY_MANUAL)
+
+        self.assertEqual(get_job(str(second["id"]))["queue_position"], 3)
+        self.assertEqual([claim_job("w")["id"] for _ in range(3)], [manual["id"], first["id"], second["id"]])
+        self.assertIsNone(claim_job("w"))
+
+    def test_expired_lease_is_requeued(self):
+        job, _ = enqueue_job(700, max_attempts=2)
+        self.assertEqual(claim_job("crashed", ttl=-1)["id"], job["id"])
+
+        # Воркер перестал продлевать аренду: задачу забирает другой воркер
+        claimed = claim_job("alive", ttl=-1)
+        self.assertEqual(claimed["id"], job["id"])
+        self.assertEqual(claimed["owner"], "alive")
+        self.assertEqual(claimed["attempts"], 2)
+
+        # Попытки исчерпаны - задача не возвращается в очередь
+        self.assertIsNone(claim_job("other"))
+        self.assertEqual(get_job(str(job["id"]))["status"], "failed")
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job, _ = enqueue_job(700, max_attempts=2)
+        claim_job("w")
+        self.assertEqual(finish_job(job["id"], "w", False, "Ошибка"), "queued")
+
+        # До истечения паузы задача не выдается
+        self.assertIsNone(claim_job("w"))
+        self.advance_clock(jobs.JOB_RETRY_BACKOFF + 1)
+        retried = claim_job("w")
+        self.assertEqual((retried["id"], retried["attempts"]), (job["id"], 2))
+
+        self.assertEqual(finish_job(job["id"], "w", False, "Ошибка"), "failed")
+        self.assertIsNotNone(get_job(str(job["id"]))["finished_at"])
+
+    def test_finish_requires_owner(self):
+        job, _ = enqueue_job(700)
+        claim_job("w")
+        self.assertIsNone(finish_job(job["id"], "stranger", True, "Готово"))
+        self.assertEqual(finish_job(job["id"], "w", True, "Готово"), "completed")
+
+    def test_release_does_not_spend_attempt(self):
+        job, _ = enqueue_job(700)
+        claim_job("w")
+        self.assertFalse(release_job(job["id"], "stranger"))
+        self.assertTrue(release_job(job["id"], "w"))
+
+        released = get_job(str(job["id"]))
+        self.assertEqual((released["status"], released["attempts"], released["owner"]), ("queued", 0, None))
+        self.assertEqual(claim_job("w")["attempts"], 1)
+
+    def test_cancel_queued_and_running(self):
+        queued, _ = enqueue_job(700)
+        job, changed = request_job_cancel(str(queued["id"]))
+        self.assertTrue(changed)
+        self.assertEqual(job["status"], "cancelled")
+        self.assertFalse(request_job_cancel(str(queued["id"]))[1])
+
+        running, _ = enqueue_job(701)
+        claim_job("w")
+        job, _ = request_job_cancel("episode_701")
+        self.assertEqual(job["status"], "running")
+        self.assertTrue(job["cancel_requested"])
+
+        # Обработка, прерванная ошибкой после запроса отмены, не повторяется
+        self.assertEqual(finish_job(running["id"], "w", False, "Ошибка"), "cancelled")
+
+    def test_cancel_job_by_worker(self):
+        job, _ = enqueue_job(700)
+        claim_job("w")
+        cancel_job(job["id"], "w")
+        self.assertEqual(get_job("episode_700")["status"], "cancelled")
+
+        # После отмены эпизод можно поставить снова
+        self.assertTrue(enqueue_job(700)[1])
+
+    def test_finished_jobs_follow_commit_order(self):
+        first, _ = enqueue_job(700)
+        second, _ = enqueue_job(701)
+        claim_job("fast")
+        claim_job("slow")
+        _, mark = get_finished_jobs()
+
+        # Часы воркера "fast" спешат: его задача завершена первой, но с более поздним временем
+        with mock.patch.object(jobs.time, "time", return_value=time.time() + 60):
+            finish_job(first["id"], "fast", True, "Готово")
+        finished, mark = get_finished_jobs(mark)
+        self.assertEqual([job["id"] for job in finished], [first["id"]])
+
+        finish_job(second["id"], "slow", True, "Готово")
+        finished, mark = get_finished_jobs(mark)
+        self.assertEqual([job["id"] for job in finished], [second["id"]])
+        self.assertEqual(get_finished_jobs(mark), ([], mark))
+
+if __name__ == "__main__":
+    unittest.main()
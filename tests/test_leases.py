@@ -0,0 +1,59 @@
+"""
+Аренды в базе данных: захват, продление, освобождение и перехват истекшей аренды
+"""
+
+import threading
+import unittest
+from unittest import mock
+
+from modules.utils import leases
+from modules.utils.leases import try_acquire_lease, renew_lease, release_lease, get_lease, hold_lease
+
+from temp_db import use_temp_db
+
+class LeaseTest(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self)
+        patch = mock.patch.object(leases, "LEASE_POLL_INTERVAL", 0.05)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_lease_is_exclusive_until_released(self):
+        self.assertTrue(try_acquire_lease("episode:700:download", "a"))
+        self.assertTrue(try_acquire_lease("episode:700:download", "a"))
+        self.assertFalse(try_acquire_lease("episode:700:download", "b"))
+
+        self.assertFalse(renew_lease("episode:700:download", "b"))
+        self.assertTrue(renew_lease("episode:700:download", "a"))
+
+        # Освободить аренду может только владелец
+        release_lease("episode:700:download", "b")
+        self.assertEqual(get_lease("episode:700:download")["owner"], "a")
+        release_lease("episode:700:download", "a")
+        self.assertIsNone(get_lease("episode:700:download"))
+        self.assertTrue(try_acquire_lease("episode:700:download", "b"))
+
+    def test_expired_lease_is_taken_over(self):
+        # Владелец завершился аварийно и не продлевает аренду
+        self.assertTrue(try_acquire_lease("episode:700:transcribe", "crashed", ttl=-1))
+        self.assertIsNone(get_lease("episode:700:transcribe"))
+
+        with hold_lease("episode:700:transcribe") as waited:
+            self.assertFalse(waited)
+            self.assertNotEqual(get_lease("episode:700:transcribe")["owner"], "crashed")
+            # Прежний владелец не может продлить перехваченную аренду
+            self.assertFalse(renew_lease("episode:700:transcribe", "crashed"))
+        self.assertIsNone(get_lease("episode:700:transcribe"))
+
+    def test_hold_lease_waits_for_owner(self):
+        self.assertTrue(try_acquire_lease("episode:700:extract", "other"))
+        threading.Timer(0.2, release_lease, args=("episode:700:extract", "other")).start()
+
+        on_wait = mock.Mock()
+        with hold_lease("episode:700:extract", on_wait=on_wait) as waited:
+            self.assertTrue(waited)
+        on_wait.assert_called_once()
+        self.assertEqual(on_wait.call_args[0][0]["owner"], "other")
+
+if __name__ == "__main__":
+    unittest.main()
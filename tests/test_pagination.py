@@ -0,0 +1,85 @@
+"""
+Keyset-пагинация списка эпизодов и поиска рекомендаций: страницы без пропусков и повторов,
+в том числе когда граница страницы проходит внутри одного эпизода
+"""
+
+import unittest
+
+from modules.utils.database import (
+    save_new_episodes, get_episode_by_number, save_recommendations_to_db,
+    get_episodes_page, search_recommendations_page
+)
+
+from temp_db import use_temp_db
+
+def make_episode(number):
+    return {
+        "episode_number": number, "title": f"Радио-Т {number}", "published_date": "2024-01-06 20:00:00",
+        "audio_url": f"https://cdn.example.com/rt_podcast{number}.mp3"
+    }
+
+def collect_pages(fetch, limit):
+    """Пройти все страницы; возвращает (все элементы, размеры страниц)"""
+    items, sizes, cursor = [], [], None
+    while True:
+        page, cursor = fetch(limit, cursor)
+        items.extend(page)
+        sizes.append(len(page))
+        if cursor is None:
+            return items, sizes
+
+class EpisodesPageTest(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self)
+        save_new_episodes([make_episode(number) for number in range(701, 711)])
+
+    def test_pages_cover_all_episodes(self):
+        episodes, sizes = collect_pages(get_episodes_page, 3)
+        self.assertEqual([episode["episode_number"] for episode in episodes], list(range(710, 700, -1)))
+        self.assertEqual(sizes, [3, 3, 3, 1])
+
+    def test_exact_multiple_ends_with_empty_page(self):
+        # Полная последняя страница дает курсор, следующая страница пуста и без курсора
+        episodes, sizes = collect_pages(get_episodes_page, 5)
+        self.assertEqual(len(episodes), 10)
+        self.assertEqual(sizes, [5, 5, 0])
+
+    def test_cursor_is_exclusive(self):
+        page, cursor = get_episodes_page(2, 708)
+        self.assertEqual([episode["episode_number"] for episode in page], [707, 706])
+        self.assertEqual(cursor, 706)
+        self.assertEqual(get_episodes_page(2, 701), ([], None))
+
+class SearchPageTest(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self)
+        save_new_episodes([make_episode(number) for number in (701, 702, 703)])
+        # Несколько рекомендаций в одном эпизоде: граница страницы попадает внутрь эпизода
+        for number, count in ((701, 2), (702, 4), (703, 1)):
+            episode_id = get_episode_by_number(number)["id"]
+            save_recommendations_to_db(
+                [{"name": f"Redis {number}-{index}", "description": "База данных"} for index in range(count)],
+                episode_id
+            )
+        save_recommendations_to_db([{"name": "Vim", "description": "Редактор"}], get_episode_by_number(702)["id"])
+
+    def search(self, limit, after):
+        return search_recommendations_page("Redis", limit, after)
+
+    def test_pages_split_inside_episode(self):
+        for limit in (1, 2, 3, 4, 7):
+            results, _ = collect_pages(self.search, limit)
+            self.assertEqual(
+                [result["name"] for result in results],
+                ["Redis 703-0", "Redis 702-0", "Redis 702-1", "Redis 702-2", "Redis 702-3", "Redis 701-0", "Redis 701-1"],
+                f"limit={limit}"
+            )
+
+    def test_cursor_is_last_result(self):
+        page, cursor = self.search(2, None)
+        self.assertEqual(cursor, (702, page[-1]["id"]))
+        page, cursor = self.search(2, cursor)
+        self.assertEqual([result["name"] for result in page], ["Redis 702-1", "Redis 702-2"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""
+Фоновый опрос ленты: новые эпизоды ставятся в обработку один раз, ответ 304 не ставит ничего
+
+Лента отдается поддельной сессией requests (см. tests/test_feed_cache.py).
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from modules.core import poller
+from modules.utils import feed
+
+from temp_db import use_temp_db
+from test_feed_cache import ETAG, FakeSession, make_feed
+
+class PollFeedOnceTest(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self)
+        self.session = FakeSession()
+        work_dir = tempfile.mkdtemp(prefix="poller_test_")
+        patches = [
+            mock.patch.object(feed, "FEED_CACHE_PATH", os.path.join(work_dir, "feed_cache.json")),
+            mock.patch.object(feed, "_feed_cache", None),
+            mock.patch.object(feed, "get_session", lambda: self.session),
+            mock.patch.object(poller, "enqueue_new_episode", mock.Mock(side_effect=poller.enqueue_new_episode)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_not_modified_feed_enqueues_nothing(self):
+        # В пустой базе в обработку ставится только последний эпизод
+        self.assertEqual(poller.poll_feed_once(poller.enqueue_new_episode), [900])
+        poller.enqueue_new_episode.assert_called_once_with(900)
+
+        self.assertEqual(poller.poll_feed_once(poller.enqueue_new_episode), [])
+        self.assertEqual(self.session.requests[-1].get("If-None-Match"), ETAG)
+        self.assertEqual(len(self.session.requests), 2)
+        poller.enqueue_new_episode.assert_called_once_with(900)
+
+    def test_new_episode_is_enqueued(self):
+        poller.poll_feed_once(poller.enqueue_new_episode)
+
+        self.session.body = make_feed(21, newest=901)
+        self.session.etag = '"feed-v2"'
+        self.assertEqual(poller.poll_feed_once(poller.enqueue_new_episode), [901])
+        poller.enqueue_new_episode.assert_called_with(901)
+        self.assertEqual(poller.enqueue_new_episode.call_count, 2)
+
+    def test_failed_enqueue_is_retried(self):
+        self.assertEqual(poller.poll_feed_once(lambda number: False), [])
+        # Повтор не зависит от ответа ленты: 304 тоже ставит отложенный эпизод
+        self.assertEqual(poller.poll_feed_once(poller.enqueue_new_episode), [900])
+        self.assertEqual(self.session.requests[-1].get("If-None-Match"), ETAG)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Планировщик ресурсов: слоты выдаются строго в порядке очереди ожидания
+"""
+
+import unittest
+from unittest import mock
+
+from modules.utils import scheduler
+from modules.utils.scheduler import _enqueue_waiter, _try_take_slot, _remove_waiter, get_scheduler_status
+from modules.utils.leases import release_lease, try_acquire_lease
+
+from temp_db import use_temp_db
+
+class ResourceSlotTest(unittest.TestCase):
+    def setUp(self):
+        use_temp_db(self)
+        patch = mock.patch.dict(scheduler.RESOURCE_LIMITS, {"download": 2})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def take(self, ticket, owner):
+        return _try_take_slot(ticket, "download", owner, scheduler.RESOURCE_LIMITS["download"], 60)
+
+    def test_slots_are_handed_out_in_fifo_order(self):
+        tickets = [_enqueue_waiter("download", owner, owner) for owner in ("a", "b", "c", "d")]
+
+        # Последняя заявка не может обогнать очередь, даже если спрашивает первой
+        self.assertEqual(self.take(tickets[3], "d"), (None, 4))
+        self.assertEqual(self.take(tickets[0], "a"), (0, 1))
+        self.assertEqual(self.take(tickets[2], "c"), (None, 2))
+        self.assertEqual(self.take(tickets[1], "b"), (1, 1))
+
+        # Слотов нет: заявки c и d ждут
+        self.assertEqual(self.take(tickets[2], "c"), (None, 1))
+        status = get_scheduler_status()["download"]
+        self.assertEqual([waiter["label"] for waiter in status["waiting"]], ["c", "d"])
+
+        # Освободившийся слот получает первая заявка очереди
+        release_lease("resource:download:0", "a")
+        self.assertEqual(self.take(tickets[3], "d"), (None, 2))
+        self.assertEqual(self.take(tickets[2], "c"), (0, 1))
+        self.assertEqual(self.take(tickets[3], "d"), (None, 1))
+
+    def test_abandoned_waiter_does_not_block_queue(self):
+        try_acquire_lease("resource:download:1", "busy")
+        # Процесс встал в очередь и завершился, не продлевая заявку
+        with mock.patch.object(scheduler, "RESOURCE_WAITER_TTL", -1):
+            _enqueue_waiter("download", "gone", "gone")
+        waiting = _enqueue_waiter("download", "b", "b")
+
+        self.assertEqual(self.take(waiting, "b"), (0, 1))
+
+    def test_cancelled_waiter_leaves_queue(self):
+        try_acquire_lease("resource:download:1", "busy")
+        cancelled = _enqueue_waiter("download", "a", "a")
+        waiting = _enqueue_waiter("download", "b", "b")
+        self.assertEqual(self.take(waiting, "b"), (None, 2))
+
+        _remove_waiter(cancelled)
+        self.assertEqual(self.take(waiting, "b"), (0, 1))
+
+    def test_expired_slot_is_reused(self):
+        # Процесс, занявший слот, завершился аварийно и не продлевает аренду
+        try_acquire_lease("resource:download:0", "crashed", ttl=-1)
+        try_acquire_lease("resource:download:1", "alive")
+
+        ticket = _enqueue_waiter("download", "b", "b")
+        self.assertEqual(self.take(ticket, "b"), (0, 1))
+
+if __name__ == "__main__":
+    unittest.main()